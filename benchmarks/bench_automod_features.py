@@ -0,0 +1,46 @@
+"""
+Microbenchmark comparing the old per-check regex passes in AutoMod
+against the shared extract_features() scanner.
+
+Run from the repository root: python benchmarks/bench_automod_features.py
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.features import extract_features
+
+def legacy_checks(content: str):
+    # Mirrors the checks as they were before the feature extractor existed
+    custom_emoji_pattern = r'<a?:[a-zA-Z0-9_]+:[0-9]+>'
+    unicode_emoji_pattern = r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F700-\U0001F77F\U0001F780-\U0001F7FF\U0001F800-\U0001F8FF\U0001F900-\U0001F9FF\U0001FA00-\U0001FA6F\U0001FA70-\U0001FAFF\U00002600-\U000026FF\U00002700-\U000027BF]'
+    zalgo_pattern = r'[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]'
+    
+    content_lower = content.lower()
+    custom_emojis = len(re.findall(custom_emoji_pattern, content))
+    unicode_emojis = len(re.findall(unicode_emoji_pattern, content))
+    zalgo_count = len(re.findall(zalgo_pattern, content))
+    return content_lower, custom_emojis + unicode_emojis, zalgo_count
+
+SAMPLES = {
+    'short ascii': "hey everyone, is the event still on tonight?",
+    'typical': "lol that was great 😂 see you all at the raid later, bring potions https://example.com/guide",
+    'long ascii': ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 70)[:4000],
+    'long mixed': ("check this out 😀🔥 <:pog:123456789> https://example.com wow " * 70)[:4000],
+    'long zalgo': ("Z̵̡̧a̶̢l̷g̸o̴ " * 600)[:4000],
+}
+
+def main():
+    number = 2000
+    print(f"{'sample':<12} {'legacy µs':>10} {'extractor µs':>13} {'speedup':>8}")
+    
+    for name, content in SAMPLES.items():
+        legacy = timeit.timeit(lambda: legacy_checks(content), number=number) / number * 1e6
+        current = timeit.timeit(lambda: extract_features(content), number=number) / number * 1e6
+        print(f"{name:<12} {legacy:>10.1f} {current:>13.1f} {legacy / current:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Microbenchmark for the blacklist normalization stage, cold (first sight of
+the content) and memoized (repeated content, as in spam).
+
+Run from the repository root: python benchmarks/bench_normalize.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.normalize import _normalize_unicode, normalize_text
+
+SAMPLES = {
+    'short ascii': "hey everyone, is the event still on tonight?",
+    'leetspeak': "th1s 1s s0 b4d, y0u $h0uld kn0w b3tt3r",
+    'typical': "lol that was great 😂 see you all at the raid later, bring potions https://example.com/guide",
+    'homoglyphs': "frее nіtro at thе lіnk bеlow, ｃｌａｉｍ ｎｏｗ",
+    'long mixed': ("check this out 😀🔥 <:pog:123456789> https://example.com wow " * 70)[:4000],
+}
+
+def main():
+    number = 2000
+    print(f"{'sample':<12} {'cold µs':>8} {'cached µs':>10} {'lower() µs':>11}")
+    
+    for name, content in SAMPLES.items():
+        if content.isascii():
+            cold = timeit.timeit(lambda: normalize_text(content), number=number) / number * 1e6
+        else:
+            cold = timeit.timeit(lambda: _normalize_unicode.__wrapped__(content), number=number) / number * 1e6
+        cached = timeit.timeit(lambda: normalize_text(content), number=number) / number * 1e6
+        lower = timeit.timeit(lambda: content.lower(), number=number) / number * 1e6
+        print(f"{name:<12} {cold:>8.1f} {cached:>10.1f} {lower:>11.1f}")
+
+if __name__ == '__main__':
+    main()
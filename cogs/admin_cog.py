@@ -1,11 +1,19 @@
 import discord
 from discord.ext import commands
 from utils.permissions import has_admin_permissions
+from utils.export import EXPORT_FORMATS, ModerationExporter
+from database import ConfigConflictError
+from commands.admin import AdminCommands
+from datetime import timedelta
+from typing import Optional
+import asyncio
 import json
+import os
 
 class AdminCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.admin_commands = AdminCommands(bot)
         
     @commands.group(name='config', invoke_without_command=True)
     @has_admin_permissions()
@@ -22,7 +30,11 @@ class AdminCog(commands.Cog):
             name="Auto-Moderation",
             value=f"Enabled: {guild_config.get('automod_enabled', True)}\n"
                   f"Spam Detection: {guild_config.get('spam_detection', True)}\n"
-                  f"Profanity Filter: {guild_config.get('profanity_filter', True)}",
+                  f"Profanity Filter: {guild_config.get('profanity_filter', True)}\n"
+                  f"Raid Detection: {guild_config.get('raid_detection', True)}\n"
+                  f"Auto Slowmode: {guild_config.get('auto_slowmode', True)}\n"
+                  f"Auto Lockdown: {guild_config.get('auto_lockdown', False)}\n"
+                  f"Disabled Rules: {', '.join(guild_config.get('disabled_rules', [])) or 'None'}",
             inline=False
         )
         
@@ -53,9 +65,7 @@ class AdminCog(commands.Cog):
     @config_group.command(name='logchannel')
     @has_admin_permissions()
     async def set_log_channel(self, ctx, channel: discord.TextChannel):
-        guild_config = await self.bot.db.get_guild_config(ctx.guild.id)
-        guild_config['log_channel'] = channel.id
-        await self.bot.db.update_guild_config(ctx.guild.id, guild_config)
+        await self.bot.db.patch_guild_config(ctx.guild.id, values={'log_channel': channel.id})
         
         embed = discord.Embed(
             title="✅ Log Channel Set",
@@ -67,10 +77,10 @@ class AdminCog(commands.Cog):
     @config_group.command(name='welcomechannel')
     @has_admin_permissions()
     async def set_welcome_channel(self, ctx, channel: discord.TextChannel):
-        guild_config = await self.bot.db.get_guild_config(ctx.guild.id)
-        guild_config['welcome_channel'] = channel.id
-        guild_config['welcome_enabled'] = True
-        await self.bot.db.update_guild_config(ctx.guild.id, guild_config)
+        await self.bot.db.patch_guild_config(ctx.guild.id, values={
+            'welcome_channel': channel.id,
+            'welcome_enabled': True
+        })
         
         embed = discord.Embed(
             title="✅ Welcome Channel Set",
@@ -82,9 +92,7 @@ class AdminCog(commands.Cog):
     @config_group.command(name='welcomemessage')
     @has_admin_permissions()
     async def set_welcome_message(self, ctx, *, message: str):
-        guild_config = await self.bot.db.get_guild_config(ctx.guild.id)
-        guild_config['welcome_message'] = message
-        await self.bot.db.update_guild_config(ctx.guild.id, guild_config)
+        await self.bot.db.patch_guild_config(ctx.guild.id, values={'welcome_message': message})
         
         embed = discord.Embed(
             title="✅ Welcome Message Set",
@@ -96,9 +104,7 @@ class AdminCog(commands.Cog):
     @config_group.command(name='automod')
     @has_admin_permissions()
     async def toggle_automod(self, ctx, enabled: bool):
-        guild_config = await self.bot.db.get_guild_config(ctx.guild.id)
-        guild_config['automod_enabled'] = enabled
-        await self.bot.db.update_guild_config(ctx.guild.id, guild_config)
+        await self.bot.db.patch_guild_config(ctx.guild.id, values={'automod_enabled': enabled})
         
         status = "enabled" if enabled else "disabled"
         embed = discord.Embed(
@@ -108,6 +114,58 @@ class AdminCog(commands.Cog):
         )
         await ctx.send(embed=embed)
         
+    @config_group.command(name='autoslowmode')
+    @has_admin_permissions()
+    async def toggle_auto_slowmode(self, ctx, enabled: bool):
+        await self.bot.db.patch_guild_config(ctx.guild.id, values={'auto_slowmode': enabled})
+        
+        status = "enabled" if enabled else "disabled"
+        embed = discord.Embed(
+            title=f"✅ Auto Slowmode {status.title()}",
+            description=f"Automatic slowmode on message rate spikes has been {status}",
+            color=0x00ff00 if enabled else 0xff9900
+        )
+        await ctx.send(embed=embed)
+        
+    @config_group.command(name='autolockdown')
+    @has_admin_permissions()
+    async def toggle_auto_lockdown(self, ctx, enabled: bool):
+        await self.bot.db.patch_guild_config(ctx.guild.id, values={'auto_lockdown': enabled})
+        
+        status = "enabled" if enabled else "disabled"
+        embed = discord.Embed(
+            title=f"✅ Auto Lockdown {status.title()}",
+            description=f"Automatic channel lockdown on severe message rate spikes has been {status}",
+            color=0x00ff00 if enabled else 0xff9900
+        )
+        await ctx.send(embed=embed)
+        
+    @config_group.command(name='rule')
+    @has_admin_permissions()
+    async def toggle_rule(self, ctx, name: str, enabled: bool):
+        automod_cog = self.bot.get_cog('AutoModCog')
+        rule_names = automod_cog.automod.rules.names if automod_cog else []
+        name = name.lower()
+        
+        if name not in rule_names:
+            embed = discord.Embed(
+                title="❌ Unknown Rule",
+                description=f"Available rules: {', '.join(f'`{rule}`' for rule in rule_names) or 'none loaded'}",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        await self._edit_config_list(ctx.guild.id, 'disabled_rules', name, add=not enabled)
+        
+        status = "enabled" if enabled else "disabled"
+        embed = discord.Embed(
+            title=f"✅ Rule {status.title()}",
+            description=f"The `{name}` auto-moderation rule has been {status}",
+            color=0x00ff00 if enabled else 0xff9900
+        )
+        await ctx.send(embed=embed)
+        
     @config_group.command(name='maxwarnings')
     @has_admin_permissions()
     async def set_max_warnings(self, ctx, amount: int):
@@ -120,9 +178,7 @@ class AdminCog(commands.Cog):
             await ctx.send(embed=embed, delete_after=10)
             return
             
-        guild_config = await self.bot.db.get_guild_config(ctx.guild.id)
-        guild_config['max_warnings'] = amount
-        await self.bot.db.update_guild_config(ctx.guild.id, guild_config)
+        await self.bot.db.patch_guild_config(ctx.guild.id, values={'max_warnings': amount})
         
         embed = discord.Embed(
             title="✅ Max Warnings Updated",
@@ -143,9 +199,7 @@ class AdminCog(commands.Cog):
             await ctx.send(embed=embed, delete_after=10)
             return
             
-        guild_config = await self.bot.db.get_guild_config(ctx.guild.id)
-        guild_config['timeout_duration'] = seconds
-        await self.bot.db.update_guild_config(ctx.guild.id, guild_config)
+        await self.bot.db.patch_guild_config(ctx.guild.id, values={'timeout_duration': seconds})
         
         embed = discord.Embed(
             title="✅ Timeout Duration Updated",
@@ -154,13 +208,142 @@ class AdminCog(commands.Cog):
         )
         await ctx.send(embed=embed)
         
+    @config_group.command(name='muterole')
+    @has_admin_permissions()
+    async def set_mute_role(self, ctx, role: discord.Role):
+        if role >= ctx.guild.me.top_role:
+            embed = discord.Embed(
+                title="❌ Role Too High",
+                description=f"{role.mention} must be below my highest role so I can assign it",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        await self.bot.db.patch_guild_config(ctx.guild.id, values={'mute_role': role.id})
+        
+        embed = discord.Embed(
+            title="✅ Mute Role Updated",
+            description=f"Mute role set to {role.mention}",
+            color=0x00ff00
+        )
+        await ctx.send(embed=embed)
+        
+    @config_group.command(name='retention')
+    @has_admin_permissions()
+    async def set_retention(self, ctx, kind: str, days: str):
+        keys = {'logs': 'log_retention_days', 'warnings': 'warning_retention_days'}
+        key = keys.get(kind.lower())
+        
+        if key is None or not (days.isdigit() or days.lower() == 'default'):
+            embed = discord.Embed(
+                title="❌ Invalid Retention",
+                description=f"Usage: `{ctx.prefix}config retention <logs/warnings> <days/default>` (0 keeps forever)",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        if days.lower() == 'default':
+            await self.bot.db.patch_guild_config(ctx.guild.id, unset=[key])
+            description = f"{kind.title()} now follow the bot-wide retention policy"
+        else:
+            await self.bot.db.patch_guild_config(ctx.guild.id, values={key: int(days)})
+            description = (f"{kind.title()} older than {days} days will be deleted"
+                           if int(days) else f"{kind.title()} will be kept forever")
+                           
+        embed = discord.Embed(
+            title="✅ Retention Updated",
+            description=description,
+            color=0x00ff00
+        )
+        await ctx.send(embed=embed)
+        
+    async def _edit_config_list(self, guild_id: int, key: str, item: str, add: bool) -> bool:
+        """Add or remove a list item with compare-and-swap; False if there was nothing to change"""
+        for attempt in range(5):
+            guild_config, version = await self.bot.db.get_guild_config_versioned(guild_id)
+            items = guild_config.get(key, [])
+            
+            if (item in items) == add:
+                return False
+                
+            items = items + [item] if add else [existing for existing in items if existing != item]
+            try:
+                await self.bot.db.patch_guild_config(
+                    guild_id, values={key: items}, expected_version=version
+                )
+                return True
+            except ConfigConflictError:
+                # Another edit landed between our read and write; re-read and retry
+                if attempt == 4:
+                    raise
+                    
+    @config_group.group(name='blacklist', invoke_without_command=True)
+    @has_admin_permissions()
+    async def blacklist_group(self, ctx):
+        guild_config = await self.bot.db.get_guild_config(ctx.guild.id)
+        words = guild_config.get('blacklist_words', [])
+        
+        embed = discord.Embed(
+            title="🚫 Server Blacklist",
+            description=', '.join(f"`{word}`" for word in words)[:4000] if words else "No server-specific words",
+            color=0x0099ff
+        )
+        embed.set_footer(text="These words are checked in addition to the global blacklist")
+        await ctx.send(embed=embed)
+        
+    @blacklist_group.command(name='add')
+    @has_admin_permissions()
+    async def blacklist_add(self, ctx, *, word: str):
+        word = word.lower().strip()
+        
+        if not await self._edit_config_list(ctx.guild.id, 'blacklist_words', word, add=True):
+            embed = discord.Embed(
+                title="❌ Already Blacklisted",
+                description=f"`{word}` is already on the server blacklist",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        embed = discord.Embed(
+            title="✅ Word Blacklisted",
+            description=f"`{word}` has been added to the server blacklist",
+            color=0x00ff00
+        )
+        await ctx.send(embed=embed)
+        
+    @blacklist_group.command(name='remove')
+    @has_admin_permissions()
+    async def blacklist_remove(self, ctx, *, word: str):
+        word = word.lower().strip()
+        
+        if not await self._edit_config_list(ctx.guild.id, 'blacklist_words', word, add=False):
+            embed = discord.Embed(
+                title="❌ Not Blacklisted",
+                description=f"`{word}` is not on the server blacklist",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        embed = discord.Embed(
+            title="✅ Word Removed",
+            description=f"`{word}` has been removed from the server blacklist",
+            color=0x00ff00
+        )
+        await ctx.send(embed=embed)
+        
     @commands.command(name='modlogs')
     @has_admin_permissions()
-    async def view_mod_logs(self, ctx, limit: int = 10):
+    async def view_mod_logs(self, ctx, limit: int = 10, before_id: Optional[int] = None):
         if limit < 1 or limit > 50:
             limit = 10
             
-        logs = await self.bot.db.get_moderation_logs(ctx.guild.id, limit)
+        logs, next_before_id = await self.bot.db.get_moderation_logs_page(
+            ctx.guild.id, before_id=before_id, limit=limit
+        )
         
         if not logs:
             embed = discord.Embed(
@@ -173,7 +356,7 @@ class AdminCog(commands.Cog):
             
         embed = discord.Embed(
             title="📋 Moderation Logs",
-            description=f"Last {len(logs)} moderation actions",
+            description=f"{len(logs)} moderation actions" + (f" before #{before_id}" if before_id else ""),
             color=0x0099ff
         )
         
@@ -185,15 +368,115 @@ class AdminCog(commands.Cog):
             mod_name = moderator.name if moderator else f"Unknown ({log['moderator_id']})"
             
             embed.add_field(
-                name=f"{log['action'].title()} - {log['created_at'][:16]}",
+                name=f"#{log['id']} {log['action'].title()} - {log['created_at'][:16]}",
                 value=f"**User:** {user_name}\n"
                       f"**Moderator:** {mod_name}\n"
                       f"**Reason:** {log['reason'][:100]}{'...' if len(log['reason']) > 100 else ''}",
                 inline=False
             )
             
+        if next_before_id:
+            embed.set_footer(text=f"Older entries: {ctx.prefix}modlogs {limit} {next_before_id}")
+            
+        await ctx.send(embed=embed)
+        
+    @commands.command(name='stats')
+    @has_admin_permissions()
+    async def server_stats(self, ctx, days: int = 7):
+        days = min(max(days, 1), 30)
+        since = discord.utils.utcnow() - timedelta(days=days - 1)
+        
+        stats, trend = await asyncio.gather(
+            self.admin_commands.get_guild_statistics(ctx.guild),
+            self.bot.db.get_action_trend(ctx.guild.id, since)
+        )
+        embed = await self.admin_commands.create_stats_embed(ctx.guild, stats)
+        
+        lines = []
+        for offset in range(days):
+            day = (since + timedelta(days=offset)).strftime('%Y-%m-%d')
+            counts = trend.get(day, {})
+            total = sum(counts.values())
+            lines.append(f"`{day[5:]}` {'▇' * min(total, 20)} {total}")
+            
+        embed.add_field(
+            name=f"📈 Actions per Day (last {days}d)",
+            value='\n'.join(lines),
+            inline=False
+        )
         await ctx.send(embed=embed)
         
+    @commands.command(name='export')
+    @has_admin_permissions()
+    async def export_logs(self, ctx, format_type: str = 'ndjson', *options: str):
+        format_type = format_type.lower()
+        options = {option.lower() for option in options}
+        
+        if format_type not in EXPORT_FORMATS:
+            embed = discord.Embed(
+                title="❌ Invalid Format",
+                description=f"Supported formats: {', '.join(EXPORT_FORMATS)}",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        all_guilds = 'all' in options
+        if all_guilds and not await self.bot.is_owner(ctx.author):
+            embed = discord.Embed(
+                title="❌ Owner Only",
+                description="Only the bot owner can export every server's logs",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        compress = 'gzip' in options
+        guild_id = None if all_guilds else ctx.guild.id
+        
+        export_config = self.bot.config.section('export')
+        directory = export_config.get('directory', 'exports')
+        await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+        path = os.path.join(directory, ModerationExporter.file_name(guild_id, format_type, compress))
+        
+        exporter = ModerationExporter(self.bot.db, export_config.get('page_size', 1000))
+        async with ctx.typing():
+            summary = await exporter.export(path, guild_id, format_type, compress)
+        size = await asyncio.to_thread(os.path.getsize, path)
+        
+        embed = discord.Embed(
+            title="📦 Moderation Export",
+            description=f"Exported {summary['total_logs']} moderation logs "
+                        f"from {summary['guilds']} server(s)",
+            color=0x00ff00
+        )
+        
+        date_range = summary['date_range']
+        if date_range['oldest']:
+            embed.add_field(
+                name="Date Range",
+                value=f"{date_range['oldest'][:10]} → {date_range['newest'][:10]}",
+                inline=True
+            )
+            
+        if summary['action_counts']:
+            embed.add_field(
+                name="Actions",
+                value='\n'.join(f"**{action}:** {count}" for action, count in sorted(summary['action_counts'].items())),
+                inline=True
+            )
+            
+        # Cross-guild exports and files over the upload limit stay on the bot's disk
+        if all_guilds or 'local' in options or size > ctx.guild.filesize_limit:
+            embed.add_field(name="Saved To", value=f"`{path}`", inline=False)
+            await ctx.send(embed=embed)
+            return
+            
+        try:
+            await ctx.send(embed=embed, file=discord.File(path))
+        finally:
+            await asyncio.to_thread(os.remove, path)
+            
     @commands.command(name='help')
     async def help_command(self, ctx):
         embed = discord.Embed(
@@ -209,14 +492,22 @@ class AdminCog(commands.Cog):
                   f"`{ctx.prefix}kick <user> <reason>` - Kick a user\n"
                   f"`{ctx.prefix}ban <user> [delete_days] <reason>` - Ban a user\n"
                   f"`{ctx.prefix}unban <user_id> <reason>` - Unban a user\n"
-                  f"`{ctx.prefix}purge <amount> [user]` - Delete messages",
+                  f"`{ctx.prefix}massban <users...> <reason>` - Ban many users at once\n"
+                  f"`{ctx.prefix}masswarn <users...> <reason>` / `{ctx.prefix}massclearwarns <users...>` - Warn or clear many users\n"
+                  f"`{ctx.prefix}tempban <user> <duration> <reason>` - Ban until the duration expires\n"
+                  f"`{ctx.prefix}mute <user> <duration> <reason>` / `{ctx.prefix}unmute <user>` - Mute role\n"
+                  f"`{ctx.prefix}purge <amount> [user]` - Delete messages\n"
+                  f"`{ctx.prefix}search <text> [page:N]` - Search warning and log reasons",
             inline=False
         )
         
         embed.add_field(
             name="📋 Information Commands",
             value=f"`{ctx.prefix}warnings <user>` - View user warnings\n"
-                  f"`{ctx.prefix}modlogs [limit]` - View moderation logs\n"
+                  f"`{ctx.prefix}modlogs [limit] [before_id]` - View moderation logs\n"
+                  f"`{ctx.prefix}export [ndjson/csv] [gzip] [local]` - Export moderation logs\n"
+                  f"`{ctx.prefix}stats [days]` - Server and moderation statistics\n"
+                  f"`{ctx.prefix}traffic [release]` - Show or lift automatic slowmode/lockdown\n"
                   f"`{ctx.prefix}config` - View server configuration",
             inline=False
         )
@@ -226,7 +517,12 @@ class AdminCog(commands.Cog):
             value=f"`{ctx.prefix}config logchannel <channel>` - Set log channel\n"
                   f"`{ctx.prefix}config welcomechannel <channel>` - Set welcome channel\n"
                   f"`{ctx.prefix}config automod <true/false>` - Toggle auto-mod\n"
-                  f"`{ctx.prefix}config maxwarnings <amount>` - Set max warnings",
+                  f"`{ctx.prefix}config rule <name> <true/false>` - Toggle one auto-mod rule\n"
+                  f"`{ctx.prefix}config autoslowmode/autolockdown <true/false>` - Toggle traffic spike responses\n"
+                  f"`{ctx.prefix}config maxwarnings <amount>` - Set max warnings\n"
+                  f"`{ctx.prefix}config muterole <role>` - Set the role used by mute\n"
+                  f"`{ctx.prefix}config retention <logs/warnings> <days>` - Set data retention\n"
+                  f"`{ctx.prefix}config blacklist add/remove <word>` - Manage server blacklist",
             inline=False
         )
         
@@ -1,21 +1,256 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from utils.automod import AutoMod
-import json
+from utils.anomaly import TrafficMonitor, ChannelChange, LEVEL_NAMES, LEVEL_NORMAL, LEVEL_SLOWMODE, LEVEL_LOCKDOWN
+from utils.logging import ModerationLogger
+from utils.permissions import has_admin_permissions, has_mod_permissions
+from utils.scheduler import RetryAction
+import asyncio
 
 class AutoModCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-        self.automod = AutoMod(bot, config)
+        self.automod = AutoMod(bot, bot.config)
+        self.traffic = TrafficMonitor()
+        self._apply_traffic_config(bot.config)
+        self.logger = ModerationLogger(bot)
+        
+        tracking_config = bot.config.section('spam_tracking')
+        self.maintain_spam_tracker.change_interval(seconds=tracking_config.get('snapshot_interval', 60))
+        
+    async def cog_load(self):
+        tracker = self.automod.spam_tracker
+        restored = await asyncio.to_thread(tracker.load_snapshot)
+        if restored:
+            self.bot.logger.info(f"Restored spam tracking state for {restored} users")
+        self.maintain_spam_tracker.start()
+        self.bot.config_service.add_listener(self.automod.apply_config)
+        self.bot.config_service.add_listener(self._apply_traffic_config)
+        self.traffic.set_handler(self._apply_traffic_change)
+        self.traffic.start(self.bot.wait_until_ready)
+        self.automod.pool.start()
+        
+    async def cog_unload(self):
+        self.bot.config_service.remove_listener(self.automod.apply_config)
+        self.bot.config_service.remove_listener(self._apply_traffic_config)
+        self.maintain_spam_tracker.cancel()
+        # Reverts active slowmodes and lockdowns; their original settings only live in memory
+        await self.traffic.stop()
+        await self._snapshot_spam_tracker()
+        self.automod.close()
+        
+    def _apply_traffic_config(self, config):
+        traffic_config = config.section('traffic_monitor')
+        self.traffic.configure(
+            fast_window=traffic_config.get('fast_window_seconds', 10),
+            baseline_window=traffic_config.get('baseline_window_seconds', 900),
+            spike_factor=traffic_config.get('spike_factor', 4),
+            lockdown_factor=traffic_config.get('lockdown_factor', 10),
+            channel_min_rate=traffic_config.get('channel_min_per_minute', 60) / 60,
+            guild_min_rate=traffic_config.get('guild_min_per_minute', 180) / 60,
+            cooldown=traffic_config.get('cooldown_seconds', 300),
+            idle_timeout=traffic_config.get('idle_timeout', 3600),
+            batch_size=traffic_config.get('batch_size', 5),
+            batch_interval=traffic_config.get('batch_interval', 1.0),
+            retry_delay=traffic_config.get('retry_delay', 30),
+            sweep_interval=traffic_config.get('sweep_interval', 15)
+        )
+        
+    async def _escalate_traffic(self, message, level: int):
+        guild_config = await self.bot.db.get_guild_config(message.guild.id)
+        if not guild_config.get('automod_enabled', True):
+            return
+            
+        if level >= LEVEL_LOCKDOWN and not guild_config.get('auto_lockdown', False):
+            level = LEVEL_SLOWMODE
+        if level == LEVEL_SLOWMODE and not guild_config.get('auto_slowmode', True):
+            return
+            
+        self.traffic.escalate(message.guild.id, message.channel.id, level)
+        
+    async def _apply_traffic_change(self, change: ChannelChange):
+        guild = self.bot.get_guild(change.guild_id)
+        channel = guild.get_channel(change.channel_id) if guild else None
+        if not isinstance(channel, discord.TextChannel):
+            return
+            
+        original = change.original
+        options = {}
+        if change.level > LEVEL_NORMAL:
+            delay = self.bot.config.section('traffic_monitor').get('slowmode_delay', 10)
+            original.setdefault('slowmode_delay', channel.slowmode_delay)
+            delay = max(original['slowmode_delay'], delay)
+            if channel.slowmode_delay != delay:
+                options['slowmode_delay'] = delay
+                
+            if change.level >= LEVEL_LOCKDOWN and 'overwrite' not in original:
+                overwrite = channel.overwrites_for(guild.default_role)
+                original['overwrite'] = overwrite
+                locked = discord.PermissionOverwrite.from_pair(*overwrite.pair())
+                locked.update(send_messages=False, create_public_threads=False, send_messages_in_threads=False)
+                options['overwrites'] = {**channel.overwrites, guild.default_role: locked}
+            reason = f"Message rate {change.rate * 60:.0f}/min against a baseline of {change.baseline * 60:.0f}/min"
+        else:
+            if 'slowmode_delay' in original:
+                options['slowmode_delay'] = original['slowmode_delay']
+            if 'overwrite' in original:
+                overwrites = dict(channel.overwrites)
+                if original['overwrite'].is_empty():
+                    overwrites.pop(guild.default_role, None)
+                else:
+                    overwrites[guild.default_role] = original['overwrite']
+                options['overwrites'] = overwrites
+            reason = "Message rate back to normal"
+            
+        # Slowmode and the lockdown overwrite go out as a single channel edit
+        if options:
+            try:
+                await channel.edit(reason=f"Auto-moderation: {reason}", **options)
+            except discord.NotFound:
+                return
+            except discord.RateLimited as e:
+                raise RetryAction(e.retry_after, rate_limited=True)
+                
+        if change.level == LEVEL_NORMAL:
+            original.clear()
+            
+        await self.logger.log_action(change.guild_id, {
+            'action': LEVEL_NAMES[change.level] if change.level else 'restore',
+            'channel_id': change.channel_id,
+            'moderator_id': self.bot.user.id if self.bot.user else None,
+            'reason': reason
+        })
+        
+    async def _snapshot_spam_tracker(self):
+        tracker = self.automod.spam_tracker
+        if not tracker.snapshot_path:
+            return
+            
+        # Export on the event loop so the tracker is never read mid-update
+        state = tracker.export_state()
+        try:
+            await asyncio.to_thread(tracker.save_snapshot, state)
+        except OSError as e:
+            self.bot.logger.error(f"Failed to snapshot spam tracker: {e}")
+            
+    @tasks.loop(seconds=60)
+    async def maintain_spam_tracker(self):
+        self.automod.spam_tracker.evict_idle()
+        self.automod.raid_detector.evict_idle()
+        await self._snapshot_spam_tracker()
+        
+    @commands.command(name='automodstats')
+    @has_admin_permissions()
+    async def automod_stats(self, ctx):
+        embed = discord.Embed(
+            title="📈 Auto-Moderation Performance",
+            description="Rule cost (most total time first) and violation-handling latency since startup",
+            color=0x0099ff
+        )
+        
+        for stats in self.automod.rules.summary():
+            embed.add_field(
+                name=f"Rule: {stats['name']} ({stats['cost']})",
+                value=f"**Evaluated:** {stats['evaluations']}\n"
+                      f"**Hits:** {stats['hits']} ({stats['hit_rate']:.1%})\n"
+                      f"**Mean:** {stats['mean_ms'] * 1000:.1f} µs\n"
+                      f"**Total:** {stats['total_ms']:.1f} ms"
+                      + (f"\n**Errors:** {stats['errors']}" if stats['errors'] else "")
+                      + (f"\n**Timed Out:** {stats['timeouts']}" if stats['timeouts'] else ""),
+                inline=True
+            )
+            
+        for stage, stats in self.automod.violation_latency.summary().items():
+            embed.add_field(
+                name=f"Stage: {stage.title()}",
+                value=f"**Count:** {stats['count']}\n"
+                      f"**Mean:** {stats['mean_ms']:.1f} ms\n"
+                      f"**Max:** {stats['max_ms']:.1f} ms",
+                inline=True
+            )
+            
+        config_cache = self.bot.db.get_config_cache_stats()
+        embed.add_field(
+            name="Guild Config Cache",
+            value=f"**Hits:** {config_cache['hits']}\n"
+                  f"**Misses:** {config_cache['misses']}\n"
+                  f"**Hit Rate:** {config_cache['hit_rate']:.1%}\n"
+                  f"**Cached Guilds:** {config_cache['size']}",
+            inline=True
+        )
+        
+        pool = self.automod.pool.stats()
+        embed.add_field(
+            name="Check Pool",
+            value=f"**Workers:** {pool['workers']}\n"
+                  f"**Offloaded:** {pool['submitted']}\n"
+                  f"**Timed Out (allowed):** {pool['timeouts']}\n"
+                  f"**Rejected:** {pool['rejected']}\n"
+                  f"**Recycled:** {pool['recycled']}",
+            inline=True
+        )
+        
+        traffic = self.traffic
+        embed.add_field(
+            name="Traffic Monitor",
+            value=f"**Channels Tracked:** {len(traffic)}\n"
+                  f"**Changes Applied:** {traffic.applied}\n"
+                  f"**Pending:** {traffic.pending}\n"
+                  f"**Failed:** {traffic.failed}",
+            inline=True
+        )
+        
+        if not any(stats['evaluations'] for stats in self.automod.rules.summary()):
+            embed.description = "No messages checked yet"
+            
+        await ctx.send(embed=embed)
+        
+    @commands.group(name='traffic', invoke_without_command=True)
+    @has_mod_permissions()
+    async def traffic_group(self, ctx):
+        channels = self.traffic.mitigated_channels(ctx.guild.id)
+        embed = discord.Embed(
+            title="🚦 Traffic Monitor",
+            description="Channels under automatic slowmode or lockdown" if channels else "All channels are at normal traffic",
+            color=0xff9900 if channels else 0x00ff00
+        )
+        
+        for entry in channels[:25]:
+            status = "being applied" if entry['pending'] else f"reverts in {entry['revert_in']:.0f}s"
+            embed.add_field(
+                name=f"{entry['level'].title()}",
+                value=f"<#{entry['channel_id']}>\n"
+                      f"**Rate:** {entry['rate'] * 60:.0f}/min (baseline {entry['baseline'] * 60:.0f}/min)\n"
+                      f"**Status:** {status}",
+                inline=True
+            )
+            
+        await ctx.send(embed=embed)
+        
+    @traffic_group.command(name='release')
+    @has_mod_permissions()
+    async def traffic_release(self, ctx):
+        released = self.traffic.release(ctx.guild.id)
+        embed = discord.Embed(
+            title="✅ Traffic Restrictions Lifted" if released else "ℹ️ Nothing to Lift",
+            description=f"Restoring {released} channels; new spikes are ignored for "
+                        f"{self.traffic.cooldown:.0f} seconds" if released else "No channel is under automatic slowmode or lockdown",
+            color=0x00ff00 if released else 0x0099ff
+        )
+        await ctx.send(embed=embed)
         
     @commands.Cog.listener()
     async def on_message(self, message):
         if message.author.bot or not message.guild:
             return
             
+        # O(1) per message; only a spike costs a config lookup
+        if isinstance(message.channel, discord.TextChannel):
+            level = self.traffic.record(message.guild.id, message.channel.id)
+            if level:
+                await self._escalate_traffic(message, level)
+                
         violation = await self.automod.check_message(message)
         if violation:
             await self.automod.handle_violation(message, violation)
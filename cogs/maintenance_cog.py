@@ -0,0 +1,99 @@
+import discord
+from discord.ext import commands, tasks
+from utils.maintenance import MaintenanceJob
+
+class MaintenanceCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        
+        maintenance_config = bot.config.section('maintenance')
+        self.job = MaintenanceJob(bot.db, maintenance_config)
+        self.maintenance_loop.change_interval(hours=maintenance_config.get('interval_hours', 6))
+        
+    async def cog_load(self):
+        self.maintenance_loop.start()
+        self.bot.config_service.add_listener(self._on_config_reload)
+        
+    async def cog_unload(self):
+        self.bot.config_service.remove_listener(self._on_config_reload)
+        self.maintenance_loop.cancel()
+        
+    def _on_config_reload(self, config):
+        maintenance_config = config.section('maintenance')
+        self.job.apply_config(maintenance_config)
+        self.maintenance_loop.change_interval(hours=maintenance_config.get('interval_hours', 6))
+        
+    @tasks.loop(hours=6)
+    async def maintenance_loop(self):
+        try:
+            await self.job.run()
+        except Exception as e:
+            self.bot.logger.error(f"Maintenance run failed: {e}")
+            
+    @maintenance_loop.before_loop
+    async def before_maintenance(self):
+        await self.bot.wait_until_ready()
+        
+    def _report_embed(self, report) -> discord.Embed:
+        embed = discord.Embed(
+            title="🧹 Database Maintenance",
+            description=f"Last run {report['started_at'][:19].replace('T', ' ')} UTC, "
+                        f"took {report['duration_seconds']:.1f}s",
+            color=0x0099ff
+        )
+        
+        for table, stats in report['tables'].items():
+            embed.add_field(
+                name=table.replace('_', ' ').title(),
+                value=f"**Rows Deleted:** {stats['rows']}\n"
+                      f"**Guilds:** {stats['guilds']}\n"
+                      f"**Chunks:** {stats['chunks']}\n"
+                      f"**Longest Lock:** {stats['max_lock_ms']:.1f} ms",
+                inline=True
+            )
+            
+        embed.add_field(
+            name="Storage",
+            value=f"**Pages Reclaimed:** {report['pages_reclaimed']}\n"
+                  f"**Bytes Reclaimed:** {report['bytes_reclaimed']:,}\n"
+                  f"**Total Lock Time:** {report['lock_seconds'] * 1000:.0f} ms",
+            inline=True
+        )
+        return embed
+        
+    @commands.group(name='maintenance', invoke_without_command=True)
+    @commands.is_owner()
+    async def maintenance_group(self, ctx):
+        if not self.job.last_report:
+            embed = discord.Embed(
+                title="🧹 Database Maintenance",
+                description="No maintenance run has completed yet",
+                color=0x808080
+            )
+            await ctx.send(embed=embed)
+            return
+            
+        await ctx.send(embed=self._report_embed(self.job.last_report))
+        
+    @maintenance_group.command(name='run')
+    @commands.is_owner()
+    async def maintenance_run(self, ctx):
+        async with ctx.typing():
+            report = await self.job.run()
+        await ctx.send(embed=self._report_embed(report))
+        
+    @maintenance_group.command(name='vacuum')
+    @commands.is_owner()
+    async def maintenance_vacuum(self, ctx):
+        async with ctx.typing():
+            seconds = await self.bot.db.vacuum()
+            
+        embed = discord.Embed(
+            title="✅ Database Vacuumed",
+            description=f"Full VACUUM finished in {seconds:.1f}s; free pages are now reclaimed incrementally",
+            color=0x00ff00
+        )
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(MaintenanceCog(bot))
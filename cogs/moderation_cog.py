@@ -2,14 +2,73 @@ import discord
 from discord.ext import commands
 from utils.permissions import has_mod_permissions, can_moderate_user, check_bot_permissions
 from utils.logging import ModerationLogger
+from utils.scheduler import MAX_DURATION, ScheduledAction, RetryAction, parse_duration
 from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 import asyncio
+import re
+
+# `page:N` anywhere in a search query; a bare number stays a search term
+SEARCH_PAGE_OPTION = re.compile(r'(?:^|\s)page:(\d+)(?=\s|$)', re.IGNORECASE)
 
 class ModerationCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = ModerationLogger(bot)
         
+    async def cog_load(self):
+        self.bot.scheduler.register('unban', self._expire_ban)
+        self.bot.scheduler.register('unmute', self._expire_mute)
+        
+    async def cog_unload(self):
+        self.bot.scheduler.unregister('unban')
+        self.bot.scheduler.unregister('unmute')
+        
+    async def _expire_ban(self, entry: ScheduledAction):
+        guild = self.bot.get_guild(entry.guild_id)
+        if guild is None:
+            return
+            
+        try:
+            await guild.unban(discord.Object(id=entry.user_id), reason="Temporary ban expired")
+        except discord.NotFound:
+            return
+        except discord.RateLimited as e:
+            raise RetryAction(e.retry_after, rate_limited=True)
+            
+        await self._log_expiry(entry, "unban", "Temporary ban expired")
+        
+    async def _expire_mute(self, entry: ScheduledAction):
+        guild = self.bot.get_guild(entry.guild_id)
+        if guild is None:
+            return
+            
+        member = guild.get_member(entry.user_id)
+        role = guild.get_role(entry.role_id) if entry.role_id else None
+        if member is None or role is None or role not in member.roles:
+            return
+            
+        try:
+            await member.remove_roles(role, reason="Mute expired")
+        except discord.NotFound:
+            return
+        except discord.RateLimited as e:
+            raise RetryAction(e.retry_after, rate_limited=True)
+            
+        await self._log_expiry(entry, "unmute", "Mute expired")
+        
+    async def _log_expiry(self, entry: ScheduledAction, action: str, reason: str):
+        await self.bot.db.log_moderation_action(
+            entry.guild_id, entry.user_id, self.bot.user.id, action, reason
+        )
+        
+        await self.logger.log_action(entry.guild_id, {
+            'action': action,
+            'user_id': entry.user_id,
+            'moderator_id': self.bot.user.id,
+            'reason': reason
+        })
+        
     @commands.command(name='warn')
     @has_mod_permissions()
     async def warn_user(self, ctx, user: discord.Member, *, reason: str = "No reason provided"):
@@ -22,9 +81,7 @@ class ModerationCog(commands.Cog):
             await ctx.send(embed=embed, delete_after=10)
             return
             
-        await self.bot.db.add_warning(ctx.guild.id, user.id, ctx.author.id, reason)
-        warnings = await self.bot.db.get_user_warnings(ctx.guild.id, user.id)
-        warning_count = len(warnings)
+        warning_count = await self.bot.db.add_warning(ctx.guild.id, user.id, ctx.author.id, reason)
         
         embed = discord.Embed(
             title="⚠️ User Warned",
@@ -65,9 +122,9 @@ class ModerationCog(commands.Cog):
     @commands.command(name='warnings')
     @has_mod_permissions()
     async def view_warnings(self, ctx, user: discord.Member):
-        warnings = await self.bot.db.get_user_warnings(ctx.guild.id, user.id)
+        warning_count = await self.bot.db.get_warning_count(ctx.guild.id, user.id)
         
-        if not warnings:
+        if not warning_count:
             embed = discord.Embed(
                 title="📋 User Warnings",
                 description=f"{user.mention} has no warnings.",
@@ -82,7 +139,8 @@ class ModerationCog(commands.Cog):
             color=0xff9900
         )
         
-        for i, warning in enumerate(warnings[:10], 1):
+        warnings = await self.bot.db.get_user_warnings(ctx.guild.id, user.id, limit=10)
+        for i, warning in enumerate(warnings, 1):
             moderator = self.bot.get_user(warning['moderator_id'])
             mod_name = moderator.name if moderator else f"Unknown ({warning['moderator_id']})"
             
@@ -94,15 +152,73 @@ class ModerationCog(commands.Cog):
                 inline=False
             )
             
-        if len(warnings) > 10:
-            embed.set_footer(text=f"Showing 10 of {len(warnings)} warnings")
+        if warning_count > 10:
+            embed.set_footer(text=f"Showing 10 of {warning_count} warnings")
             
         await ctx.send(embed=embed)
         
+    @commands.command(name='search')
+    @has_mod_permissions()
+    async def search_cases(self, ctx, *, query: str):
+        page = 1
+        page_options = SEARCH_PAGE_OPTION.findall(query)
+        if page_options:
+            page = max(int(page_options[-1]), 1)
+            query = SEARCH_PAGE_OPTION.sub(' ', query).strip()
+            
+        if not query:
+            embed = discord.Embed(
+                title="❌ Missing Query",
+                description=f"Usage: `{ctx.prefix}search <text> [page:N]`",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        per_page = 5
+        
+        hits, has_more = await self.bot.db.search_cases(
+            ctx.guild.id, query, limit=per_page, offset=(page - 1) * per_page
+        )
+        
+        if not hits:
+            embed = discord.Embed(
+                title="🔎 Case Search",
+                description=f"No cases found matching `{query[:100]}`" + (f" on page {page}" if page > 1 else ""),
+                color=0x808080
+            )
+            await ctx.send(embed=embed)
+            return
+            
+        embed = discord.Embed(
+            title="🔎 Case Search",
+            description=f"Cases matching `{query[:100]}`, best matches first",
+            color=0x0099ff
+        )
+        
+        for hit in hits:
+            user = self.bot.get_user(hit['user_id']) if hit['user_id'] else None
+            user_name = user.name if user else f"Unknown ({hit['user_id']})"
+            kind = "Warning" if hit['kind'] == 'warning' else f"Log ({hit['action']})"
+            
+            embed.add_field(
+                name=f"{kind} #{hit['id']} - {hit['created_at'][:16]}",
+                value=f"**User:** {user_name}\n"
+                      f"**Reason:** {hit['snippet'][:300]}",
+                inline=False
+            )
+            
+        footer = f"Page {page}"
+        if has_more:
+            footer += f" • Next: {ctx.prefix}search {query} page:{page + 1}"
+        embed.set_footer(text=footer[:2048])
+        
+        await ctx.send(embed=embed)
+        
     @commands.command(name='unwarn')
     @has_mod_permissions()
     async def remove_warning(self, ctx, warning_id: int):
-        success = await self.bot.db.remove_warning(warning_id)
+        success = await self.bot.db.remove_warning(ctx.guild.id, warning_id)
         
         if success:
             embed = discord.Embed(
@@ -378,6 +494,7 @@ class ModerationCog(commands.Cog):
                 pass
                 
             await user.ban(reason=reason, delete_message_days=delete_days)
+            await self.bot.scheduler.cancel(ctx.guild.id, user.id, 'unban')
             
             embed = discord.Embed(
                 title="🔨 User Banned",
@@ -410,6 +527,391 @@ class ModerationCog(commands.Cog):
             )
             await ctx.send(embed=embed, delete_after=10)
             
+    @commands.command(name='massban')
+    @has_mod_permissions()
+    async def mass_ban(self, ctx, users: commands.Greedy[discord.Object], *, reason: str = "No reason provided"):
+        missing_perms = await check_bot_permissions(ctx.channel, ['ban_members'])
+        if missing_perms:
+            embed = discord.Embed(
+                title="❌ Missing Permissions",
+                description="I need the 'Ban Members' permission to use this command.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        targets, skipped = await self._mass_targets(ctx, users)
+        if not targets:
+            embed = discord.Embed(
+                title="❌ No Users To Ban",
+                description="Give the IDs or mentions of users you are allowed to moderate.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        banned = []
+        failed = 0
+        async with ctx.typing():
+            # Discord accepts at most 200 users per bulk ban request
+            for start in range(0, len(targets), 200):
+                try:
+                    result = await ctx.guild.bulk_ban(targets[start:start + 200], reason=reason)
+                except discord.HTTPException as e:
+                    self.bot.logger.error(f"Bulk ban in guild {ctx.guild.id} failed: {e}")
+                    failed += len(targets[start:start + 200])
+                    continue
+                banned.extend(user.id for user in result.banned)
+                failed += len(result.failed)
+                
+            if banned:
+                await self.bot.db.log_moderation_actions_bulk(ctx.guild.id, banned, ctx.author.id, "ban", reason)
+                await self.bot.scheduler.cancel_many(ctx.guild.id, banned, 'unban')
+                
+        embed = discord.Embed(
+            title="🔨 Mass Ban",
+            description=f"Banned {len(banned)} of {len(targets)} users.",
+            color=0xff0000 if banned else 0x808080,
+            timestamp=discord.utils.utcnow()
+        )
+        embed.add_field(name="Reason", value=reason, inline=False)
+        if failed:
+            embed.add_field(name="Failed", value=str(failed), inline=True)
+        if skipped:
+            embed.add_field(name="Skipped", value=f"{skipped} (not moderatable)", inline=True)
+        embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+        
+        await ctx.send(embed=embed)
+        
+        if banned:
+            await self.logger.log_action(ctx.guild.id, {
+                'action': 'massban',
+                'moderator_id': ctx.author.id,
+                'reason': f"{reason} ({len(banned)} users)"
+            })
+            
+    @commands.command(name='masswarn')
+    @has_mod_permissions()
+    async def mass_warn(self, ctx, users: commands.Greedy[discord.Object], *, reason: str = "No reason provided"):
+        targets, skipped = await self._mass_targets(ctx, users)
+        if not targets:
+            embed = discord.Embed(
+                title="❌ No Users To Warn",
+                description="Give the IDs or mentions of users you are allowed to moderate.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        user_ids = [user.id for user in targets]
+        warnings = await self.bot.db.add_warnings_bulk(ctx.guild.id, user_ids, ctx.author.id, reason)
+        await self.bot.db.log_moderation_actions_bulk(ctx.guild.id, user_ids, ctx.author.id, "warn", reason)
+        
+        embed = discord.Embed(
+            title="⚠️ Mass Warning",
+            description=f"Warned {len(warnings)} users.",
+            color=0xff9900,
+            timestamp=discord.utils.utcnow()
+        )
+        embed.add_field(name="Reason", value=reason, inline=False)
+        embed.add_field(
+            name="Total Warnings",
+            value="\n".join(f"<@{row['user_id']}>: {row['warning_count']}" for row in warnings[:10])
+                  + (f"\n...and {len(warnings) - 10} more" if len(warnings) > 10 else ""),
+            inline=False
+        )
+        if skipped:
+            embed.add_field(name="Skipped", value=f"{skipped} (not moderatable)", inline=True)
+        embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+        
+        await ctx.send(embed=embed)
+        
+        await self.logger.log_action(ctx.guild.id, {
+            'action': 'masswarn',
+            'moderator_id': ctx.author.id,
+            'reason': f"{reason} ({len(warnings)} users)"
+        })
+        
+    @commands.command(name='massclearwarns')
+    @has_mod_permissions()
+    async def mass_clear_warnings(self, ctx, users: commands.Greedy[discord.Object]):
+        targets, skipped = await self._mass_targets(ctx, users)
+        if not targets:
+            embed = discord.Embed(
+                title="❌ No Users To Clear",
+                description="Give the IDs or mentions of users you are allowed to moderate.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        removed = await self.bot.db.clear_warnings_bulk(ctx.guild.id, [user.id for user in targets])
+        cleared_users = sum(1 for count in removed.values() if count)
+        
+        embed = discord.Embed(
+            title="✅ Warnings Cleared",
+            description=f"Removed {sum(removed.values())} warnings from {cleared_users} of {len(removed)} users.",
+            color=0x00ff00
+        )
+        if skipped:
+            embed.add_field(name="Skipped", value=f"{skipped} (not moderatable)", inline=True)
+        await ctx.send(embed=embed)
+        
+        if cleared_users:
+            await self.logger.log_action(ctx.guild.id, {
+                'action': 'unwarn',
+                'moderator_id': ctx.author.id,
+                'reason': f"All warnings cleared ({cleared_users} users)"
+            })
+            
+    async def _mass_targets(self, ctx, users: List[discord.Object]) -> Tuple[List[discord.Object], int]:
+        """Deduplicate a mass action's users and drop the ones the moderator can't act on"""
+        targets = []
+        skipped = 0
+        for user in {user.id: user for user in users}.values():
+            member = ctx.guild.get_member(user.id)
+            if user.id in (ctx.author.id, ctx.me.id) or (member and not await can_moderate_user(ctx.author, member)):
+                skipped += 1
+                continue
+            targets.append(user)
+        return targets, skipped
+        
+    @commands.command(name='tempban')
+    @has_mod_permissions()
+    async def tempban_user(self, ctx, user: discord.Member, duration: str, *, reason: str = "No reason provided"):
+        if not await can_moderate_user(ctx.author, user):
+            embed = discord.Embed(
+                title="❌ Permission Denied",
+                description="You cannot moderate this user.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        missing_perms = await check_bot_permissions(ctx.channel, ['ban_members'])
+        if missing_perms:
+            embed = discord.Embed(
+                title="❌ Missing Permissions",
+                description="I need the 'Ban Members' permission to use this command.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        seconds = await self._parse_duration(ctx, duration)
+        if seconds is None:
+            return
+            
+        try:
+            dm_embed = discord.Embed(
+                title=f"🔨 Temporarily banned from {ctx.guild.name}",
+                description=f"You have been banned by {ctx.author.name} for {duration}.",
+                color=0xff0000
+            )
+            dm_embed.add_field(name="Reason", value=reason, inline=False)
+            
+            try:
+                await user.send(embed=dm_embed)
+            except discord.Forbidden:
+                pass
+                
+            await user.ban(reason=reason, delete_message_days=0)
+            await self.bot.scheduler.schedule(
+                ctx.guild.id, user.id, 'unban', seconds, ctx.author.id, reason
+            )
+            
+            embed = discord.Embed(
+                title="🔨 User Temporarily Banned",
+                description=f"{user.name}#{user.discriminator} has been banned.",
+                color=0xff0000,
+                timestamp=discord.utils.utcnow()
+            )
+            embed.add_field(name="Duration", value=duration, inline=True)
+            embed.add_field(name="Reason", value=reason, inline=False)
+            embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+            
+            await ctx.send(embed=embed)
+            
+            await self.bot.db.log_moderation_action(
+                ctx.guild.id, user.id, ctx.author.id, "tempban", reason, seconds
+            )
+            
+            await self.logger.log_action(ctx.guild.id, {
+                'action': 'tempban',
+                'user_id': user.id,
+                'moderator_id': ctx.author.id,
+                'reason': reason,
+                'duration': seconds
+            })
+            
+        except discord.Forbidden:
+            embed = discord.Embed(
+                title="❌ Permission Error",
+                description="I don't have permission to ban this user.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            
+    @commands.command(name='mute')
+    @has_mod_permissions()
+    async def mute_user(self, ctx, user: discord.Member, duration: str, *, reason: str = "No reason provided"):
+        if not await can_moderate_user(ctx.author, user):
+            embed = discord.Embed(
+                title="❌ Permission Denied",
+                description="You cannot moderate this user.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        mute_role = await self._get_mute_role(ctx)
+        if mute_role is None:
+            return
+            
+        seconds = await self._parse_duration(ctx, duration)
+        if seconds is None:
+            return
+            
+        try:
+            await user.add_roles(mute_role, reason=reason)
+            await self.bot.scheduler.schedule(
+                ctx.guild.id, user.id, 'unmute', seconds, ctx.author.id, reason, mute_role.id
+            )
+            
+            embed = discord.Embed(
+                title="🔇 User Muted",
+                description=f"{user.mention} has been muted.",
+                color=0xff6600,
+                timestamp=discord.utils.utcnow()
+            )
+            embed.add_field(name="Duration", value=duration, inline=True)
+            embed.add_field(name="Reason", value=reason, inline=False)
+            embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+            
+            await ctx.send(embed=embed)
+            
+            await self.bot.db.log_moderation_action(
+                ctx.guild.id, user.id, ctx.author.id, "mute", reason, seconds
+            )
+            
+            await self.logger.log_action(ctx.guild.id, {
+                'action': 'mute',
+                'user_id': user.id,
+                'moderator_id': ctx.author.id,
+                'reason': reason,
+                'duration': seconds
+            })
+            
+        except discord.Forbidden:
+            embed = discord.Embed(
+                title="❌ Permission Error",
+                description="I don't have permission to assign the mute role.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            
+    @commands.command(name='unmute')
+    @has_mod_permissions()
+    async def unmute_user(self, ctx, user: discord.Member, *, reason: str = "No reason provided"):
+        mute_role = await self._get_mute_role(ctx)
+        if mute_role is None:
+            return
+            
+        if mute_role not in user.roles:
+            embed = discord.Embed(
+                title="❌ User Not Muted",
+                description=f"{user.mention} is not currently muted.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return
+            
+        try:
+            await user.remove_roles(mute_role, reason=reason)
+            await self.bot.scheduler.cancel(ctx.guild.id, user.id, 'unmute')
+            
+            embed = discord.Embed(
+                title="✅ Mute Removed",
+                description=f"Mute removed for {user.mention}.",
+                color=0x00ff00
+            )
+            embed.add_field(name="Reason", value=reason, inline=False)
+            embed.add_field(name="Moderator", value=ctx.author.mention, inline=True)
+            
+            await ctx.send(embed=embed)
+            
+            await self.bot.db.log_moderation_action(
+                ctx.guild.id, user.id, ctx.author.id, "unmute", reason
+            )
+            
+            await self.logger.log_action(ctx.guild.id, {
+                'action': 'unmute',
+                'user_id': user.id,
+                'moderator_id': ctx.author.id,
+                'reason': reason
+            })
+            
+        except discord.Forbidden:
+            embed = discord.Embed(
+                title="❌ Permission Error",
+                description="I don't have permission to remove the mute role.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            
+    async def _parse_duration(self, ctx, duration: str) -> Optional[int]:
+        try:
+            seconds = parse_duration(duration)
+        except ValueError:
+            seconds = 0
+            
+        if seconds <= 0:
+            embed = discord.Embed(
+                title="❌ Invalid Duration",
+                description="Use a duration such as `30m`, `12h`, `7d` or a number of seconds.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return None
+            
+        # Checked before any Discord action, so an out-of-range expiry can't strand a ban
+        if seconds > MAX_DURATION:
+            embed = discord.Embed(
+                title="❌ Invalid Duration",
+                description=f"Durations are limited to {MAX_DURATION // 86400} days.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return None
+            
+        return seconds
+        
+    async def _get_mute_role(self, ctx) -> Optional[discord.Role]:
+        guild_config = await self.bot.db.get_guild_config(ctx.guild.id)
+        role_id = guild_config.get('mute_role')
+        mute_role = ctx.guild.get_role(role_id) if role_id else None
+        
+        if mute_role is None:
+            embed = discord.Embed(
+                title="❌ No Mute Role",
+                description=f"Set one first with `{ctx.prefix}config muterole <role>`.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return None
+            
+        missing_perms = await check_bot_permissions(ctx.channel, ['manage_roles'])
+        if missing_perms:
+            embed = discord.Embed(
+                title="❌ Missing Permissions",
+                description="I need the 'Manage Roles' permission to use this command.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed, delete_after=10)
+            return None
+            
+        return mute_role
+        
     @commands.command(name='unban')
     @has_mod_permissions()
     async def unban_user(self, ctx, user_id: int, *, reason: str = "No reason provided"):
@@ -442,6 +944,7 @@ class ModerationCog(commands.Cog):
                 return
                 
             await ctx.guild.unban(banned_user, reason=reason)
+            await self.bot.scheduler.cancel(ctx.guild.id, user_id, 'unban')
             
             embed = discord.Embed(
                 title="✅ User Unbanned",
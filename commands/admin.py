@@ -41,10 +41,11 @@ class AdminCommands:
     async def get_guild_statistics(self, guild: discord.Guild) -> dict:
         """Get comprehensive guild statistics"""
         try:
-            warnings = await self.bot.db.get_moderation_logs(guild.id, limit=1000)
-            recent_warnings = [w for w in warnings if 
-                             datetime.fromisoformat(w['created_at']) > 
-                             datetime.utcnow() - timedelta(days=30)]
+            # Both come from pre-aggregated counters, independent of history size
+            action_counts, recent_counts = await asyncio.gather(
+                self.bot.db.get_action_totals(guild.id),
+                self.bot.db.get_action_totals(guild.id, since=datetime.utcnow() - timedelta(days=30))
+            )
             
             member_stats = {
                 'total_members': guild.member_count,
@@ -59,12 +60,13 @@ class AdminCommands:
             }
             
             moderation_stats = {
-                'total_actions': len(warnings),
-                'recent_actions': len(recent_warnings),
-                'warns': len([w for w in warnings if w['action'] == 'warn']),
-                'timeouts': len([w for w in warnings if w['action'] == 'timeout']),
-                'kicks': len([w for w in warnings if w['action'] == 'kick']),
-                'bans': len([w for w in warnings if w['action'] == 'ban'])
+                'total_actions': sum(action_counts.values()),
+                'recent_actions': sum(recent_counts.values()),
+                'action_counts': action_counts,
+                'warns': action_counts.get('warn', 0),
+                'timeouts': action_counts.get('timeout', 0),
+                'kicks': action_counts.get('kick', 0),
+                'bans': action_counts.get('ban', 0)
             }
             
             return {
@@ -135,12 +137,22 @@ class AdminCommands:
         
         return embed
         
-    async def export_moderation_data(self, guild_id: int, format_type: str = "json") -> dict:
+    async def export_moderation_data(self, guild_id: int, format_type: str = "json",
+                                     limit: int = 10000) -> dict:
         """Export moderation data for backup/analysis"""
         try:
-            logs = await self.bot.db.get_moderation_logs(guild_id, limit=10000)
             guild_config = await self.bot.db.get_guild_config(guild_id)
+            logs = []
+            action_counts: Dict[str, int] = {}
             
+            # Summary counts are gathered in the same pass that pages through the logs
+            async for page in self.bot.db.iter_moderation_log_pages(guild_id):
+                for log in page[:limit - len(logs)]:
+                    logs.append(log)
+                    action_counts[log['action']] = action_counts.get(log['action'], 0) + 1
+                if len(logs) >= limit:
+                    break
+                    
             export_data = {
                 'export_info': {
                     'guild_id': guild_id,
@@ -156,16 +168,10 @@ class AdminCommands:
                         'oldest': logs[-1]['created_at'] if logs else None,
                         'newest': logs[0]['created_at'] if logs else None
                     },
-                    'action_counts': {}
+                    'action_counts': action_counts
                 }
             }
             
-            # Count actions
-            for log in logs:
-                action = log['action']
-                export_data['summary']['action_counts'][action] = \
-                    export_data['summary']['action_counts'].get(action, 0) + 1
-                    
             return export_data
         except Exception as e:
             self.bot.logger.error(f"Error exporting data: {e}")
@@ -335,26 +341,3 @@ class AdminCommands:
             )
             
         return embed
-        
-    async def cleanup_old_data(self, days: int = 30) -> dict:
-        """Clean up old moderation data"""
-        try:
-            await self.bot.db.cleanup_old_data()
-            
-            cleanup_result = {
-                'success': True,
-                'cleaned_at': datetime.utcnow().isoformat(),
-                'days_threshold': days,
-                'message': f"Cleaned up data older than {days} days"
-            }
-            
-            self.bot.logger.info(f"Database cleanup completed for data older than {days} days")
-            return cleanup_result
-            
-        except Exception as e:
-            self.bot.logger.error(f"Error during cleanup: {e}")
-            return {
-                'success': False,
-                'error': str(e),
-                'cleaned_at': datetime.utcnow().isoformat()
-            }
@@ -30,7 +30,10 @@ class ModerationCommands:
                 except discord.NotFound:
                     return None
             
-            warnings = await self.bot.db.get_user_warnings(guild.id, user_id)
+            warning_count, recent_warnings = await asyncio.gather(
+                self.bot.db.get_warning_count(guild.id, user_id),
+                self.bot.db.get_user_warnings(guild.id, user_id, limit=5)
+            )
             
             return {
                 'user': member,
@@ -42,8 +45,8 @@ class ModerationCommands:
                 'roles': [role.name for role in member.roles if role.name != '@everyone'],
                 'top_role': member.top_role.name,
                 'permissions': member.guild_permissions,
-                'warning_count': len(warnings),
-                'recent_warnings': warnings[:5],
+                'warning_count': warning_count,
+                'recent_warnings': recent_warnings,
                 'avatar_url': member.display_avatar.url,
                 'is_timed_out': member.is_timed_out(),
                 'timeout_until': member.timed_out_until if member.is_timed_out() else None
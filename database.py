@@ -1,143 +1,254 @@
+import asyncio
 import sqlite3
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Any
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, Any, Tuple, Union, AsyncIterator, Iterable
+from storage import SQLiteBackend
+
+LOG_COLUMNS = ('id', 'guild_id', 'user_id', 'moderator_id', 'action', 'reason', 'duration', 'created_at')
+WARNING_COLUMNS = ('id', 'guild_id', 'user_id', 'moderator_id', 'reason', 'created_at')
+PRUNABLE_TABLES = ('moderation_logs', 'warnings')
+SEARCH_TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+class ConfigConflictError(Exception):
+    """A compare-and-swap config patch lost a race with another write"""
+    
+    def __init__(self, guild_id: int, expected_version: int, actual_version: int):
+        super().__init__(
+            f"Config for guild {guild_id} is at version {actual_version}, expected {expected_version}"
+        )
+        self.guild_id = guild_id
+        self.expected_version = expected_version
+        self.actual_version = actual_version
 
 class Database:
-    def __init__(self, db_path: str = "moderation.db"):
+    def __init__(self, db_path: str = "moderation.db", pool_size: int = 4,
+                 flush_interval: float = 0.05, batch_size: int = 100, backend=None):
+        # Any object with the SQLiteBackend interface, e.g. a ShardedBackend
+        self.backend = backend or SQLiteBackend(db_path, pool_size, flush_interval, batch_size)
         self.db_path = db_path
         self.logger = logging.getLogger(__name__)
+        self._config_cache: Dict[int, Dict[str, Any]] = {}
+        self._config_generations: Dict[int, int] = {}
+        self.config_cache_hits = 0
+        self.config_cache_misses = 0
+        
+    @property
+    def shards(self) -> List[SQLiteBackend]:
+        return self.backend.shards
+        
+    def _shard(self, guild_id: int) -> SQLiteBackend:
+        return self.backend.for_guild(guild_id)
+        
+    def _scope(self, guild_id: Optional[int]) -> SQLiteBackend:
+        """Backend for a query on one guild, or on every guild when guild_id is None"""
+        if guild_id is not None:
+            return self._shard(guild_id)
+        if len(self.shards) > 1:
+            raise ValueError("Queries over all guilds must be run per shard on a sharded database")
+        return self.shards[0]
+        
+    async def flush(self):
+        """Wait until every write queued so far has been committed."""
+        await self.backend.flush()
         
     async def initialize(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS guilds (
-                guild_id INTEGER PRIMARY KEY,
-                config TEXT DEFAULT '{}',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS warnings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER,
-                user_id INTEGER,
-                moderator_id INTEGER,
-                reason TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (guild_id) REFERENCES guilds (guild_id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS moderation_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER,
-                user_id INTEGER,
-                moderator_id INTEGER,
-                action TEXT,
-                reason TEXT,
-                duration INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (guild_id) REFERENCES guilds (guild_id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_timeouts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER,
-                user_id INTEGER,
-                expires_at TIMESTAMP,
-                reason TEXT,
-                moderator_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (guild_id) REFERENCES guilds (guild_id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS spam_tracking (
-                user_id INTEGER,
-                guild_id INTEGER,
-                message_count INTEGER DEFAULT 0,
-                last_message_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                duplicate_count INTEGER DEFAULT 0,
-                last_message_content TEXT,
-                PRIMARY KEY (user_id, guild_id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        self.logger.info("Database initialized successfully")
+        version = await self.backend.initialize()
+        self.logger.info(
+            f"Database initialized successfully (schema v{version}, {len(self.shards)} shard(s), "
+            f"pool size {self.backend.pool_size})"
+        )
         
     async def add_guild(self, guild_id: int):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        await self._shard(guild_id).execute('''
             INSERT OR IGNORE INTO guilds (guild_id) VALUES (?)
         ''', (guild_id,))
         
-        conn.commit()
-        conn.close()
-        
     async def get_guild_config(self, guild_id: int) -> Dict[str, Any]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT config FROM guilds WHERE guild_id = ?', (guild_id,))
-        result = cursor.fetchone()
+        cached = self._config_cache.get(guild_id)
+        if cached is not None:
+            self.config_cache_hits += 1
+            return dict(cached)
+            
+        self.config_cache_misses += 1
+        generation = self._config_generations.get(guild_id, 0)
         
-        conn.close()
+        result = await self._shard(guild_id).fetchone('SELECT config FROM guilds WHERE guild_id = ?', (guild_id,))
+        config = json.loads(result[0]) if result and result[0] else {}
         
-        if result:
-            return json.loads(result[0]) if result[0] else {}
-        return {}
+        # Drop the result if the config was written while we were reading it
+        if self._config_generations.get(guild_id, 0) == generation:
+            self._config_cache[guild_id] = config
+            
+        return dict(config)
+        
+    async def warm_config_cache(self, guild_ids: List[int]):
+        generations = {guild_id: self._config_generations.get(guild_id, 0) for guild_id in guild_ids}
+        by_shard: Dict[SQLiteBackend, List[int]] = {}
+        for guild_id in generations:
+            by_shard.setdefault(self._shard(guild_id), []).append(guild_id)
+        loaded = 0
+        
+        for shard, guild_ids in by_shard.items():
+            for i in range(0, len(guild_ids), 500):
+                chunk = guild_ids[i:i + 500]
+                placeholders = ', '.join('?' * len(chunk))
+                rows = dict(await shard.fetchall(
+                    f'SELECT guild_id, config FROM guilds WHERE guild_id IN ({placeholders})',
+                    tuple(chunk)
+                ))
+                
+                for guild_id in chunk:
+                    if self._config_generations.get(guild_id, 0) != generations[guild_id]:
+                        continue
+                    raw = rows.get(guild_id)
+                    self._config_cache[guild_id] = json.loads(raw) if raw else {}
+                    loaded += 1
+                    
+        self.logger.info(f"Warmed guild config cache with {loaded} guilds")
+        
+    def invalidate_guild_config(self, guild_id: int):
+        self._config_generations[guild_id] = self._config_generations.get(guild_id, 0) + 1
+        self._config_cache.pop(guild_id, None)
+        
+    def get_config_cache_stats(self) -> Dict[str, Any]:
+        lookups = self.config_cache_hits + self.config_cache_misses
+        return {
+            'hits': self.config_cache_hits,
+            'misses': self.config_cache_misses,
+            'hit_rate': self.config_cache_hits / lookups if lookups else 0.0,
+            'size': len(self._config_cache)
+        }
         
     async def update_guild_config(self, guild_id: int, config: Dict[str, Any]):
-        await self.add_guild(guild_id)
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE guilds SET config = ? WHERE guild_id = ?
-        ''', (json.dumps(config), guild_id))
-        
-        conn.commit()
-        conn.close()
-        
-    async def add_warning(self, guild_id: int, user_id: int, moderator_id: int, reason: str):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO warnings (guild_id, user_id, moderator_id, reason)
-            VALUES (?, ?, ?, ?)
-        ''', (guild_id, user_id, moderator_id, reason))
-        
-        conn.commit()
-        conn.close()
-        
-    async def get_user_warnings(self, guild_id: int, user_id: int) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        def update(conn):
+            conn.execute('''
+                INSERT INTO guilds (guild_id, config) VALUES (?, ?)
+                ON CONFLICT (guild_id) DO UPDATE
+                SET config = excluded.config, config_version = config_version + 1
+            ''', (guild_id, json.dumps(config)))
+            
+        self.invalidate_guild_config(guild_id)
+        try:
+            await self._shard(guild_id).write(update)
+        finally:
+            self.invalidate_guild_config(guild_id)
+            
+        self._config_cache[guild_id] = dict(config)
+        
+    async def get_guild_config_versioned(self, guild_id: int) -> Tuple[Dict[str, Any], int]:
+        """Config and its version, for read-modify-write with patch_guild_config(expected_version=...)"""
+        result = await self._shard(guild_id).fetchone(
+            'SELECT config, config_version FROM guilds WHERE guild_id = ?', (guild_id,)
+        )
+        if not result:
+            return {}, 0
+        return (json.loads(result[0]) if result[0] else {}), result[1]
+        
+    @staticmethod
+    def _config_path(key: str) -> str:
+        if not key or '"' in key:
+            raise ValueError(f"Invalid config key: {key!r}")
+        return f'$."{key}"'
+        
+    async def patch_guild_config(self, guild_id: int, values: Optional[Dict[str, Any]] = None,
+                                 unset: Iterable[str] = (), expected_version: Optional[int] = None
+                                 ) -> Tuple[Dict[str, Any], int]:
+        """Set and/or remove individual config keys in one write.
+        
+        Only the named keys change, so concurrent patches to different keys never
+        overwrite each other. With expected_version the patch is a compare-and-swap
+        and raises ConfigConflictError if the config changed since it was read.
+        Returns the new config and version.
+        """
+        values = values or {}
+        unset = list(unset)
+        
+        expression = "COALESCE(config, '{}')"
+        params: List[Any] = []
+        if values:
+            expression = f"json_set({expression}, {', '.join('?, json(?)' for _ in values)})"
+            for key, value in values.items():
+                params.extend((self._config_path(key), json.dumps(value)))
+        if unset:
+            expression = f"json_remove({expression}, {', '.join('?' for _ in unset)})"
+            params.extend(self._config_path(key) for key in unset)
+            
+        def patch(conn):
+            row = conn.execute(
+                'SELECT config_version FROM guilds WHERE guild_id = ?', (guild_id,)
+            ).fetchone()
+            version = row[0] if row else 0
+            if expected_version is not None and version != expected_version:
+                raise ConfigConflictError(guild_id, expected_version, version)
+                
+            if row is None:
+                conn.execute('INSERT INTO guilds (guild_id) VALUES (?)', (guild_id,))
+                
+            return conn.execute(f'''
+                UPDATE guilds SET config = {expression}, config_version = config_version + 1
+                WHERE guild_id = ?
+                RETURNING config, config_version
+            ''', tuple(params) + (guild_id,)).fetchone()
+            
+        self.invalidate_guild_config(guild_id)
+        try:
+            raw, version = await self._shard(guild_id).write(patch)
+        finally:
+            self.invalidate_guild_config(guild_id)
+            
+        config = json.loads(raw)
+        self._config_cache[guild_id] = config
+        return dict(config), version
+        
+    @staticmethod
+    def _select_warning_count(conn: sqlite3.Connection, guild_id: int, user_id: int) -> int:
+        result = conn.execute('''
+            SELECT count FROM warning_counts WHERE guild_id = ? AND user_id = ?
+        ''', (guild_id, user_id)).fetchone()
+        return result[0] if result else 0
+        
+    async def get_warning_count(self, guild_id: int, user_id: int) -> int:
+        return await self._shard(guild_id).run(self._select_warning_count, guild_id, user_id)
+        
+    async def add_warning(self, guild_id: int, user_id: int, moderator_id: int, reason: str) -> int:
+        def add(conn):
+            conn.execute('''
+                INSERT INTO warnings (guild_id, user_id, moderator_id, reason)
+                VALUES (?, ?, ?, ?)
+            ''', (guild_id, user_id, moderator_id, reason))
+            return self._select_warning_count(conn, guild_id, user_id)
+            
+        return await self._shard(guild_id).write(add)
+        
+    async def record_violation(self, guild_id: int, user_id: int, moderator_id: int,
+                               warning_reason: str, action: str, log_reason: str) -> int:
+        """Add a warning and its log entry in one write, returning the user's new warning count"""
+        def record(conn):
+            conn.execute('''
+                INSERT INTO warnings (guild_id, user_id, moderator_id, reason)
+                VALUES (?, ?, ?, ?)
+            ''', (guild_id, user_id, moderator_id, warning_reason))
+            conn.execute('''
+                INSERT INTO moderation_logs (guild_id, user_id, moderator_id, action, reason)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (guild_id, user_id, moderator_id, action, log_reason))
+            return self._select_warning_count(conn, guild_id, user_id)
+            
+        return await self._shard(guild_id).write(record)
         
-        cursor.execute('''
+    async def get_user_warnings(self, guild_id: int, user_id: int,
+                                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        results = await self._shard(guild_id).fetchall('''
             SELECT id, moderator_id, reason, created_at
             FROM warnings
             WHERE guild_id = ? AND user_id = ?
-            ORDER BY created_at DESC
-        ''', (guild_id, user_id))
-        
-        results = cursor.fetchall()
-        conn.close()
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', (guild_id, user_id, -1 if limit is None else limit))
         
         warnings = []
         for result in results:
@@ -150,153 +261,613 @@ class Database:
             
         return warnings
         
-    async def remove_warning(self, warning_id: int) -> bool:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM warnings WHERE id = ?', (warning_id,))
-        success = cursor.rowcount > 0
-        
-        conn.commit()
-        conn.close()
-        
-        return success
+    async def remove_warning(self, guild_id: int, warning_id: int) -> bool:
+        rowcount = await self._shard(guild_id).execute(
+            'DELETE FROM warnings WHERE id = ? AND guild_id = ?', (warning_id, guild_id)
+        )
+        return rowcount > 0
         
     async def clear_user_warnings(self, guild_id: int, user_id: int):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        await self._shard(guild_id).execute('''
             DELETE FROM warnings WHERE guild_id = ? AND user_id = ?
         ''', (guild_id, user_id))
         
-        conn.commit()
-        conn.close()
-        
     async def log_moderation_action(self, guild_id: int, user_id: int, moderator_id: int, 
                                   action: str, reason: str, duration: Optional[int] = None):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        await self._shard(guild_id).execute('''
             INSERT INTO moderation_logs (guild_id, user_id, moderator_id, action, reason, duration)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (guild_id, user_id, moderator_id, action, reason, duration))
         
-        conn.commit()
-        conn.close()
+    @staticmethod
+    def _insert_many(conn: sqlite3.Connection, table: str, columns: Tuple[str, ...],
+                     rows: List[tuple]) -> List[int]:
+        """executemany an INSERT and return the new ids in input order"""
+        # AUTOINCREMENT hands out ids above the sequence in insert order, and
+        # nothing else writes while the writer holds the transaction
+        row = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows
+        )
+        return [result[0] for result in conn.execute(
+            f'SELECT id FROM {table} WHERE id > ? ORDER BY id', (row[0] if row else 0,)
+        )]
+        
+    @staticmethod
+    def _select_warning_counts(conn: sqlite3.Connection, guild_id: int, user_ids: List[int]) -> Dict[int, int]:
+        counts = {}
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            counts.update(conn.execute(f'''
+                SELECT user_id, count FROM warning_counts
+                WHERE guild_id = ? AND user_id IN ({', '.join('?' * len(chunk))})
+            ''', (guild_id, *chunk)))
+        return counts
+        
+    async def add_warnings_bulk(self, guild_id: int, user_ids: Iterable[int], moderator_id: int,
+                                reason: str) -> List[Dict[str, int]]:
+        """Warn many users in one transaction.
+        
+        Returns, per input row, the new warning id and the user's warning count
+        as of that warning, so a user listed twice gets a running count.
+        """
+        user_ids = list(user_ids)
+        
+        def add(conn):
+            ids = self._insert_many(
+                conn, 'warnings', ('guild_id', 'user_id', 'moderator_id', 'reason'),
+                [(guild_id, user_id, moderator_id, reason) for user_id in user_ids]
+            )
+            counts = self._select_warning_counts(conn, guild_id, list(set(user_ids)))
+            
+            # Walk backwards from each user's final count, one step per repeated row
+            results = []
+            for warning_id, user_id in reversed(list(zip(ids, user_ids))):
+                count = counts.get(user_id, 0)
+                counts[user_id] = count - 1
+                results.append({'id': warning_id, 'user_id': user_id, 'warning_count': count})
+            results.reverse()
+            return results
+            
+        if not user_ids:
+            return []
+        return await self._shard(guild_id).write(add)
+        
+    async def log_moderation_actions_bulk(self, guild_id: int, user_ids: Iterable[int], moderator_id: int,
+                                          action: str, reason: str, duration: Optional[int] = None
+                                          ) -> List[int]:
+        """Log the same action against many users in one transaction; returns the log ids in input order"""
+        rows = [(guild_id, user_id, moderator_id, action, reason, duration) for user_id in user_ids]
+        
+        def log(conn):
+            return self._insert_many(
+                conn, 'moderation_logs',
+                ('guild_id', 'user_id', 'moderator_id', 'action', 'reason', 'duration'), rows
+            )
+            
+        if not rows:
+            return []
+        return await self._shard(guild_id).write(log)
+        
+    async def clear_warnings_bulk(self, guild_id: int, user_ids: Iterable[int]) -> Dict[int, int]:
+        """Clear many users' warnings in one transaction; returns user id -> warnings removed"""
+        user_ids = list(set(user_ids))
+        
+        def clear(conn):
+            counts = self._select_warning_counts(conn, guild_id, user_ids)
+            conn.executemany(
+                'DELETE FROM warnings WHERE guild_id = ? AND user_id = ?',
+                [(guild_id, user_id) for user_id in user_ids]
+            )
+            return {user_id: counts.get(user_id, 0) for user_id in user_ids}
+            
+        if not user_ids:
+            return {}
+        return await self._shard(guild_id).write(clear)
+        
+    @staticmethod
+    def _to_utc(value: datetime) -> datetime:
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+        
+    def _rollup_spans(self, since: Optional[datetime],
+                      until: Optional[datetime]) -> List[Tuple[str, str, str]]:
+        """Split [since, until) into (table, first bucket, end bucket) spans.
+        
+        Whole days are read from the daily rollup and only the partial days at
+        either end from the hourly one, so any range costs O(days + 48) buckets.
+        The range is widened to whole hours.
+        """
+        since = self._to_utc(since).replace(minute=0, second=0, microsecond=0) if since else \
+            datetime(1970, 1, 1, tzinfo=timezone.utc)
+        until = self._to_utc(until or datetime.now(timezone.utc))
+        if until.minute or until.second or until.microsecond:
+            until = until.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            
+        if until <= since:
+            return []
+            
+        day_start = since.replace(hour=0)
+        if day_start < since:
+            day_start += timedelta(days=1)
+        day_end = until.replace(hour=0)
+        
+        hour = self._format_timestamp
+        if day_start >= day_end:
+            return [('action_rollups_hourly', hour(since), hour(until))]
+            
+        spans = []
+        if since < day_start:
+            spans.append(('action_rollups_hourly', hour(since), hour(day_start)))
+        spans.append(('action_rollups_daily', day_start.strftime('%Y-%m-%d'), day_end.strftime('%Y-%m-%d')))
+        if day_end < until:
+            spans.append(('action_rollups_hourly', hour(day_end), hour(until)))
+        return spans
+        
+    async def get_action_totals(self, guild_id: int, since: Optional[datetime] = None,
+                                until: Optional[datetime] = None) -> Dict[str, int]:
+        """Action -> count for a guild, over all time or an hour-aligned range"""
+        if since is None and until is None:
+            return dict(await self._shard(guild_id).fetchall(
+                'SELECT action, count FROM action_totals WHERE guild_id = ?', (guild_id,)
+            ))
+            
+        spans = self._rollup_spans(since, until)
+        
+        def totals(conn):
+            counts: Dict[str, int] = {}
+            for table, first, end in spans:
+                for action, count in conn.execute(f'''
+                    SELECT action, SUM(count) FROM {table}
+                    WHERE guild_id = ? AND bucket >= ? AND bucket < ?
+                    GROUP BY action
+                ''', (guild_id, first, end)):
+                    counts[action] = counts.get(action, 0) + count
+            return counts
+            
+        return await self._shard(guild_id).run(totals)
+        
+    async def get_action_trend(self, guild_id: int, since: datetime, until: Optional[datetime] = None,
+                               granularity: str = 'day', action: Optional[str] = None
+                               ) -> Dict[str, Dict[str, int]]:
+        """Bucket -> {action: count} in bucket order; buckets with no actions are omitted"""
+        if granularity == 'hour':
+            table = 'action_rollups_hourly'
+            first = self._format_timestamp(self._to_utc(since).replace(minute=0, second=0, microsecond=0))
+            end = self._format_timestamp(self._to_utc(until)) if until else '9999'
+        elif granularity == 'day':
+            table = 'action_rollups_daily'
+            first = self._to_utc(since).strftime('%Y-%m-%d')
+            end = '9999'
+            if until:
+                # A partial last day is included, matching the hourly widening
+                until = self._to_utc(until)
+                if until.time() != datetime.min.time():
+                    until += timedelta(days=1)
+                end = until.strftime('%Y-%m-%d')
+        else:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+            
+        query = f'''
+            SELECT bucket, action, count FROM {table}
+            WHERE guild_id = ? AND bucket >= ? AND bucket < ?
+        '''
+        params: Tuple[Any, ...] = (guild_id, first, end)
+        if action is not None:
+            query += ' AND action = ?'
+            params += (action,)
+            
+        trend: Dict[str, Dict[str, int]] = {}
+        for bucket, bucket_action, count in await self._shard(guild_id).fetchall(query + ' ORDER BY bucket', params):
+            trend.setdefault(bucket, {})[bucket_action] = count
+        return trend
         
     async def get_moderation_logs(self, guild_id: int, limit: int = 50) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT user_id, moderator_id, action, reason, duration, created_at
-            FROM moderation_logs
-            WHERE guild_id = ?
-            ORDER BY created_at DESC
-            LIMIT ?
-        ''', (guild_id, limit))
-        
-        results = cursor.fetchall()
-        conn.close()
-        
-        logs = []
-        for result in results:
-            logs.append({
-                'user_id': result[0],
-                'moderator_id': result[1],
-                'action': result[2],
-                'reason': result[3],
-                'duration': result[4],
-                'created_at': result[5]
-            })
-            
+        logs, _ = await self.get_moderation_logs_page(guild_id, limit=limit)
         return logs
         
-    async def update_spam_tracking(self, guild_id: int, user_id: int, message_content: str):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        now = datetime.now()
-        one_minute_ago = now - timedelta(minutes=1)
-        
-        cursor.execute('''
-            SELECT message_count, duplicate_count, last_message_content, last_message_time
-            FROM spam_tracking
-            WHERE guild_id = ? AND user_id = ?
-        ''', (guild_id, user_id))
-        
-        result = cursor.fetchone()
-        
-        if result:
-            last_message_time = datetime.fromisoformat(result[3])
+    @staticmethod
+    def _format_timestamp(value: Union[datetime, str]) -> str:
+        # Matches the CURRENT_TIMESTAMP format (UTC) the tables are written with
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc)
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        return value
+        
+    async def _fetch_page(self, table: str, columns: Tuple[str, ...], guild_id: Optional[int],
+                          before_id: Optional[int], limit: int, filters: Dict[str, Any],
+                          since: Optional[Union[datetime, str]], until: Optional[Union[datetime, str]],
+                          shard: Optional[SQLiteBackend] = None):
+        clauses = []
+        params: List[Any] = []
+        
+        if guild_id is not None:
+            clauses.append('guild_id = ?')
+            params.append(guild_id)
             
-            if last_message_time < one_minute_ago:
-                message_count = 1
-                duplicate_count = 0
-            else:
-                message_count = result[0] + 1
-                duplicate_count = result[1] + 1 if result[2] == message_content else 0
+        for column, value in filters.items():
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
                 
-            cursor.execute('''
-                UPDATE spam_tracking
-                SET message_count = ?, duplicate_count = ?, 
-                    last_message_content = ?, last_message_time = ?
-                WHERE guild_id = ? AND user_id = ?
-            ''', (message_count, duplicate_count, message_content, now.isoformat(), guild_id, user_id))
-        else:
-            cursor.execute('''
-                INSERT INTO spam_tracking (guild_id, user_id, message_count, duplicate_count, 
-                                         last_message_content, last_message_time)
-                VALUES (?, ?, 1, 0, ?, ?)
-            ''', (guild_id, user_id, message_content, now.isoformat()))
-            
-        conn.commit()
-        conn.close()
-        
-    async def get_spam_stats(self, guild_id: int, user_id: int) -> Dict[str, Any]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT message_count, duplicate_count, last_message_time
-            FROM spam_tracking
-            WHERE guild_id = ? AND user_id = ?
-        ''', (guild_id, user_id))
+        if since is not None:
+            clauses.append('created_at >= ?')
+            params.append(self._format_timestamp(since))
+        if until is not None:
+            clauses.append('created_at < ?')
+            params.append(self._format_timestamp(until))
+            
+        # Keyset pagination: resume strictly after the cursor row in (created_at, id) order,
+        # which the (guild_id, ..., created_at) indexes serve without an OFFSET scan
+        if before_id is not None:
+            clauses.append(f'(created_at, id) < (SELECT created_at, id FROM {table} WHERE id = ?)')
+            params.append(before_id)
+            
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        results = await (shard or self._scope(guild_id)).fetchall(f'''
+            SELECT {', '.join(columns)}
+            FROM {table}
+            {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', tuple(params) + (limit,))
+        
+        rows = [dict(zip(columns, result)) for result in results]
+        next_before_id = rows[-1]['id'] if len(rows) == limit else None
+        return rows, next_before_id
+        
+    async def get_moderation_logs_page(self, guild_id: Optional[int], before_id: Optional[int] = None,
+                                       limit: int = 50, action: Optional[str] = None,
+                                       user_id: Optional[int] = None, moderator_id: Optional[int] = None,
+                                       since: Optional[Union[datetime, str]] = None,
+                                       until: Optional[Union[datetime, str]] = None
+                                       ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Newest-first page of logs older than before_id, plus the cursor for the next page"""
+        return await self._fetch_page(
+            'moderation_logs', LOG_COLUMNS, guild_id, before_id, limit,
+            {'action': action, 'user_id': user_id, 'moderator_id': moderator_id},
+            since, until
+        )
+        
+    async def get_warnings_page(self, guild_id: Optional[int], before_id: Optional[int] = None,
+                                limit: int = 50, user_id: Optional[int] = None,
+                                moderator_id: Optional[int] = None,
+                                since: Optional[Union[datetime, str]] = None,
+                                until: Optional[Union[datetime, str]] = None
+                                ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Newest-first page of warnings older than before_id, plus the cursor for the next page"""
+        return await self._fetch_page(
+            'warnings', WARNING_COLUMNS, guild_id, before_id, limit,
+            {'user_id': user_id, 'moderator_id': moderator_id},
+            since, until
+        )
+        
+    async def _iter_pages(self, table: str, columns: Tuple[str, ...], guild_id: Optional[int],
+                          page_size: int, filters: Dict[str, Any], since: Optional[Union[datetime, str]],
+                          until: Optional[Union[datetime, str]]) -> AsyncIterator[List[Dict[str, Any]]]:
+        # Without a guild every shard is walked in turn, so order is newest first per shard
+        shards = [self._shard(guild_id)] if guild_id is not None else self.shards
+        for shard in shards:
+            before_id = None
+            while True:
+                rows, before_id = await self._fetch_page(
+                    table, columns, guild_id, before_id, page_size, filters, since, until, shard
+                )
+                if rows:
+                    yield rows
+                if before_id is None:
+                    break
+                    
+    async def iter_moderation_log_pages(self, guild_id: Optional[int], page_size: int = 500,
+                                        action: Optional[str] = None, user_id: Optional[int] = None,
+                                        moderator_id: Optional[int] = None,
+                                        since: Optional[Union[datetime, str]] = None,
+                                        until: Optional[Union[datetime, str]] = None
+                                        ) -> AsyncIterator[List[Dict[str, Any]]]:
+        filters = {'action': action, 'user_id': user_id, 'moderator_id': moderator_id}
+        async for logs in self._iter_pages('moderation_logs', LOG_COLUMNS, guild_id, page_size,
+                                           filters, since, until):
+            yield logs
+            
+    async def iter_moderation_logs(self, guild_id: Optional[int], page_size: int = 500,
+                                   **filters) -> AsyncIterator[Dict[str, Any]]:
+        async for logs in self.iter_moderation_log_pages(guild_id, page_size, **filters):
+            for log in logs:
+                yield log
+                
+    async def iter_warnings(self, guild_id: Optional[int], page_size: int = 500,
+                            user_id: Optional[int] = None, moderator_id: Optional[int] = None,
+                            since: Optional[Union[datetime, str]] = None,
+                            until: Optional[Union[datetime, str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        filters = {'user_id': user_id, 'moderator_id': moderator_id}
+        async for warnings in self._iter_pages('warnings', WARNING_COLUMNS, guild_id, page_size,
+                                               filters, since, until):
+            for warning in warnings:
+                yield warning
+                
+    @staticmethod
+    def _fts_query(query: str) -> Optional[str]:
+        """Turn free text into a safe FTS5 expression.
+        
+        Every word (or "quoted phrase") becomes a quoted phrase so FTS5 syntax
+        in user input is never interpreted; a trailing * keeps prefix matching.
+        """
+        terms = []
+        for phrase, word in SEARCH_TERM_PATTERN.findall(query):
+            text = phrase or word
+            prefix = text.endswith('*') and not phrase
+            text = text.rstrip('*').replace('"', '""')
+            if text:
+                terms.append(f'"{text}"' + ('*' if prefix else ''))
+                
+        return ' '.join(terms) or None
         
-        result = cursor.fetchone()
-        conn.close()
+    async def search_cases(self, guild_id: int, query: str, limit: int = 10, offset: int = 0,
+                           kinds: Iterable[str] = ('warning', 'log')) -> Tuple[List[Dict[str, Any]], bool]:
+        """Warnings and/or log entries whose reason matches query, best match first.
         
-        if result:
-            last_message_time = datetime.fromisoformat(result[2])
-            one_minute_ago = datetime.now() - timedelta(minutes=1)
+        Returns one page of hits and whether there are more after it.
+        """
+        expression = self._fts_query(query)
+        if expression is None:
+            return [], False
             
-            if last_message_time < one_minute_ago:
-                return {'message_count': 0, 'duplicate_count': 0}
-            else:
-                return {'message_count': result[0], 'duplicate_count': result[1]}
-        
-        return {'message_count': 0, 'duplicate_count': 0}
+        match = f'guild_id : "{int(guild_id)}" AND reason : ({expression})'
+        selects = []
+        params: List[Any] = []
+        
+        if 'warning' in kinds:
+            selects.append('''
+                SELECT 'warning', w.id, w.user_id, w.moderator_id, 'warn', w.reason,
+                       snippet(warnings_fts, 0, '**', '**', '…', 16), w.created_at, warnings_fts.rank
+                FROM warnings_fts JOIN warnings w ON w.id = warnings_fts.rowid
+                WHERE warnings_fts MATCH ?
+            ''')
+            params.append(match)
+        if 'log' in kinds:
+            selects.append('''
+                SELECT 'log', l.id, l.user_id, l.moderator_id, l.action, l.reason,
+                       snippet(moderation_logs_fts, 0, '**', '**', '…', 16), l.created_at, moderation_logs_fts.rank
+                FROM moderation_logs_fts JOIN moderation_logs l ON l.id = moderation_logs_fts.rowid
+                WHERE moderation_logs_fts MATCH ?
+            ''')
+            params.append(match)
+            
+        if not selects:
+            return [], False
+            
+        results = await self._shard(guild_id).fetchall(
+            ' UNION ALL '.join(selects) + ' ORDER BY 9, 8 DESC LIMIT ? OFFSET ?',
+            tuple(params) + (limit + 1, offset)
+        )
+        
+        columns = ('kind', 'id', 'user_id', 'moderator_id', 'action', 'reason', 'snippet', 'created_at', 'rank')
+        hits = [dict(zip(columns, result)) for result in results[:limit]]
+        return hits, len(results) > limit
+        
+    async def rebuild_search_index(self):
+        def rebuild(conn):
+            for table in ('warnings_fts', 'moderation_logs_fts'):
+                conn.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+                
+        await self._on_all_shards('write', rebuild)
+        
+    async def schedule_action(self, guild_id: int, user_id: int, action: str, expires_at: datetime,
+                              moderator_id: int, reason: str, role_id: Optional[int] = None
+                              ) -> Tuple[int, List[int]]:
+        """Persist a pending expiration, replacing any pending one of the same kind for the user.
+        
+        Returns the new row id and the ids it replaced.
+        """
+        def schedule(conn):
+            replaced = [row[0] for row in conn.execute('''
+                DELETE FROM user_timeouts
+                WHERE guild_id = ? AND user_id = ? AND action = ?
+                RETURNING id
+            ''', (guild_id, user_id, action))]
+            cursor = conn.execute('''
+                INSERT INTO user_timeouts (guild_id, user_id, action, role_id, expires_at, reason, moderator_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (guild_id, user_id, action, role_id, self._format_timestamp(expires_at), reason, moderator_id))
+            return cursor.lastrowid, replaced
+            
+        return await self._shard(guild_id).write(schedule)
+        
+    async def cancel_scheduled_actions(self, guild_id: int, user_id: int, action: str) -> List[int]:
+        def cancel(conn):
+            return [row[0] for row in conn.execute('''
+                DELETE FROM user_timeouts
+                WHERE guild_id = ? AND user_id = ? AND action = ?
+                RETURNING id
+            ''', (guild_id, user_id, action))]
+            
+        return await self._shard(guild_id).write(cancel)
+        
+    async def cancel_scheduled_actions_bulk(self, guild_id: int, user_ids: Iterable[int],
+                                            action: str) -> List[int]:
+        """Cancel one kind of pending expiration for many users in one transaction"""
+        user_ids = list(set(user_ids))
+        
+        def cancel(conn):
+            cancelled = []
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start:start + 500]
+                cancelled.extend(row[0] for row in conn.execute(f'''
+                    DELETE FROM user_timeouts
+                    WHERE guild_id = ? AND action = ? AND user_id IN ({', '.join('?' * len(chunk))})
+                    RETURNING id
+                ''', (guild_id, action, *chunk)))
+            return cancelled
+            
+        if not user_ids:
+            return []
+        return await self._shard(guild_id).write(cancel)
+        
+    async def complete_scheduled_actions(self, actions: Iterable[Tuple[int, int]]):
+        """Delete finished expirations, given as (guild_id, action_id) pairs"""
+        by_shard: Dict[SQLiteBackend, List[int]] = {}
+        for guild_id, action_id in actions:
+            by_shard.setdefault(self._shard(guild_id), []).append(action_id)
+            
+        def complete(conn, action_ids):
+            for start in range(0, len(action_ids), 500):
+                chunk = action_ids[start:start + 500]
+                conn.execute(
+                    f"DELETE FROM user_timeouts WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+                
+        if by_shard:
+            await asyncio.gather(*(shard.write(complete, ids) for shard, ids in by_shard.items()))
+            
+    async def reschedule_action(self, guild_id: int, action_id: int, expires_at: datetime):
+        await self._shard(guild_id).execute('''
+            UPDATE user_timeouts SET expires_at = ? WHERE id = ?
+        ''', (self._format_timestamp(expires_at), action_id))
+        
+    async def iter_scheduled_actions(self, page_size: int = 5000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Every pending expiration in pages, in id order within each shard"""
+        columns = ('id', 'guild_id', 'user_id', 'action', 'role_id', 'expires_at')
+        for shard in self.shards:
+            after_id = 0
+            while True:
+                results = await shard.fetchall(f'''
+                    SELECT {', '.join(columns)}
+                    FROM user_timeouts
+                    WHERE id > ?
+                    ORDER BY id
+                    LIMIT ?
+                ''', (after_id, page_size))
+                
+                if not results:
+                    break
+                yield [dict(zip(columns, result)) for result in results]
+                after_id = results[-1][0]
+                
+    async def _on_all_shards(self, method: str, *args) -> List[Any]:
+        """Call a backend method on every shard concurrently; results in shard order"""
+        return await asyncio.gather(*(getattr(shard, method)(*args) for shard in self.shards))
+        
+    async def get_retention_overrides(self) -> Dict[int, Dict[str, Optional[int]]]:
+        """Per-guild log/warning retention days set in guild configs"""
+        results = await self._on_all_shards('fetchall', '''
+            SELECT guild_id,
+                   json_extract(config, '$.log_retention_days'),
+                   json_extract(config, '$.warning_retention_days')
+            FROM guilds
+            WHERE json_extract(config, '$.log_retention_days') IS NOT NULL
+               OR json_extract(config, '$.warning_retention_days') IS NOT NULL
+        ''')
         
-    async def cleanup_old_data(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        return {
+            guild_id: {'moderation_logs': log_days, 'warnings': warning_days}
+            for rows in results
+            for guild_id, log_days, warning_days in rows
+        }
         
-        thirty_days_ago = datetime.now() - timedelta(days=30)
+    async def get_guild_ids_with_rows(self, table: str) -> List[int]:
+        if table not in PRUNABLE_TABLES:
+            raise ValueError(f"Cannot prune table {table}")
+            
+        results = await self._on_all_shards('fetchall', f'SELECT DISTINCT guild_id FROM {table}')
+        return [result[0] for rows in results for result in rows if result[0] is not None]
         
-        cursor.execute('''
-            DELETE FROM spam_tracking 
-            WHERE last_message_time < ?
-        ''', (thirty_days_ago.isoformat(),))
+    async def prune_chunk(self, table: str, guild_id: int, before: datetime,
+                          chunk_size: int) -> Tuple[int, float]:
+        """Delete up to chunk_size of a guild's rows older than before.
         
-        cursor.execute('''
-            DELETE FROM user_timeouts 
-            WHERE expires_at < ?
-        ''', (datetime.now().isoformat(),))
+        Returns the rows deleted and how long the statement held the write lock.
+        """
+        if table not in PRUNABLE_TABLES:
+            raise ValueError(f"Cannot prune table {table}")
+            
+        cutoff = self._format_timestamp(before)
+        
+        def prune(conn):
+            start = time.perf_counter()
+            deleted = conn.execute(f'''
+                DELETE FROM {table}
+                WHERE id IN (
+                    SELECT id FROM {table}
+                    WHERE guild_id = ? AND created_at < ?
+                    ORDER BY created_at
+                    LIMIT ?
+                )
+            ''', (guild_id, cutoff, chunk_size)).rowcount
+            return deleted, time.perf_counter() - start
+            
+        return await self._shard(guild_id).write(prune)
+        
+    async def get_storage_stats(self) -> Dict[str, int]:
+        """Page counts summed over all shards"""
+        def stats(conn):
+            return {
+                pragma: conn.execute(f'PRAGMA {pragma}').fetchone()[0]
+                for pragma in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum')
+            }
+            
+        shards = await self._on_all_shards('run', stats)
+        return {
+            'page_size': shards[0]['page_size'],
+            'page_count': sum(shard['page_count'] for shard in shards),
+            'freelist_count': sum(shard['freelist_count'] for shard in shards),
+            # incremental_vacuum is a no-op on shards that are not in incremental mode
+            'auto_vacuum': max(shard['auto_vacuum'] for shard in shards)
+        }
+        
+    async def incremental_vacuum(self, max_pages: int) -> Tuple[int, float]:
+        """Return up to max_pages free pages per shard to the filesystem; returns (pages, seconds)"""
+        def vacuum(conn):
+            start = time.perf_counter()
+            before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            # executescript steps the pragma to completion; execute() frees a single page
+            conn.executescript(f'PRAGMA incremental_vacuum({int(max_pages)})')
+            after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            return before - after, time.perf_counter() - start
+            
+        results = await self._on_all_shards('run_on_writer', vacuum)
+        return sum(pages for pages, _ in results), sum(seconds for _, seconds in results)
+        
+    async def optimize(self) -> float:
+        def optimize(conn):
+            start = time.perf_counter()
+            conn.execute('PRAGMA optimize').fetchall()
+            # Bounded incremental merge of full-text index segments
+            for table in ('warnings_fts', 'moderation_logs_fts'):
+                conn.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('merge', 500)")
+            return time.perf_counter() - start
+            
+        return sum(await self._on_all_shards('run_on_writer', optimize))
+        
+    async def vacuum(self) -> float:
+        """Full VACUUM; also switches databases created before auto_vacuum to incremental mode"""
+        def vacuum(conn):
+            start = time.perf_counter()
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('VACUUM')
+            return time.perf_counter() - start
+            
+        # One shard at a time; a full VACUUM rewrites the whole file
+        seconds = 0.0
+        for shard in self.shards:
+            seconds += await shard.run_on_writer(vacuum)
+        return seconds
         
-        conn.commit()
-        conn.close()
+    async def cleanup_old_data(self):
+        # Pending expirations belong to the scheduler; only drop ones it has missed for a day
+        stale_before = self._format_timestamp(datetime.now(timezone.utc) - timedelta(days=1))
+        
+        def cleanup(conn):
+            conn.execute('''
+                DELETE FROM user_timeouts 
+                WHERE expires_at < ?
+            ''', (stale_before,))
+            
+        await self._on_all_shards('write', cleanup)
         
     async def close(self):
-        pass
+        await self.backend.close()
+        self.logger.info("Database connection pool closed")
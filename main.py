@@ -1,16 +1,19 @@
 import discord
 from discord.ext import commands
-import json
 import logging
 import os
 import asyncio
 from database import Database
+from storage import ShardedBackend
 from utils.logging import setup_logging
+from utils.permissions import RoleResolver
+from utils.config import ConfigService, BotConfig
+from utils.scheduler import ActionScheduler
 
 class ModerationBot(commands.Bot):
     def __init__(self):
-        with open('config.json', 'r') as f:
-            self.config = json.load(f)
+        self.config_service = ConfigService('config.json')
+        self.config_service.load()
         
         intents = discord.Intents.default()
         intents.message_content = True
@@ -18,27 +21,67 @@ class ModerationBot(commands.Bot):
         intents.guilds = True
         
         super().__init__(
-            command_prefix=self.config['prefix'],
+            command_prefix=lambda bot, message: bot.config.prefix,
             intents=intents,
             help_command=None
         )
         
-        self.db = Database()
-        self.logger = setup_logging()
+        db_config = self.config.section('database')
+        db_options = {
+            'pool_size': db_config.get('pool_size', 4),
+            'flush_interval': db_config.get('flush_interval_ms', 50) / 1000,
+            'batch_size': db_config.get('write_batch_size', 100)
+        }
+        backend = None
+        if db_config.get('shards', 1) > 1:
+            backend = ShardedBackend.from_pattern(
+                db_config.get('shard_path', 'moderation-{shard}.db'), db_config['shards'], **db_options
+            )
+        self.db = Database(db_config.get('path', 'moderation.db'), backend=backend, **db_options)
+        scheduler_config = self.config.section('scheduler')
+        self.scheduler = ActionScheduler(
+            self.db,
+            batch_size=scheduler_config.get('batch_size', 25),
+            batch_interval=scheduler_config.get('batch_interval', 1.0),
+            retry_delay=scheduler_config.get('retry_delay', 60),
+            max_attempts=scheduler_config.get('max_attempts', 5)
+        )
+        self.logger = setup_logging(self.config.section('logging'))
+        self.role_resolver = RoleResolver(self.config.moderation_roles, self.config.immune_roles)
+        self.config_service.add_listener(self._on_config_reload)
+        
+    @property
+    def config(self) -> BotConfig:
+        return self.config_service.snapshot
+        
+    def _on_config_reload(self, config: BotConfig):
+        self.role_resolver.update_roles(config.moderation_roles, config.immune_roles)
+        logging.getLogger().setLevel(config.section('logging').get('level', 'INFO'))
         
     async def setup_hook(self):
+        self.config_service.start()
         await self.db.initialize()
         await self.load_extension('cogs.moderation_cog')
         await self.load_extension('cogs.automod_cog')
         await self.load_extension('cogs.admin_cog')
+        await self.load_extension('cogs.maintenance_cog')
+        # Handlers are registered by the cogs; nothing fires until the bot is ready
+        await self.scheduler.start(self.wait_until_ready)
+        
+    async def close(self):
+        self.config_service.stop()
+        await self.scheduler.stop()
+        await super().close()
         
     async def on_ready(self):
         self.logger.info(f'{self.user} has connected to Discord!')
         self.logger.info(f'Bot is ready and serving {len(self.guilds)} guilds')
         
+        await self.db.warm_config_cache([guild.id for guild in self.guilds])
+        
         activity = discord.Activity(
             type=discord.ActivityType.watching,
-            name=f"{len(self.guilds)} servers | {self.config['prefix']}help"
+            name=f"{len(self.guilds)} servers | {self.config.prefix}help"
         )
         await self.change_presence(activity=activity)
         
@@ -48,14 +91,14 @@ class ModerationBot(commands.Bot):
         
         embed = discord.Embed(
             title="Thanks for adding me!",
-            description=f"Use `{self.config['prefix']}help` to get started with moderation commands.",
+            description=f"Use `{self.config.prefix}help` to get started with moderation commands.",
             color=0x00ff00
         )
         embed.add_field(
             name="Getting Started",
-            value=f"• Set up auto-mod: `{self.config['prefix']}automod setup`\n"
-                  f"• Configure settings: `{self.config['prefix']}config`\n"
-                  f"• View all commands: `{self.config['prefix']}help`",
+            value=f"• Set up auto-mod: `{self.config.prefix}automod setup`\n"
+                  f"• Configure settings: `{self.config.prefix}config`\n"
+                  f"• View all commands: `{self.config.prefix}help`",
             inline=False
         )
         
@@ -65,6 +108,31 @@ class ModerationBot(commands.Bot):
             except discord.Forbidden:
                 pass
                 
+    async def on_guild_remove(self, guild):
+        self.logger.info(f'Removed from guild: {guild.name} (ID: {guild.id})')
+        self.db.invalidate_guild_config(guild.id)
+        self.role_resolver.invalidate_guild(guild.id)
+        
+    async def on_guild_update(self, before, after):
+        if before.owner_id != after.owner_id:
+            self.role_resolver.invalidate_guild(after.id)
+            
+    async def on_guild_role_create(self, role):
+        self.role_resolver.invalidate_guild(role.guild.id)
+        
+    async def on_guild_role_update(self, before, after):
+        self.role_resolver.invalidate_guild(after.guild.id)
+        
+    async def on_guild_role_delete(self, role):
+        self.role_resolver.invalidate_guild(role.guild.id)
+        
+    async def on_member_update(self, before, after):
+        if before.roles != after.roles:
+            self.role_resolver.invalidate_member(after.guild.id, after.id)
+            
+    async def on_member_remove(self, member):
+        self.role_resolver.invalidate_member(member.guild.id, member.id)
+        
     async def on_member_join(self, member):
         guild_config = await self.db.get_guild_config(member.guild.id)
         if guild_config and guild_config.get('welcome_enabled', False):
@@ -74,7 +142,7 @@ class ModerationBot(commands.Bot):
                 if channel:
                     welcome_message = guild_config.get('welcome_message', 
                         f'Welcome to {member.guild.name}, {member.mention}!')
-                    
+                        
                     embed = discord.Embed(
                         title="Welcome!",
                         description=welcome_message,
@@ -0,0 +1,318 @@
+import logging
+import sqlite3
+from typing import Callable, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Each migration is (version, description, steps). A step is either a SQL
+# statement or a callable taking the connection, for data backfills.
+# Versions are applied in order and must never be edited once released;
+# append a new migration instead.
+Step = Union[str, Callable[[sqlite3.Connection], None]]
+
+MIGRATIONS: List[Tuple[int, str, List[Step]]] = [
+    (1, "initial schema", [
+        '''
+        CREATE TABLE IF NOT EXISTS guilds (
+            guild_id INTEGER PRIMARY KEY,
+            config TEXT DEFAULT '{}',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS warnings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            user_id INTEGER,
+            moderator_id INTEGER,
+            reason TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (guild_id) REFERENCES guilds (guild_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS moderation_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            user_id INTEGER,
+            moderator_id INTEGER,
+            action TEXT,
+            reason TEXT,
+            duration INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (guild_id) REFERENCES guilds (guild_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_timeouts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            user_id INTEGER,
+            expires_at TIMESTAMP,
+            reason TEXT,
+            moderator_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (guild_id) REFERENCES guilds (guild_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS spam_tracking (
+            user_id INTEGER,
+            guild_id INTEGER,
+            message_count INTEGER DEFAULT 0,
+            last_message_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duplicate_count INTEGER DEFAULT 0,
+            last_message_content TEXT,
+            PRIMARY KEY (user_id, guild_id)
+        )
+        ''',
+    ]),
+    (2, "indexes for warning, log and timeout lookups", [
+        '''
+        CREATE INDEX IF NOT EXISTS idx_warnings_guild_user
+        ON warnings (guild_id, user_id, created_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_created
+        ON moderation_logs (guild_id, created_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_user
+        ON moderation_logs (guild_id, user_id, created_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_user_timeouts_expires
+        ON user_timeouts (expires_at)
+        ''',
+    ]),
+    (3, "drop spam_tracking, now tracked in memory", [
+        'DROP TABLE IF EXISTS spam_tracking',
+    ]),
+    (4, "per-user warning counters maintained by triggers", [
+        '''
+        CREATE TABLE IF NOT EXISTS warning_counts (
+            guild_id INTEGER,
+            user_id INTEGER,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, user_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT INTO warning_counts (guild_id, user_id, count)
+        SELECT guild_id, user_id, COUNT(*) FROM warnings
+        GROUP BY guild_id, user_id
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS warning_counts_insert AFTER INSERT ON warnings
+        BEGIN
+            INSERT INTO warning_counts (guild_id, user_id, count)
+            VALUES (NEW.guild_id, NEW.user_id, 1)
+            ON CONFLICT (guild_id, user_id) DO UPDATE SET count = count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS warning_counts_delete AFTER DELETE ON warnings
+        BEGIN
+            UPDATE warning_counts SET count = count - 1
+            WHERE guild_id = OLD.guild_id AND user_id = OLD.user_id;
+            DELETE FROM warning_counts
+            WHERE guild_id = OLD.guild_id AND user_id = OLD.user_id AND count <= 0;
+        END
+        ''',
+    ]),
+    (5, "indexes for filtered keyset pagination", [
+        '''
+        CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_action
+        ON moderation_logs (guild_id, action, created_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild_moderator
+        ON moderation_logs (guild_id, moderator_id, created_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_moderation_logs_created
+        ON moderation_logs (created_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_warnings_guild_created
+        ON warnings (guild_id, created_at)
+        ''',
+    ]),
+    (6, "scheduled expirations for tempbans and role mutes", [
+        "ALTER TABLE user_timeouts ADD COLUMN action TEXT NOT NULL DEFAULT 'unban'",
+        "ALTER TABLE user_timeouts ADD COLUMN role_id INTEGER",
+        '''
+        CREATE INDEX IF NOT EXISTS idx_user_timeouts_guild_user
+        ON user_timeouts (guild_id, user_id, action)
+        ''',
+    ]),
+    (7, "guild config versions for compare-and-swap patches", [
+        "ALTER TABLE guilds ADD COLUMN config_version INTEGER NOT NULL DEFAULT 0",
+    ]),
+    (8, "moderation action counters and hourly/daily rollups", [
+        '''
+        CREATE TABLE IF NOT EXISTS action_totals (
+            guild_id INTEGER,
+            action TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, action)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS action_rollups_hourly (
+            guild_id INTEGER,
+            bucket TEXT,
+            action TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, bucket, action)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS action_rollups_daily (
+            guild_id INTEGER,
+            bucket TEXT,
+            action TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, bucket, action)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT INTO action_totals (guild_id, action, count)
+        SELECT guild_id, action, COUNT(*) FROM moderation_logs
+        GROUP BY guild_id, action
+        ''',
+        '''
+        INSERT INTO action_rollups_hourly (guild_id, bucket, action, count)
+        SELECT guild_id, strftime('%Y-%m-%d %H:00:00', created_at), action, COUNT(*)
+        FROM moderation_logs
+        GROUP BY 1, 2, 3
+        ''',
+        '''
+        INSERT INTO action_rollups_daily (guild_id, bucket, action, count)
+        SELECT guild_id, date(created_at), action, COUNT(*)
+        FROM moderation_logs
+        GROUP BY 1, 2, 3
+        ''',
+        # Rollups only grow: retention pruning of the raw logs leaves the history counts intact
+        '''
+        CREATE TRIGGER IF NOT EXISTS action_rollups_insert AFTER INSERT ON moderation_logs
+        BEGIN
+            INSERT INTO action_totals (guild_id, action, count)
+            VALUES (NEW.guild_id, NEW.action, 1)
+            ON CONFLICT (guild_id, action) DO UPDATE SET count = count + 1;
+            
+            INSERT INTO action_rollups_hourly (guild_id, bucket, action, count)
+            VALUES (NEW.guild_id, strftime('%Y-%m-%d %H:00:00', NEW.created_at), NEW.action, 1)
+            ON CONFLICT (guild_id, bucket, action) DO UPDATE SET count = count + 1;
+            
+            INSERT INTO action_rollups_daily (guild_id, bucket, action, count)
+            VALUES (NEW.guild_id, date(NEW.created_at), NEW.action, 1)
+            ON CONFLICT (guild_id, bucket, action) DO UPDATE SET count = count + 1;
+        END
+        ''',
+    ]),
+    (9, "full-text indexes over warning and log reasons", [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS warnings_fts USING fts5(
+            reason, guild_id,
+            content='warnings', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        # guild_id is indexed only to narrow matches to one guild; it must not affect ranking
+        "INSERT INTO warnings_fts (warnings_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+        "INSERT INTO warnings_fts (warnings_fts) VALUES ('rebuild')",
+        '''
+        CREATE TRIGGER IF NOT EXISTS warnings_fts_insert AFTER INSERT ON warnings
+        BEGIN
+            INSERT INTO warnings_fts (rowid, reason, guild_id) VALUES (NEW.id, NEW.reason, NEW.guild_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS warnings_fts_delete AFTER DELETE ON warnings
+        BEGIN
+            INSERT INTO warnings_fts (warnings_fts, rowid, reason, guild_id)
+            VALUES ('delete', OLD.id, OLD.reason, OLD.guild_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS warnings_fts_update AFTER UPDATE OF reason, guild_id ON warnings
+        BEGIN
+            INSERT INTO warnings_fts (warnings_fts, rowid, reason, guild_id)
+            VALUES ('delete', OLD.id, OLD.reason, OLD.guild_id);
+            INSERT INTO warnings_fts (rowid, reason, guild_id) VALUES (NEW.id, NEW.reason, NEW.guild_id);
+        END
+        ''',
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS moderation_logs_fts USING fts5(
+            reason, guild_id,
+            content='moderation_logs', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        "INSERT INTO moderation_logs_fts (moderation_logs_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+        "INSERT INTO moderation_logs_fts (moderation_logs_fts) VALUES ('rebuild')",
+        '''
+        CREATE TRIGGER IF NOT EXISTS moderation_logs_fts_insert AFTER INSERT ON moderation_logs
+        BEGIN
+            INSERT INTO moderation_logs_fts (rowid, reason, guild_id) VALUES (NEW.id, NEW.reason, NEW.guild_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS moderation_logs_fts_delete AFTER DELETE ON moderation_logs
+        BEGIN
+            INSERT INTO moderation_logs_fts (moderation_logs_fts, rowid, reason, guild_id)
+            VALUES ('delete', OLD.id, OLD.reason, OLD.guild_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS moderation_logs_fts_update AFTER UPDATE OF reason, guild_id ON moderation_logs
+        BEGIN
+            INSERT INTO moderation_logs_fts (moderation_logs_fts, rowid, reason, guild_id)
+            VALUES ('delete', OLD.id, OLD.reason, OLD.guild_id);
+            INSERT INTO moderation_logs_fts (rowid, reason, guild_id) VALUES (NEW.id, NEW.reason, NEW.guild_id);
+        END
+        ''',
+    ]),
+]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    result = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return result[0] or 0
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    current = get_schema_version(conn)
+    
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+            
+        # Each migration is atomic: either every step lands or none does
+        conn.execute('BEGIN')
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+                    
+            conn.execute('''
+                INSERT INTO schema_version (version, description) VALUES (?, ?)
+            ''', (version, description))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            logger.exception(f"Migration {version} ({description}) failed")
+            raise
+            
+        logger.info(f"Applied migration {version}: {description}")
+        current = version
+        
+    return current
@@ -0,0 +1,299 @@
+import asyncio
+import queue
+import sqlite3
+import logging
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Any, Callable, Tuple
+from migrations import apply_migrations
+
+# Tables whose ids are exposed to users (case numbers, scheduler keys)
+ID_TABLES = ('warnings', 'moderation_logs', 'user_timeouts')
+
+# Each shard allocates ids from its own range so ids stay unique across shards
+SHARD_ID_SPACING = 2 ** 40
+
+def shard_index(guild_id: int, shard_count: int) -> int:
+    """Stable shard for a guild; must never change for a given shard count"""
+    if shard_count <= 1:
+        return 0
+    return zlib.crc32(int(guild_id).to_bytes(8, 'little', signed=True)) % shard_count
+
+class SQLiteBackend:
+    """
+    One SQLite file: a pool of reader connections plus a single writer that
+    commits queued writes in group transactions.
+    
+    Database talks to storage only through this interface, so a backend made
+    of several files can stand in for it (see ShardedBackend).
+    """
+    
+    def __init__(self, db_path: str, pool_size: int = 4, flush_interval: float = 0.05,
+                 batch_size: int = 100, id_base: int = 0):
+        self.db_path = db_path
+        self.pool_size = max(1, pool_size)
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.id_base = id_base
+        self.logger = logging.getLogger(__name__)
+        self._connections: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_executor: Optional[ThreadPoolExecutor] = None
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        
+    @property
+    def shards(self) -> List["SQLiteBackend"]:
+        return [self]
+        
+    def for_guild(self, guild_id: int) -> "SQLiteBackend":
+        return self
+        
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; the writer manages its own transactions
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            timeout=30,
+            isolation_level=None
+        )
+        # Only takes effect on a new database, so it must precede the WAL switch that creates the file
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+        
+    def _with_connection(self, func: Callable, *args):
+        # One worker thread per pooled connection, so this never blocks
+        conn = self._connections.get()
+        try:
+            return func(conn, *args)
+        finally:
+            self._connections.put(conn)
+            
+    async def run(self, func: Callable, *args):
+        """Run func(conn, *args) on a pooled reader connection"""
+        if self._executor is None:
+            raise RuntimeError("Database has not been initialized")
+            
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._with_connection, func, *args)
+        
+    async def write(self, func: Callable, *args):
+        """Queue a write and wait until the batch containing it is committed.
+        
+        Because callers only resume after the commit, a read issued right
+        after an awaited write always observes it.
+        """
+        if self._write_queue is None:
+            raise RuntimeError("Database has not been initialized")
+            
+        future = asyncio.get_running_loop().create_future()
+        await self._write_queue.put((func, args, future))
+        return await future
+        
+    async def _writer_loop(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        
+        while not stopping:
+            item = await self._write_queue.get()
+            if item is None:
+                break
+                
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                    
+                try:
+                    item = await asyncio.wait_for(self._write_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                    
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                
+            writes = [(func, args) for func, args, _ in batch]
+            results = await loop.run_in_executor(self._write_executor, self._commit_batch, writes)
+            
+            for (_, _, future), (result, error) in zip(batch, results):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+                    
+    def _commit_batch(self, writes: List[Tuple[Callable, tuple]]) -> List[Tuple[Any, Optional[BaseException]]]:
+        conn = self._writer
+        results = []
+        
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for func, args in writes:
+                # A failing write only rolls back its own savepoint, not the batch
+                conn.execute('SAVEPOINT batch_item')
+                try:
+                    results.append((func(conn, *args), None))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO batch_item')
+                    results.append((None, e))
+                conn.execute('RELEASE batch_item')
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            self.logger.error(f"Failed to commit write batch of {len(writes)} to {self.db_path}: {e}")
+            return [(None, e)] * len(writes)
+            
+        return results
+        
+    async def flush(self):
+        """Wait until every write queued so far has been committed."""
+        await self.write(lambda conn: None)
+        
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        def execute(conn):
+            return conn.execute(query, params).rowcount
+            
+        return await self.write(execute)
+        
+    async def fetchone(self, query: str, params: tuple = ()) -> Optional[tuple]:
+        def fetchone(conn):
+            return conn.execute(query, params).fetchone()
+            
+        return await self.run(fetchone)
+        
+    async def fetchall(self, query: str, params: tuple = ()) -> List[tuple]:
+        def fetchall(conn):
+            return conn.execute(query, params).fetchall()
+            
+        return await self.run(fetchall)
+        
+    async def run_on_writer(self, func: Callable, *args):
+        """Run func on the writer connection outside any batch transaction.
+        
+        The writer executor has a single thread, so this is serialised with
+        committed batches; used for statements that cannot run in a transaction.
+        """
+        if self._write_executor is None:
+            raise RuntimeError("Database has not been initialized")
+            
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._write_executor, func, self._writer, *args)
+        
+    def _reserve_ids(self, conn: sqlite3.Connection):
+        # AUTOINCREMENT never hands out ids below the sqlite_sequence value
+        for table in ID_TABLES:
+            conn.execute('''
+                INSERT INTO sqlite_sequence (name, seq)
+                SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)
+            ''', (table, self.id_base, table))
+            conn.execute('''
+                UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq < ?
+            ''', (self.id_base, table, self.id_base))
+            
+    async def initialize(self) -> int:
+        """Open connections, migrate and start the writer; returns the schema version"""
+        loop = asyncio.get_running_loop()
+        
+        if self._executor is None:
+            self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='database-writer')
+            self._writer = await loop.run_in_executor(self._write_executor, self._connect)
+            
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.pool_size,
+                thread_name_prefix='database'
+            )
+            for _ in range(self.pool_size):
+                self._connections.put(self._connect())
+                
+        version = await loop.run_in_executor(self._write_executor, apply_migrations, self._writer)
+        if self.id_base:
+            await loop.run_in_executor(self._write_executor, self._reserve_ids, self._writer)
+            
+        if self._writer_task is None:
+            self._write_queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._writer_loop())
+            
+        return version
+        
+    async def close(self):
+        if self._executor is None:
+            return
+            
+        loop = asyncio.get_running_loop()
+        
+        # Drain queued writes before tearing anything down
+        if self._writer_task is not None:
+            await self._write_queue.put(None)
+            await self._writer_task
+            self._writer_task = None
+            self._write_queue = None
+            
+        executor, self._executor = self._executor, None
+        
+        # Let queries that are already in flight finish before closing connections
+        await loop.run_in_executor(None, executor.shutdown, True)
+        
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+            
+        await loop.run_in_executor(self._write_executor, self._writer.close)
+        self._write_executor.shutdown(wait=True)
+        self._writer = None
+        self._write_executor = None
+
+class ShardedBackend:
+    """
+    Guilds spread over several SQLite files by a hash of the guild id.
+    
+    Every shard has its own reader pool, writer and write lock, so a busy guild
+    only contends with the guilds that share its file. A guild's rows never span
+    shards; queries that cover every guild are run per shard by Database.
+    """
+    
+    def __init__(self, paths: List[str], pool_size: int = 4, flush_interval: float = 0.05,
+                 batch_size: int = 100):
+        if not paths:
+            raise ValueError("A sharded backend needs at least one shard")
+            
+        self.logger = logging.getLogger(__name__)
+        self._shards = [
+            SQLiteBackend(path, pool_size, flush_interval, batch_size, id_base=i * SHARD_ID_SPACING)
+            for i, path in enumerate(paths)
+        ]
+        
+    @classmethod
+    def from_pattern(cls, pattern: str, shard_count: int, **options) -> "ShardedBackend":
+        """Shards named by pattern, e.g. 'moderation-{shard}.db'"""
+        return cls([pattern.format(shard=i) for i in range(shard_count)], **options)
+        
+    @property
+    def shards(self) -> List[SQLiteBackend]:
+        return list(self._shards)
+        
+    @property
+    def pool_size(self) -> int:
+        return sum(shard.pool_size for shard in self._shards)
+        
+    def for_guild(self, guild_id: int) -> SQLiteBackend:
+        return self._shards[shard_index(guild_id, len(self._shards))]
+        
+    async def flush(self):
+        await asyncio.gather(*(shard.flush() for shard in self._shards))
+        
+    async def initialize(self) -> int:
+        versions = await asyncio.gather(*(shard.initialize() for shard in self._shards))
+        return min(versions)
+        
+    async def close(self):
+        await asyncio.gather(*(shard.close() for shard in self._shards))
@@ -0,0 +1,155 @@
+"""
+Copy a moderation database into a new set of guild shards.
+
+The source is either the single moderation.db file or an existing shard set
+(to change the shard count). Targets must not exist yet; the source is left
+untouched apart from being migrated to the current schema. Stop the bot first,
+then point the "database" section of config.json at the new shards.
+
+Run from the repository root:
+    python tools/reshard.py --source moderation.db --shards 4 --target "moderation-{shard}.db"
+    python tools/reshard.py --source "moderation-{shard}.db" --source-shards 4 \\
+        --shards 8 --target "shards8/moderation-{shard}.db"
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import apply_migrations
+from storage import ID_TABLES, SHARD_ID_SPACING, SQLiteBackend, shard_index
+
+# Row tables in copy order; warning_counts and the full-text indexes are filled by triggers
+ROW_TABLES = ('guilds', 'warnings', 'moderation_logs', 'user_timeouts')
+# Copied verbatim because logs removed by retention are still counted in them
+ROLLUP_TABLES = ('action_totals', 'action_rollups_hourly', 'action_rollups_daily')
+COPY_BATCH = 5000
+
+def shard_paths(pattern: str, count: int):
+    if count <= 1 and '{shard}' not in pattern:
+        return [pattern]
+    return [pattern.format(shard=i) for i in range(count)]
+
+def connect(path: str) -> sqlite3.Connection:
+    # Same pragmas as the bot, so new shards get incremental auto_vacuum and WAL
+    conn = SQLiteBackend(path)._connect()
+    apply_migrations(conn)
+    return conn
+
+def copy_table(table: str, sources, targets) -> int:
+    copied = 0
+    for source in sources:
+        cursor = source.execute(f'SELECT * FROM {table}')
+        columns = [column[0] for column in cursor.description]
+        guild_column = columns.index('guild_id')
+        insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        
+        while True:
+            rows = cursor.fetchmany(COPY_BATCH)
+            if not rows:
+                break
+                
+            routed = [[] for _ in targets]
+            for row in rows:
+                guild_id = row[guild_column]
+                routed[shard_index(guild_id, len(targets)) if guild_id is not None else 0].append(row)
+            for target, batch in zip(targets, routed):
+                if batch:
+                    target.executemany(insert, batch)
+            copied += len(rows)
+            
+    return copied
+
+def max_id(sources) -> int:
+    highest = 0
+    for source in sources:
+        for table in ID_TABLES:
+            row = source.execute(f'SELECT MAX(id) FROM {table}').fetchone()
+            highest = max(highest, row[0] or 0)
+        row = source.execute('SELECT MAX(seq) FROM sqlite_sequence').fetchone()
+        highest = max(highest, row[0] or 0)
+    return highest
+
+def count_rows(connections, table: str) -> int:
+    return sum(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for conn in connections)
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy a moderation database into guild shards")
+    parser.add_argument('--source', required=True,
+                        help="source database, or a shard pattern containing {shard}")
+    parser.add_argument('--source-shards', type=int, default=1,
+                        help="number of source shards when --source is a pattern")
+    parser.add_argument('--shards', type=int, required=True, help="number of target shards")
+    parser.add_argument('--target', required=True, help="target shard pattern containing {shard}")
+    args = parser.parse_args()
+    
+    if args.shards < 1 or '{shard}' not in args.target:
+        parser.error("--target must contain {shard} and --shards must be at least 1")
+        
+    source_paths = shard_paths(args.source, args.source_shards)
+    target_paths = shard_paths(args.target, args.shards)
+    
+    missing = [path for path in source_paths if not os.path.exists(path)]
+    if missing:
+        parser.error(f"source not found: {', '.join(missing)}")
+    existing = [path for path in target_paths if os.path.exists(path)]
+    if existing:
+        parser.error(f"refusing to overwrite existing shards: {', '.join(existing)}")
+        
+    for path in target_paths:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            
+    start = time.perf_counter()
+    sources = [connect(path) for path in source_paths]
+    targets = [connect(path) for path in target_paths]
+    
+    for target in targets:
+        target.execute('BEGIN')
+        
+    try:
+        for table in ROW_TABLES:
+            copied = copy_table(table, sources, targets)
+            print(f"{table:<24} {copied:>10} rows")
+            
+        # Replace what the insert triggers derived from surviving logs with the source's rollups
+        for table in ROLLUP_TABLES:
+            for target in targets:
+                target.execute(f'DELETE FROM {table}')
+            copied = copy_table(table, sources, targets)
+            print(f"{table:<24} {copied:>10} rows")
+            
+        # New ids continue above every copied id, in a separate range per shard
+        highest = max_id(sources)
+        for i, target in enumerate(targets):
+            target.execute('DELETE FROM sqlite_sequence')
+            target.executemany(
+                'INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)',
+                [(table, highest + i * SHARD_ID_SPACING) for table in ID_TABLES]
+            )
+            
+        for table in ROW_TABLES + ROLLUP_TABLES + ('warning_counts',):
+            expected, actual = count_rows(sources, table), count_rows(targets, table)
+            if expected != actual:
+                raise RuntimeError(f"{table}: copied {actual} rows, source has {expected}")
+                
+        for target in targets:
+            target.execute('COMMIT')
+    except Exception:
+        for target in targets:
+            if target.in_transaction:
+                target.execute('ROLLBACK')
+        raise
+    finally:
+        for conn in sources + targets:
+            conn.close()
+            
+    print(f"Copied into {len(targets)} shards in {time.perf_counter() - start:.1f}s")
+    print(f'Set "shards": {args.shards} and "shard_path": "{args.target}" in the database section of config.json')
+
+if __name__ == '__main__':
+    main()
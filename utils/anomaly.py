@@ -0,0 +1,396 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+from utils.scheduler import RetryAction
+
+LEVEL_NORMAL = 0
+LEVEL_SLOWMODE = 1
+LEVEL_LOCKDOWN = 2
+
+LEVEL_NAMES = {
+    LEVEL_NORMAL: 'normal',
+    LEVEL_SLOWMODE: 'slowmode',
+    LEVEL_LOCKDOWN: 'lockdown'
+}
+
+class RateTracker:
+    """
+    Message rate smoothed over a short and a long time constant. Both are
+    exponentially decaying event counters scaled to messages per second, so an
+    update is O(1) however busy the channel is and no timestamps are kept.
+    """
+    __slots__ = ('fast', 'slow', 'updated', 'learned')
+    
+    def __init__(self, now: float):
+        self.fast = 0.0
+        self.slow = 0.0
+        self.updated = now
+        self.learned = now
+        
+    def record(self, now: float, fast_window: float, slow_window: float, learn: bool = True):
+        self.fast = self.fast * math.exp(-max(0.0, now - self.updated) / fast_window) + 1.0 / fast_window
+        self.updated = now
+        # While frozen the baseline neither learns nor decays, so an incident doesn't become the new normal
+        if learn:
+            self.slow = self.slow * math.exp(-max(0.0, now - self.learned) / slow_window) + 1.0 / slow_window
+        self.learned = now
+        
+    def rate(self, now: float, fast_window: float) -> float:
+        return self.fast * math.exp(-max(0.0, now - self.updated) / fast_window)
+        
+    def baseline(self, now: float, slow_window: float, age: float) -> float:
+        baseline = self.slow * math.exp(-max(0.0, now - self.learned) / slow_window)
+        # Until the monitor has run for a few baseline windows the counter is still filling;
+        # scale it up as if the traffic so far had been going on forever
+        return baseline / (1.0 - math.exp(-age / slow_window))
+
+class _ChannelState:
+    __slots__ = ('rate', 'level', 'target', 'triggered', 'original')
+    
+    def __init__(self, now: float):
+        self.rate = RateTracker(now)
+        self.level = LEVEL_NORMAL       # applied in Discord
+        self.target = LEVEL_NORMAL      # wanted; differs from level while a change is queued
+        self.triggered = 0.0
+        # What the mitigation handler replaced, so the revert can restore it
+        self.original: Dict[str, Any] = {}
+
+class _GuildState:
+    __slots__ = ('rate', 'channels', 'active', 'quiet_until')
+    
+    def __init__(self, now: float):
+        self.rate = RateTracker(now)
+        self.channels: Dict[int, _ChannelState] = {}
+        # Channels with a raised target; the guild baseline is frozen while any exist
+        self.active = 0
+        # Set by a manual release so the same spike doesn't immediately re-trigger
+        self.quiet_until = 0.0
+        
+    def set_target(self, channel: _ChannelState, level: int):
+        self.active += bool(level) - bool(channel.target)
+        channel.target = level
+
+class ChannelChange(NamedTuple):
+    guild_id: int
+    channel_id: int
+    previous: int
+    level: int
+    rate: float
+    baseline: float
+    # Owned by the handler: filled when mitigation starts, read back on revert
+    original: Dict[str, Any]
+
+Handler = Callable[[ChannelChange], Awaitable[None]]
+
+class TrafficMonitor:
+    """
+    Guild- and channel-level message rate anomaly detection with automatic slowmode
+    and lockdown.
+    
+    Every message updates one guild and one channel RateTracker. A rate several
+    times above its learned baseline (and above an absolute floor) raises the
+    channel to slowmode, a larger spike to lockdown; a guild-wide spike raises
+    each channel as it receives messages. Changes go through a coalescing queue
+    applied in paced batches by a single task, and a channel is reverted once it
+    has gone a cooldown without triggering. The Discord side is the registered
+    handler, so this module never talks to the API itself.
+    """
+    
+    def __init__(self, fast_window: float = 10.0, baseline_window: float = 900.0,
+                 spike_factor: float = 4.0, lockdown_factor: float = 10.0,
+                 channel_min_rate: float = 1.0, guild_min_rate: float = 3.0,
+                 cooldown: float = 300.0, idle_timeout: float = 3600.0,
+                 batch_size: int = 5, batch_interval: float = 1.0, retry_delay: float = 30.0,
+                 sweep_interval: float = 15.0):
+        self.logger = logging.getLogger(__name__)
+        self.started = time.time()
+        self._guilds: Dict[int, _GuildState] = {}
+        # (guild_id, channel_id) -> None, in the order changes were requested
+        self._queue: 'OrderedDict[Tuple[int, int], None]' = OrderedDict()
+        self._handler: Optional[Handler] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[Callable[[], Awaitable[None]]] = None
+        self._last_sweep = self.started
+        self.applied = 0
+        self.failed = 0
+        self.configure(
+            fast_window=fast_window, baseline_window=baseline_window, spike_factor=spike_factor,
+            lockdown_factor=lockdown_factor, channel_min_rate=channel_min_rate,
+            guild_min_rate=guild_min_rate, cooldown=cooldown, idle_timeout=idle_timeout,
+            batch_size=batch_size, batch_interval=batch_interval, retry_delay=retry_delay,
+            sweep_interval=sweep_interval
+        )
+        
+    def configure(self, fast_window: float, baseline_window: float, spike_factor: float,
+                  lockdown_factor: float, channel_min_rate: float, guild_min_rate: float,
+                  cooldown: float, idle_timeout: float, batch_size: int, batch_interval: float,
+                  retry_delay: float, sweep_interval: float):
+        self.fast_window = max(1.0, fast_window)
+        self.baseline_window = max(self.fast_window * 2, baseline_window)
+        self.spike_factor = max(1.0, spike_factor)
+        self.lockdown_factor = max(self.spike_factor, lockdown_factor)
+        self.channel_min_rate = channel_min_rate
+        self.guild_min_rate = guild_min_rate
+        self.cooldown = cooldown
+        # Trackers are only dropped once their baseline has decayed to nothing anyway
+        self.idle_timeout = max(idle_timeout, self.baseline_window * 3)
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self.retry_delay = retry_delay
+        self.sweep_interval = max(1.0, sweep_interval)
+        
+    def set_handler(self, handler: Optional[Handler]):
+        self._handler = handler
+        
+    def __len__(self) -> int:
+        return sum(len(guild.channels) for guild in self._guilds.values())
+        
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+        
+    def _level(self, tracker: RateTracker, min_rate: float, now: float) -> int:
+        rate = tracker.rate(now, self.fast_window)
+        if rate < min_rate:
+            return LEVEL_NORMAL
+            
+        baseline = tracker.baseline(now, self.baseline_window, max(now - self.started, self.fast_window))
+        # Floored so a near-silent channel needs a proportionally larger burst for lockdown too
+        baseline = max(baseline, min_rate / self.spike_factor)
+        if rate >= baseline * self.lockdown_factor:
+            return LEVEL_LOCKDOWN
+        if rate >= baseline * self.spike_factor:
+            return LEVEL_SLOWMODE
+        return LEVEL_NORMAL
+        
+    def record(self, guild_id: int, channel_id: int, now: Optional[float] = None) -> int:
+        """
+        Count a message. Returns the level the channel should be raised to, or
+        LEVEL_NORMAL if it is already there or no spike is going on.
+        """
+        now = time.time() if now is None else now
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            guild = self._guilds[guild_id] = _GuildState(now)
+        channel = guild.channels.get(channel_id)
+        if channel is None:
+            channel = guild.channels[channel_id] = _ChannelState(now)
+            
+        guild.rate.record(now, self.fast_window, self.baseline_window, learn=not guild.active)
+        channel.rate.record(now, self.fast_window, self.baseline_window, learn=not channel.target)
+        if now < guild.quiet_until:
+            return LEVEL_NORMAL
+            
+        level = max(
+            self._level(channel.rate, self.channel_min_rate, now),
+            self._level(guild.rate, self.guild_min_rate, now)
+        )
+        if not level:
+            return LEVEL_NORMAL
+            
+        # The cooldown runs from the last message that still looked like a spike
+        channel.triggered = now
+        return level if level > channel.target else LEVEL_NORMAL
+        
+    def escalate(self, guild_id: int, channel_id: int, level: int) -> bool:
+        """Queue a channel to be raised to level; returns False if it already is"""
+        guild = self._guilds.get(guild_id)
+        channel = guild.channels.get(channel_id) if guild else None
+        if channel is None or level <= channel.target:
+            return False
+            
+        guild.set_target(channel, level)
+        self._enqueue(guild_id, channel_id)
+        return True
+        
+    def release(self, guild_id: int, now: Optional[float] = None) -> int:
+        """
+        Queue every mitigated channel in a guild for revert without waiting for
+        the cooldown; new spikes are ignored for one cooldown afterwards.
+        """
+        now = time.time() if now is None else now
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            return 0
+            
+        guild.quiet_until = now + self.cooldown
+        released = 0
+        for channel_id, channel in guild.channels.items():
+            if channel.target or channel.level:
+                guild.set_target(channel, LEVEL_NORMAL)
+                self._enqueue(guild_id, channel_id)
+                released += 1
+        return released
+        
+    def mitigated_channels(self, guild_id: int, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        now = time.time() if now is None else now
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            return []
+            
+        age = max(now - self.started, self.fast_window)
+        return [
+            {
+                'channel_id': channel_id,
+                'level': LEVEL_NAMES[max(channel.level, channel.target)],
+                'pending': channel.level != channel.target,
+                'rate': channel.rate.rate(now, self.fast_window),
+                'baseline': channel.rate.baseline(now, self.baseline_window, age),
+                'revert_in': max(0.0, channel.triggered + self.cooldown - now) if channel.target else 0.0
+            }
+            for channel_id, channel in guild.channels.items()
+            if channel.level or channel.target
+        ]
+        
+    def _enqueue(self, guild_id: int, channel_id: int):
+        # Requests for a channel already in the queue collapse into one change to its latest target
+        self._queue[(guild_id, channel_id)] = None
+        self._wakeup.set()
+        
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Queue reverts for channels past their cooldown and drop idle trackers; returns reverts queued"""
+        now = time.time() if now is None else now
+        self._last_sweep = now
+        reverted = 0
+        
+        for guild_id, guild in list(self._guilds.items()):
+            for channel_id, channel in list(guild.channels.items()):
+                if channel.target and now - channel.triggered >= self.cooldown:
+                    guild.set_target(channel, LEVEL_NORMAL)
+                    self._enqueue(guild_id, channel_id)
+                    reverted += 1
+                elif not channel.target and not channel.level and now - channel.rate.updated > self.idle_timeout:
+                    del guild.channels[channel_id]
+                    
+            if not guild.channels and now - guild.rate.updated > self.idle_timeout:
+                del self._guilds[guild_id]
+                
+        return reverted
+        
+    def start(self, wait_until_ready: Optional[Callable[[], Awaitable[None]]] = None):
+        if self._task is not None:
+            return
+            
+        self._ready = wait_until_ready
+        self._task = asyncio.create_task(self._run())
+        
+    async def stop(self, revert: bool = True, timeout: float = 30.0):
+        """
+        Stop the worker; with revert, undo every mitigation first since nothing
+        would undo it later. Reverting is paced like the worker and gives up
+        after timeout seconds, so a rate limit can't hold up shutdown.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            
+        if not revert:
+            return
+            
+        for guild_id in list(self._guilds):
+            self.release(guild_id)
+            
+        deadline = time.monotonic() + timeout
+        while self._queue:
+            pause = await self._apply_batch(self._pop_batch())
+            if not self._queue:
+                break
+                
+            delay = max(pause, self.batch_interval)
+            if time.monotonic() + delay > deadline:
+                self.logger.warning(
+                    f"Traffic monitor stopped with {len(self._queue)} channel reverts still pending"
+                )
+                self._queue.clear()
+                break
+            await asyncio.sleep(delay)
+            
+    def _pop_batch(self) -> List[Tuple[int, int]]:
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            key, _ = self._queue.popitem(last=False)
+            batch.append(key)
+        return batch
+        
+    async def _run(self):
+        if self._ready is not None:
+            await self._ready()
+            
+        while True:
+            try:
+                now = time.time()
+                if now - self._last_sweep >= self.sweep_interval:
+                    self.sweep(now)
+                    
+                if not self._queue:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(
+                            self._wakeup.wait(), max(0.0, self._last_sweep + self.sweep_interval - now)
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                    
+                pause = await self._apply_batch(self._pop_batch())
+                # Always paced, so a guild-wide incident is spread out instead of bursting channel edits
+                await asyncio.sleep(max(pause, self.batch_interval))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Traffic monitor loop error: {e}")
+                await asyncio.sleep(self.retry_delay)
+                
+    async def _apply_batch(self, batch: List[Tuple[int, int]]) -> float:
+        """Apply a batch concurrently; returns how long to pause if a rate limit was hit"""
+        results = await asyncio.gather(*(self._apply(*key) for key in batch), return_exceptions=True)
+        
+        pause = 0.0
+        for (guild_id, channel_id), result in zip(batch, results):
+            if result is None:
+                continue
+                
+            if isinstance(result, RetryAction):
+                if result.rate_limited:
+                    pause = max(pause, result.delay)
+                self._queue[(guild_id, channel_id)] = None
+                continue
+                
+            # Not retried. A failed escalation keeps its target, so it isn't re-triggered by every
+            # message and the sweep clears it after the cooldown; a failed revert is given up on
+            self.failed += 1
+            self.logger.error(f"Traffic mitigation for channel {channel_id} in guild {guild_id} failed: {result}")
+            guild = self._guilds.get(guild_id)
+            channel = guild.channels.get(channel_id) if guild else None
+            if channel is not None and channel.target < channel.level:
+                channel.level = channel.target
+            if channel is not None and channel.level == LEVEL_NORMAL:
+                channel.original.clear()
+                
+        return pause
+        
+    async def _apply(self, guild_id: int, channel_id: int):
+        guild = self._guilds.get(guild_id)
+        channel = guild.channels.get(channel_id) if guild else None
+        if channel is None or channel.target == channel.level:
+            return
+            
+        target = channel.target
+        if self._handler is not None:
+            now = time.time()
+            await self._handler(ChannelChange(
+                guild_id, channel_id, channel.level, target,
+                channel.rate.rate(now, self.fast_window),
+                channel.rate.baseline(now, self.baseline_window, max(now - self.started, self.fast_window)),
+                channel.original
+            ))
+        channel.level = target
+        self.applied += 1
@@ -1,16 +1,104 @@
 import re
 import discord
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
+import time
 from datetime import datetime, timedelta
+from functools import lru_cache
+from utils.spam_tracker import SpamTracker
+from utils.raid import RaidDetector
+from utils.matcher import KeywordMatcher
+from utils.features import basic_features, extract_features
+from utils.normalize import normalize_text
+from utils.config import BotConfig, CustomRule
+from utils.metrics import LatencyRecorder
+from utils.offload import CheckPool, OffloadTimeout
+from utils.rules import COST_FEATURES, COST_SCAN, COST_STATEFUL, HeavyCheck, RuleContext, RuleRegistry
+
+# Module-level so the check pool's worker processes can run them
+def profanity_violation(matcher: KeywordMatcher, text: str) -> Optional[str]:
+    matches = matcher.find_all(text)
+    if matches:
+        words = list(dict.fromkeys(word for _, word in matches))
+        return f"Profanity detected: {', '.join(words)}"
+    return None
+
+@lru_cache(maxsize=32)
+def _worker_matcher(words: Tuple[str, ...]) -> KeywordMatcher:
+    return KeywordMatcher(words)
+
+def scan_profanity(words: Tuple[str, ...], text: str) -> Optional[str]:
+    return profanity_violation(_worker_matcher(words), text)
+
+def scan_custom_rules(rules: Tuple[CustomRule, ...], content: str) -> Optional[str]:
+    for rule in rules:
+        # re caches compiled patterns, so each worker compiles a rule once
+        if re.search(rule.pattern, content, re.IGNORECASE if rule.ignore_case else 0):
+            return rule.reason
+    return None
 
 class AutoMod:
-    def __init__(self, bot, config: Dict[str, Any]):
+    def __init__(self, bot, config: BotConfig):
         self.bot = bot
+        
+        tracking_config = config.section('spam_tracking')
+        self.spam_tracker = SpamTracker(
+            window=60.0,
+            idle_timeout=tracking_config.get('idle_timeout', 600),
+            snapshot_path=tracking_config.get('snapshot_path')
+        )
+        self.raid_detector = RaidDetector()
+        self.violation_latency = LatencyRecorder()
+        self.pool = CheckPool()
+        self.time_budget = 0.25
+        self.rules = RuleRegistry(self.pool)
+        self._register_rules()
+        self.apply_config(config)
+        
+    def _register_rules(self):
+        rules = self.rules
+        rules.register('mentions', COST_FEATURES, self._check_excessive_mentions)
+        rules.register('emojis', COST_FEATURES, self._check_excessive_emojis)
+        rules.register('zalgo', COST_FEATURES, self._check_zalgo_text)
+        rules.register('profanity', COST_SCAN, self._check_profanity, config_key='profanity_filter',
+                       heavy=HeavyCheck(self._prepare_profanity, scan_profanity))
+        # Operator regexes can backtrack catastrophically on any length, so they are always offloaded;
+        # _prepare_custom_rules returns None when none are configured, so that costs nothing by default
+        rules.register('custom', COST_SCAN, self._check_custom_rules,
+                       heavy=HeavyCheck(self._prepare_custom_rules, scan_custom_rules, inline_length=0))
+        rules.register('spam', COST_STATEFUL, self._check_spam, config_key='spam_detection')
+        rules.register('raid', COST_STATEFUL, self._check_raid, config_key='raid_detection')
+        
+    def apply_config(self, config: BotConfig):
+        """Swap in a new config snapshot; the blacklist matcher is only rebuilt if the list changed"""
         self.config = config
-        self.spam_thresholds = config.get('spam_thresholds', {})
-        self.blacklist_words = [word.lower() for word in config.get('blacklist_words', [])]
+        self.spam_thresholds = config.spam_thresholds
+        
+        tracking_config = config.section('spam_tracking')
+        self.spam_tracker.idle_timeout = max(tracking_config.get('idle_timeout', 600), self.spam_tracker.window)
+        self.spam_tracker.snapshot_path = tracking_config.get('snapshot_path')
         
+        offload_config = config.section('offload')
+        self.pool.resize(offload_config.get('workers', 2), offload_config.get('max_pending', 64))
+        self.rules.inline_length = offload_config.get('inline_length', 1000)
+        self.time_budget = offload_config.get('time_budget_ms', 250) / 1000
+        self.custom_rules = config.custom_rules
+        
+        raid_config = config.section('raid_detection')
+        self.raid_detector.configure(
+            window=raid_config.get('window_seconds', 30),
+            max_entries=raid_config.get('max_messages', 2000),
+            min_length=raid_config.get('min_length', 20),
+            max_distance=raid_config.get('max_distance', 6),
+            min_users=raid_config.get('min_users', 5)
+        )
+        
+        blacklist_words = list(config.blacklist_words)
+        if blacklist_words != getattr(self, 'blacklist_words', None):
+            self.blacklist_words = blacklist_words
+            self.blacklist_matcher = KeywordMatcher(normalize_text(word) for word in blacklist_words)
+            self._guild_matchers = {}
+            
     async def check_message(self, message: discord.Message) -> Optional[str]:
         if message.author.bot:
             return None
@@ -28,104 +116,111 @@ class AutoMod:
         if not guild_config.get('automod_enabled', True):
             return None
             
-        violation = None
+        deadline = time.perf_counter() + self.time_budget
+        context = RuleContext(message, guild_config, await self._extract_features(message.content), deadline)
+        return await self.rules.evaluate(context)
         
-        if guild_config.get('profanity_filter', True):
-            violation = await self._check_profanity(message)
-            if violation:
-                return violation
-                
-        if guild_config.get('spam_detection', True):
-            violation = await self._check_spam(message)
-            if violation:
-                return violation
-                
-        violation = await self._check_excessive_mentions(message)
-        if violation:
-            return violation
+    async def _extract_features(self, content: str):
+        # Short messages stay on the fast inline path; a process round trip would cost more than the scans
+        if not self.pool.enabled or len(content) < self.rules.inline_length:
+            return extract_features(content)
             
-        violation = await self._check_excessive_emojis(message)
-        if violation:
-            return violation
-            
-        violation = await self._check_zalgo_text(message)
-        if violation:
-            return violation
+        try:
+            return await self.pool.run(self.time_budget, extract_features, content)
+        except OffloadTimeout:
+            return basic_features(content)
             
-        return None
+    def close(self):
+        self.pool.close()
         
     async def _is_immune(self, member: discord.Member) -> bool:
-        if member.guild_permissions.administrator:
-            return True
+        return self.bot.role_resolver.is_immune(member)
+        
+    def _get_blacklist_matcher(self, guild_id: int, guild_config: Dict[str, Any]) -> KeywordMatcher:
+        guild_words = guild_config.get('blacklist_words')
+        if not guild_words:
+            return self.blacklist_matcher
             
-        immune_roles = self.config.get('immune_roles', [])
-        for role in member.roles:
-            if role.name in immune_roles:
-                return True
-                
-        return False
+        # Guild lists are layered on top of the global list and only rebuilt when they change
+        cached = self._guild_matchers.get(guild_id)
+        if cached and (cached[0] is guild_words or cached[1] == tuple(guild_words)):
+            return cached[2]
+            
+        matcher = KeywordMatcher(normalize_text(word) for word in self.blacklist_words + list(guild_words))
+        self._guild_matchers[guild_id] = (guild_words, tuple(guild_words), matcher)
+        return matcher
         
-    async def _check_profanity(self, message: discord.Message) -> Optional[str]:
-        content_lower = message.content.lower()
+    async def _check_profanity(self, context: RuleContext) -> Optional[str]:
+        matcher = self._get_blacklist_matcher(context.message.guild.id, context.guild_config)
+        return profanity_violation(matcher, context.features.normalized)
         
-        for word in self.blacklist_words:
-            if word in content_lower:
-                return f"Profanity detected: {word}"
-                
-        return None
+    def _prepare_profanity(self, context: RuleContext) -> Optional[Tuple[Tuple[str, ...], str]]:
+        matcher = self._get_blacklist_matcher(context.message.guild.id, context.guild_config)
+        if not len(matcher):
+            return None
+        # Workers rebuild the automaton from the already-normalized words and keep it cached
+        return matcher.words, context.features.normalized
+        
+    async def _check_custom_rules(self, context: RuleContext) -> Optional[str]:
+        return scan_custom_rules(self.custom_rules, context.message.content)
         
-    async def _check_spam(self, message: discord.Message) -> Optional[str]:
+    def _prepare_custom_rules(self, context: RuleContext) -> Optional[Tuple[Tuple[CustomRule, ...], str]]:
+        if not self.custom_rules:
+            return None
+        return self.custom_rules, context.message.content
+        
+    async def _check_spam(self, context: RuleContext) -> Optional[str]:
+        message = context.message
         if not message.guild:
             return None
             
-        await self.bot.db.update_spam_tracking(
-            message.guild.id, 
-            message.author.id, 
+        stats = self.spam_tracker.record(
+            message.guild.id,
+            message.author.id,
             message.content
         )
         
-        stats = await self.bot.db.get_spam_stats(message.guild.id, message.author.id)
-        
-        max_messages = self.spam_thresholds.get('messages_per_minute', 10)
+        max_messages = self.spam_thresholds.messages_per_minute
         if stats['message_count'] > max_messages:
             return f"Spam detected: {stats['message_count']} messages in 1 minute"
             
-        max_duplicates = self.spam_thresholds.get('duplicate_messages', 3)
+        max_duplicates = self.spam_thresholds.duplicate_messages
         if stats['duplicate_count'] >= max_duplicates:
             return f"Duplicate message spam: {stats['duplicate_count']} identical messages"
             
         return None
         
-    async def _check_excessive_mentions(self, message: discord.Message) -> Optional[str]:
-        mention_limit = self.spam_thresholds.get('mention_limit', 5)
-        mention_count = len(message.mentions) + len(message.role_mentions)
+    async def _check_raid(self, context: RuleContext) -> Optional[str]:
+        message = context.message
+        if not message.guild:
+            return None
+            
+        users = self.raid_detector.observe(message.guild.id, message.author.id, context.features.normalized)
+        if users:
+            return f"Raid detected: near-identical message from {len(users)} users"
+            
+        return None
+        
+    async def _check_excessive_mentions(self, context: RuleContext) -> Optional[str]:
+        mention_limit = self.spam_thresholds.mention_limit
+        mention_count = context.features.mention_count
         
         if mention_count > mention_limit:
             return f"Excessive mentions: {mention_count} mentions (limit: {mention_limit})"
             
         return None
         
-    async def _check_excessive_emojis(self, message: discord.Message) -> Optional[str]:
-        emoji_limit = self.spam_thresholds.get('emoji_limit', 10)
-        
-        custom_emoji_pattern = r'<a?:[a-zA-Z0-9_]+:[0-9]+>'
-        unicode_emoji_pattern = r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F700-\U0001F77F\U0001F780-\U0001F7FF\U0001F800-\U0001F8FF\U0001F900-\U0001F9FF\U0001FA00-\U0001FA6F\U0001FA70-\U0001FAFF\U00002600-\U000026FF\U00002700-\U000027BF]'
-        
-        custom_emojis = len(re.findall(custom_emoji_pattern, message.content))
-        unicode_emojis = len(re.findall(unicode_emoji_pattern, message.content))
-        
-        total_emojis = custom_emojis + unicode_emojis
+    async def _check_excessive_emojis(self, context: RuleContext) -> Optional[str]:
+        emoji_limit = self.spam_thresholds.emoji_limit
+        total_emojis = context.features.emoji_count
         
         if total_emojis > emoji_limit:
             return f"Excessive emojis: {total_emojis} emojis (limit: {emoji_limit})"
             
         return None
         
-    async def _check_zalgo_text(self, message: discord.Message) -> Optional[str]:
-        zalgo_pattern = r'[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]'
-        zalgo_count = len(re.findall(zalgo_pattern, message.content))
-        
-        if zalgo_count > 10:
+    async def _check_zalgo_text(self, context: RuleContext) -> Optional[str]:
+        if context.features.combining_mark_count > 10:
             return "Zalgo text detected"
             
         return None
@@ -134,6 +229,56 @@ class AutoMod:
         if not message.guild or not isinstance(message.author, discord.Member):
             return
             
+        timed = self.violation_latency.timed
+        start = time.perf_counter()
+        
+        # Deleting the message depends on nothing else, so it runs alongside everything below
+        delete_task = asyncio.create_task(timed('delete', self._delete_message(message)))
+        
+        if not self.bot.user:
+            await delete_task
+            return
+            
+        # Whatever fails below, the deletion already in flight is still awaited
+        try:
+            warning_count, guild_config = await asyncio.gather(
+                timed('database', self.bot.db.record_violation(
+                    message.guild.id,
+                    message.author.id,
+                    self.bot.user.id,
+                    f"Auto-moderation: {violation}",
+                    "auto_warn",
+                    violation
+                )),
+                timed('config', self.bot.db.get_guild_config(message.guild.id))
+            )
+            
+            max_warnings = guild_config.get('max_warnings', 3)
+            warning_actions = guild_config.get('warning_actions', {})
+            
+            embed = discord.Embed(
+                title="⚠️ Auto-Moderation Alert",
+                description=f"{message.author.mention}, your message was removed.",
+                color=0xff9900,
+                timestamp=discord.utils.utcnow()
+            )
+            embed.add_field(name="Reason", value=violation, inline=False)
+            embed.add_field(name="Warnings", value=f"{warning_count}/{max_warnings}", inline=True)
+            
+            action = warning_actions.get(str(warning_count))
+            if action:
+                # The notice reports the punishment outcome, so it has to wait for it
+                await timed('punishment', self._apply_punishment(
+                    message.author, action, warning_count, guild_config, embed
+                ))
+                
+            await timed('notice', self._send_notice(message.channel, embed))
+        finally:
+            await delete_task
+            
+        self.violation_latency.record('total', time.perf_counter() - start)
+        
+    async def _delete_message(self, message: discord.Message):
         try:
             await message.delete()
         except discord.NotFound:
@@ -141,81 +286,47 @@ class AutoMod:
         except discord.Forbidden:
             pass
             
-        if not self.bot.user:
-            return
-            
-        await self.bot.db.add_warning(
-            message.guild.id,
-            message.author.id,
-            self.bot.user.id,
-            f"Auto-moderation: {violation}"
-        )
-        
-        warnings = await self.bot.db.get_user_warnings(message.guild.id, message.author.id)
-        warning_count = len(warnings)
-        
-        guild_config = await self.bot.db.get_guild_config(message.guild.id)
-        max_warnings = guild_config.get('max_warnings', 3)
-        warning_actions = guild_config.get('warning_actions', {})
-        
-        embed = discord.Embed(
-            title="⚠️ Auto-Moderation Alert",
-            description=f"{message.author.mention}, your message was removed.",
-            color=0xff9900,
-            timestamp=discord.utils.utcnow()
-        )
-        embed.add_field(name="Reason", value=violation, inline=False)
-        embed.add_field(name="Warnings", value=f"{warning_count}/{max_warnings}", inline=True)
-        
-        if warning_count in warning_actions:
-            action = warning_actions[str(warning_count)]
-            
-            if action == "timeout":
-                timeout_duration = guild_config.get('timeout_duration', 300)
-                try:
-                    await message.author.timeout(
-                        discord.utils.utcnow() + timedelta(seconds=timeout_duration),
-                        reason=f"Auto-mod: {warning_count} warnings"
-                    )
-                    embed.add_field(
-                        name="Action Taken", 
-                        value=f"User timed out for {timeout_duration} seconds", 
-                        inline=False
-                    )
-                except discord.Forbidden:
-                    embed.add_field(
-                        name="Action Failed", 
-                        value="Could not timeout user (missing permissions)", 
-                        inline=False
-                    )
-                    
-            elif action == "ban":
-                try:
-                    await message.author.ban(
-                        reason=f"Auto-mod: {warning_count} warnings",
-                        delete_message_days=1
-                    )
-                    embed.add_field(
-                        name="Action Taken", 
-                        value="User has been banned", 
-                        inline=False
-                    )
-                except discord.Forbidden:
-                    embed.add_field(
-                        name="Action Failed", 
-                        value="Could not ban user (missing permissions)", 
-                        inline=False
-                    )
-                    
+    async def _send_notice(self, channel, embed: discord.Embed):
         try:
-            await message.channel.send(embed=embed, delete_after=10)
+            await channel.send(embed=embed, delete_after=10)
         except discord.Forbidden:
             pass
             
-        await self.bot.db.log_moderation_action(
-            message.guild.id,
-            message.author.id,
-            self.bot.user.id,
-            "auto_warn",
-            violation
-        )
+    async def _apply_punishment(self, member: discord.Member, action: str, warning_count: int,
+                                guild_config: Dict[str, Any], embed: discord.Embed):
+        if action == "timeout":
+            timeout_duration = guild_config.get('timeout_duration', 300)
+            try:
+                await member.timeout(
+                    discord.utils.utcnow() + timedelta(seconds=timeout_duration),
+                    reason=f"Auto-mod: {warning_count} warnings"
+                )
+                embed.add_field(
+                    name="Action Taken", 
+                    value=f"User timed out for {timeout_duration} seconds", 
+                    inline=False
+                )
+            except discord.Forbidden:
+                embed.add_field(
+                    name="Action Failed", 
+                    value="Could not timeout user (missing permissions)", 
+                    inline=False
+                )
+                
+        elif action == "ban":
+            try:
+                await member.ban(
+                    reason=f"Auto-mod: {warning_count} warnings",
+                    delete_message_days=1
+                )
+                embed.add_field(
+                    name="Action Taken", 
+                    value="User has been banned", 
+                    inline=False
+                )
+            except discord.Forbidden:
+                embed.add_field(
+                    name="Action Failed", 
+                    value="Could not ban user (missing permissions)", 
+                    inline=False
+                )
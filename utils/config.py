@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, List, Mapping, Optional, Tuple
+
+class ConfigError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _string_list(data: dict, key: str) -> Tuple[str, ...]:
+    value = data.get(key, [])
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ConfigError(f"'{key}' must be a list of strings")
+    return tuple(value)
+
+@dataclass(frozen=True)
+class SpamThresholds:
+    messages_per_minute: int = 10
+    duplicate_messages: int = 3
+    mention_limit: int = 5
+    emoji_limit: int = 10
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SpamThresholds':
+        if not isinstance(data, dict):
+            raise ConfigError("'spam_thresholds' must be an object")
+            
+        values = {}
+        for name in cls.__dataclass_fields__:
+            if name not in data:
+                continue
+            value = data[name]
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise ConfigError(f"'spam_thresholds.{name}' must be a positive integer")
+            values[name] = value
+        return cls(**values)
+
+@dataclass(frozen=True)
+class CustomRule:
+    """An operator-defined regex matched against raw message content"""
+    name: str
+    pattern: str
+    reason: str
+    ignore_case: bool = True
+    
+    @classmethod
+    def from_dict(cls, data: dict, index: int) -> 'CustomRule':
+        if not isinstance(data, dict):
+            raise ConfigError(f"'custom_rules[{index}]' must be an object")
+            
+        name = data.get('name')
+        pattern = data.get('pattern')
+        if not isinstance(name, str) or not name:
+            raise ConfigError(f"'custom_rules[{index}].name' must be a non-empty string")
+        if not isinstance(pattern, str) or not pattern:
+            raise ConfigError(f"'custom_rules[{index}].pattern' must be a non-empty string")
+            
+        ignore_case = data.get('ignore_case', True)
+        if not isinstance(ignore_case, bool):
+            raise ConfigError(f"'custom_rules[{index}].ignore_case' must be true or false")
+        try:
+            re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        except re.error as e:
+            raise ConfigError(f"'custom_rules[{index}].pattern' is not a valid regex: {e}")
+            
+        reason = data.get('reason', f"Matched custom rule '{name}'")
+        if not isinstance(reason, str):
+            raise ConfigError(f"'custom_rules[{index}].reason' must be a string")
+        return cls(name=name, pattern=pattern, reason=reason, ignore_case=ignore_case)
+
+@dataclass(frozen=True)
+class BotConfig:
+    """Immutable, validated snapshot of config.json"""
+    prefix: str
+    default_settings: Mapping[str, Any]
+    blacklist_words: Tuple[str, ...]
+    spam_thresholds: SpamThresholds
+    moderation_roles: Tuple[str, ...]
+    immune_roles: Tuple[str, ...]
+    custom_rules: Tuple[CustomRule, ...]
+    sections: Mapping[str, Any] = field(repr=False)
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BotConfig':
+        if not isinstance(data, dict):
+            raise ConfigError("Configuration root must be an object")
+            
+        prefix = data.get('prefix')
+        if not isinstance(prefix, str) or not prefix:
+            raise ConfigError("'prefix' must be a non-empty string")
+            
+        default_settings = data.get('default_settings', {})
+        if not isinstance(default_settings, dict):
+            raise ConfigError("'default_settings' must be an object")
+            
+        log_config = data.get('logging', {})
+        if not isinstance(log_config, dict):
+            raise ConfigError("'logging' must be an object")
+            
+        custom_rules = data.get('custom_rules', [])
+        if not isinstance(custom_rules, list):
+            raise ConfigError("'custom_rules' must be a list")
+            
+        log_level = log_config.get('level', 'INFO')
+        if not isinstance(logging.getLevelName(log_level), int):
+            raise ConfigError(f"'logging.level' {log_level!r} is not a valid log level")
+            
+        return cls(
+            prefix=prefix,
+            default_settings=_freeze(default_settings),
+            blacklist_words=tuple(word.lower() for word in _string_list(data, 'blacklist_words')),
+            spam_thresholds=SpamThresholds.from_dict(data.get('spam_thresholds', {})),
+            moderation_roles=_string_list(data, 'moderation_roles'),
+            immune_roles=_string_list(data, 'immune_roles'),
+            custom_rules=tuple(CustomRule.from_dict(rule, i) for i, rule in enumerate(custom_rules)),
+            sections=_freeze(data)
+        )
+        
+    def section(self, name: str) -> Mapping[str, Any]:
+        """Read-only view of any top-level section, empty if it is missing"""
+        value = self.sections.get(name)
+        return value if isinstance(value, Mapping) else MappingProxyType({})
+
+def load_config(path: str) -> BotConfig:
+    with open(path, 'r') as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise ConfigError(f"Invalid JSON in {path}: {e}")
+    return BotConfig.from_dict(data)
+
+class ConfigService:
+    """
+    Loads config.json once and keeps it current by polling the file,
+    atomically swapping in a new snapshot when it changes
+    """
+    
+    def __init__(self, path: str = 'config.json', poll_interval: float = 5.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger(__name__)
+        self._snapshot: Optional[BotConfig] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._listeners: List[Callable[[BotConfig], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        
+    @property
+    def snapshot(self) -> BotConfig:
+        if self._snapshot is None:
+            self.load()
+        return self._snapshot
+        
+    def _file_signature(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+        
+    def load(self) -> BotConfig:
+        signature = self._file_signature()
+        self._snapshot = load_config(self.path)
+        self._signature = signature
+        return self._snapshot
+        
+    def add_listener(self, callback: Callable[[BotConfig], None]):
+        self._listeners.append(callback)
+        
+    def remove_listener(self, callback: Callable[[BotConfig], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+            
+    async def reload(self) -> bool:
+        try:
+            signature = await asyncio.to_thread(self._file_signature)
+        except OSError as e:
+            self.logger.error(f"Cannot stat {self.path}, keeping previous config: {e}")
+            return False
+            
+        if signature == self._signature:
+            return False
+            
+        try:
+            snapshot = await asyncio.to_thread(load_config, self.path)
+        except (OSError, ConfigError) as e:
+            # Keep serving the last good snapshot; retry once the file changes again
+            self._signature = signature
+            self.logger.error(f"Config reload failed, keeping previous config: {e}")
+            return False
+            
+        self._snapshot = snapshot
+        self._signature = signature
+        self.logger.info(f"Reloaded configuration from {self.path}")
+        
+        for callback in list(self._listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                self.logger.error(f"Config listener {callback!r} failed: {e}")
+                
+        return True
+        
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.reload()
+            
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+            
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,89 @@
+import asyncio
+import csv
+import gzip
+import json
+from typing import Any, Dict, List, Optional, TextIO
+from database import LOG_COLUMNS
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+class _ExportWriter:
+    """File side of an export; every method here runs in a worker thread"""
+    
+    def __init__(self, path: str, format_type: str, compress: bool):
+        self.format_type = format_type
+        if compress:
+            self.file: TextIO = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        else:
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+            
+        self.csv_writer = None
+        if format_type == 'csv':
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=LOG_COLUMNS)
+            self.csv_writer.writeheader()
+            
+    def write_rows(self, rows: List[Dict[str, Any]]):
+        if self.csv_writer:
+            self.csv_writer.writerows(rows)
+        else:
+            self.file.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+            
+    def close(self):
+        self.file.close()
+
+class ModerationExporter:
+    """Streams moderation logs from the database into an NDJSON or CSV file"""
+    
+    def __init__(self, db, page_size: int = 1000):
+        self.db = db
+        self.page_size = page_size
+        
+    @staticmethod
+    def file_name(guild_id: Optional[int], format_type: str, compress: bool) -> str:
+        scope = guild_id if guild_id is not None else 'all'
+        return f"moderation_logs_{scope}.{format_type}" + ('.gz' if compress else '')
+        
+    async def export(self, path: str, guild_id: Optional[int] = None, format_type: str = 'ndjson',
+                     compress: bool = False, **filters) -> Dict[str, Any]:
+        """
+        Write every log of one guild (or all guilds when guild_id is None) to path,
+        newest first, and return summary counts gathered in the same pass
+        """
+        if format_type not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {format_type}")
+            
+        summary = {
+            'guild_id': guild_id,
+            'format': format_type,
+            'compressed': compress,
+            'path': path,
+            'total_logs': 0,
+            'guilds': 0,
+            'date_range': {'oldest': None, 'newest': None},
+            'action_counts': {}
+        }
+        action_counts = summary['action_counts']
+        guild_ids = set()
+        
+        writer = await asyncio.to_thread(_ExportWriter, path, format_type, compress)
+        try:
+            async for page in self.db.iter_moderation_log_pages(guild_id, self.page_size, **filters):
+                # Only one page is held at a time; encoding and disk IO stay off the event loop
+                await asyncio.to_thread(writer.write_rows, page)
+                
+                for log in page:
+                    action_counts[log['action']] = action_counts.get(log['action'], 0) + 1
+                    guild_ids.add(log['guild_id'])
+                    
+                # Pages are newest first, but an all-guild export restarts at each shard
+                date_range = summary['date_range']
+                if date_range['newest'] is None or page[0]['created_at'] > date_range['newest']:
+                    date_range['newest'] = page[0]['created_at']
+                if date_range['oldest'] is None or page[-1]['created_at'] < date_range['oldest']:
+                    date_range['oldest'] = page[-1]['created_at']
+                summary['total_logs'] += len(page)
+        finally:
+            await asyncio.to_thread(writer.close)
+            
+        summary['guilds'] = len(guild_ids)
+        return summary
@@ -0,0 +1,96 @@
+import re
+from typing import NamedTuple
+from utils.normalize import normalize_text
+
+CUSTOM_EMOJI_PATTERN = r'<a?:[a-zA-Z0-9_]+:[0-9]+>'
+MENTION_PATTERN = r'<@(&?)!?([0-9]+)>'
+LINK_PATTERN = r'https?://\S+'
+# Adjacent emoji blocks are merged: the regex engine tests a character class range by range
+UNICODE_EMOJI_CLASS = r'\U00002600-\U000027BF\U0001F300-\U0001F64F\U0001F680-\U0001FAFF'
+COMBINING_MARK_CLASS = r'\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f'
+
+_CUSTOM_EMOJI_REGEX = re.compile(CUSTOM_EMOJI_PATTERN)
+_MENTION_REGEX = re.compile(MENTION_PATTERN)
+_LINK_REGEX = re.compile(LINK_PATTERN)
+# Runs rather than single characters, so a wall of zalgo marks is a handful of matches
+_UNICODE_EMOJI_REGEX = re.compile(f'[{UNICODE_EMOJI_CLASS}]+')
+_COMBINING_MARK_REGEX = re.compile(f'[{COMBINING_MARK_CLASS}]+')
+
+_ASCII_BYTES = bytes(range(0x80))
+
+_NOT_UPPERCASE = bytes(byte for byte in range(256) if not 0x41 <= byte <= 0x5a)
+_NOT_LETTER = bytes(byte for byte in range(256) if not (0x41 <= byte <= 0x5a or 0x61 <= byte <= 0x7a))
+
+class MessageFeatures(NamedTuple):
+    length: int
+    custom_emoji_count: int
+    unicode_emoji_count: int
+    combining_mark_count: int
+    uppercase_count: int
+    letter_count: int
+    link_count: int
+    mention_count: int
+    normalized: str
+    
+    @property
+    def emoji_count(self) -> int:
+        return self.custom_emoji_count + self.unicode_emoji_count
+        
+    @property
+    def caps_ratio(self) -> float:
+        return self.uppercase_count / self.letter_count if self.letter_count else 0.0
+
+def extract_features(content: str) -> MessageFeatures:
+    """Collect everything the automod rules need from message content in one call"""
+    custom_emoji_count = mention_count = link_count = 0
+    
+    # Markup tokens need an ASCII trigger character, so plain prose skips these scans
+    if '<' in content:
+        custom_emoji_count = len(_CUSTOM_EMOJI_REGEX.findall(content))
+        mention_count = len(set(_MENTION_REGEX.findall(content)))
+    if '://' in content:
+        link_count = len(_LINK_REGEX.findall(content))
+        
+    unicode_emoji_count = combining_mark_count = 0
+    
+    # str.isascii() is O(1) in CPython, so most messages never pay for the Unicode scans
+    if not content.isascii():
+        # Dropping every ASCII byte from the UTF-8 leaves exactly the non-ASCII characters, in C,
+        # so the regexes only walk those; marks stacked on ASCII letters also join into long runs
+        non_ascii = content.encode('utf-8').translate(None, _ASCII_BYTES).decode('utf-8')
+        unicode_emoji_count = sum(map(len, _UNICODE_EMOJI_REGEX.findall(non_ascii)))
+        combining_mark_count = sum(map(len, _COMBINING_MARK_REGEX.findall(non_ascii)))
+        
+    ascii_content = content.encode('ascii', 'ignore')
+    
+    # Positional: keyword arguments cost more than every scan above on a typical message
+    return MessageFeatures(
+        len(content),
+        custom_emoji_count,
+        unicode_emoji_count,
+        combining_mark_count,
+        len(ascii_content.translate(None, _NOT_UPPERCASE)),
+        len(ascii_content.translate(None, _NOT_LETTER)),
+        link_count,
+        mention_count,
+        normalize_text(content)
+    )
+
+def basic_features(content: str) -> MessageFeatures:
+    """
+    Stand-in when extract_features ran out of time: no scans, so the feature
+    rules pass the message, but the stateful rules still see it
+    """
+    ascii_content = content.encode('ascii', 'ignore')
+    
+    return MessageFeatures(
+        length=len(content),
+        custom_emoji_count=0,
+        unicode_emoji_count=0,
+        combining_mark_count=0,
+        uppercase_count=len(ascii_content.translate(None, _NOT_UPPERCASE)),
+        letter_count=len(ascii_content.translate(None, _NOT_LETTER)),
+        link_count=0,
+        mention_count=0,
+        normalized=content.lower()
+    )
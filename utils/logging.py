@@ -2,14 +2,9 @@ import logging
 import json
 import discord
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Mapping
 
-def setup_logging() -> logging.Logger:
-    with open('config.json', 'r') as f:
-        config = json.load(f)
-    
-    log_config = config.get('logging', {})
-    
+def setup_logging(log_config: Mapping[str, Any]) -> logging.Logger:
     logging.basicConfig(
         level=getattr(logging, log_config.get('level', 'INFO')),
         format=log_config.get('format', '[%(asctime)s] [%(levelname)s] %(name)s: %(message)s'),
@@ -55,10 +50,15 @@ class ModerationLogger:
             'warn': 0xff9900,
             'timeout': 0xff6600,
             'ban': 0xff0000,
+            'massban': 0xff0000,
+            'masswarn': 0xff9900,
             'kick': 0xff3300,
             'unban': 0x00ff00,
             'unwarn': 0x0099ff,
-            'purge': 0x9900ff
+            'purge': 0x9900ff,
+            'slowmode': 0xffcc00,
+            'lockdown': 0xff0000,
+            'restore': 0x00ff00
         }
         
         embed = discord.Embed(
@@ -83,6 +83,9 @@ class ModerationLogger:
                 inline=True
             )
             
+        if data.get('channel_id'):
+            embed.add_field(name="Channel", value=f"<#{data['channel_id']}>", inline=True)
+            
         embed.add_field(name="Reason", value=reason, inline=False)
         
         if duration:
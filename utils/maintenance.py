@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Mapping, Optional
+
+RETENTION_KEYS = {
+    'moderation_logs': 'log_retention_days',
+    'warnings': 'warning_retention_days'
+}
+
+class MaintenanceJob:
+    """
+    Retention pruning and vacuuming, done in small write batches.
+    
+    Each chunk is its own short write so automod and command writes queue behind
+    at most one chunk, and the job sleeps between chunks to let them through.
+    A retention of 0 days keeps rows forever; guild configs override the defaults.
+    """
+    
+    def __init__(self, db, config: Mapping[str, Any]):
+        self.db = db
+        self.logger = logging.getLogger(__name__)
+        self.apply_config(config)
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._lock = asyncio.Lock()
+        
+    def apply_config(self, config: Mapping[str, Any]):
+        self.defaults = {
+            table: config.get(key) or 0 for table, key in RETENTION_KEYS.items()
+        }
+        self.chunk_size = max(1, config.get('chunk_size', 500))
+        self.chunk_pause = config.get('chunk_pause_ms', 50) / 1000
+        self.vacuum_pages = config.get('vacuum_pages', 1000)
+        
+    async def _retention_plan(self, table: str, overrides: Dict[int, Dict[str, Optional[int]]],
+                              default: int) -> Dict[int, int]:
+        """Guild id -> retention days for every guild that has rows to consider"""
+        plan = {}
+        
+        if default:
+            for guild_id in await self.db.get_guild_ids_with_rows(table):
+                plan[guild_id] = default
+                
+        for guild_id, policy in overrides.items():
+            if policy.get(table) is not None:
+                plan[guild_id] = policy[table]
+                
+        return {guild_id: days for guild_id, days in plan.items() if days and days > 0}
+        
+    async def _prune_table(self, table: str, plan: Dict[int, int], now: datetime) -> Dict[str, Any]:
+        stats = {'rows': 0, 'chunks': 0, 'lock_seconds': 0.0, 'max_lock_ms': 0.0, 'guilds': 0}
+        
+        for guild_id, days in plan.items():
+            cutoff = now - timedelta(days=days)
+            pruned = 0
+            
+            while True:
+                deleted, held = await self.db.prune_chunk(table, guild_id, cutoff, self.chunk_size)
+                stats['chunks'] += 1
+                stats['lock_seconds'] += held
+                stats['max_lock_ms'] = max(stats['max_lock_ms'], held * 1000)
+                pruned += deleted
+                
+                if deleted < self.chunk_size:
+                    break
+                await asyncio.sleep(self.chunk_pause)
+                
+            if pruned:
+                stats['rows'] += pruned
+                stats['guilds'] += 1
+                
+        return stats
+        
+    async def run(self, default_days: Optional[int] = None) -> Dict[str, Any]:
+        """Prune, vacuum and optimize once; default_days overrides the configured defaults"""
+        async with self._lock:
+            start = time.perf_counter()
+            now = datetime.now(timezone.utc)
+            overrides = await self.db.get_retention_overrides()
+            report: Dict[str, Any] = {'started_at': now.isoformat(), 'tables': {}}
+            
+            for table in RETENTION_KEYS:
+                default = self.defaults[table] if default_days is None else default_days
+                plan = await self._retention_plan(table, overrides, default)
+                report['tables'][table] = await self._prune_table(table, plan, now)
+                
+            # Pending expirations the scheduler has given up on
+            await self.db.cleanup_old_data()
+            
+            storage = await self.db.get_storage_stats()
+            report['pages_reclaimed'] = 0
+            report['vacuum_seconds'] = 0.0
+            if storage['auto_vacuum'] == 2 and self.vacuum_pages:
+                report['pages_reclaimed'], report['vacuum_seconds'] = \
+                    await self.db.incremental_vacuum(self.vacuum_pages)
+            elif storage['freelist_count']:
+                self.logger.info(
+                    f"{storage['freelist_count']} free pages can only be reclaimed by a full VACUUM "
+                    f"(database predates incremental auto_vacuum)"
+                )
+                
+            report['optimize_seconds'] = await self.db.optimize()
+            report['bytes_reclaimed'] = report['pages_reclaimed'] * storage['page_size']
+            report['rows_deleted'] = sum(stats['rows'] for stats in report['tables'].values())
+            report['lock_seconds'] = (
+                sum(stats['lock_seconds'] for stats in report['tables'].values())
+                + report['vacuum_seconds'] + report['optimize_seconds']
+            )
+            report['duration_seconds'] = time.perf_counter() - start
+            
+            self.last_report = report
+            self.logger.info(
+                f"Maintenance removed {report['rows_deleted']} rows and {report['pages_reclaimed']} pages "
+                f"in {report['duration_seconds']:.1f}s (write lock held {report['lock_seconds'] * 1000:.0f} ms)"
+            )
+            return report
@@ -0,0 +1,87 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton matching many keywords in a single pass
+    over the text, independent of how many keywords there are
+    """
+    
+    def __init__(self, words: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[str, ...]] = [()]
+        self.words: Tuple[str, ...] = tuple(dict.fromkeys(word for word in words if word))
+        
+        for word in self.words:
+            self._add_word(word)
+        self._build_failure_links()
+        
+    def __len__(self) -> int:
+        return len(self.words)
+        
+    def _add_word(self, word: str):
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] = self._output[state] + (word,)
+        
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                
+                self._fail[next_state] = target if target != next_state else 0
+                # Fold suffix matches in so scanning never has to walk fail links for output
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+                
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """Return (start position, keyword) for every occurrence in text"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        matches = []
+        state = 0
+        
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            
+            if output[state]:
+                for word in output[state]:
+                    matches.append((position - len(word) + 1, word))
+                    
+        return matches
+        
+    def search(self, text: str) -> Optional[str]:
+        """Return the first keyword found in text, or None"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            
+            if output[state]:
+                return output[state][0]
+                
+        return None
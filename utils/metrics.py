@@ -0,0 +1,49 @@
+import time
+from typing import Any, Awaitable, Dict
+
+class LatencyStats:
+    __slots__ = ('count', 'total', 'max')
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+            
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'max_ms': self.max * 1000
+        }
+
+class LatencyRecorder:
+    """Named latency counters, e.g. one per pipeline stage"""
+    
+    def __init__(self):
+        self.stats: Dict[str, LatencyStats] = {}
+        
+    def record(self, name: str, seconds: float):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = LatencyStats()
+        stats.record(seconds)
+        
+    async def timed(self, name: str, awaitable: Awaitable) -> Any:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.record(name, time.perf_counter() - start)
+            
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+        
+    def reset(self):
+        self.stats.clear()
@@ -0,0 +1,75 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# Characters that render as nothing and are used to split filtered words
+IGNORABLE_RANGES = (
+    (0x00ad, 0x00ad), (0x034f, 0x034f), (0x061c, 0x061c), (0x115f, 0x1160),
+    (0x17b4, 0x17b5), (0x180b, 0x180f), (0x200b, 0x200f), (0x202a, 0x202e),
+    (0x2060, 0x206f), (0x3164, 0x3164), (0xfe00, 0xfe0f), (0xfeff, 0xfeff),
+    (0xffa0, 0xffa0), (0xe0000, 0xe007f)
+)
+# Combining marks left over after decomposition: accents and zalgo
+COMBINING_RANGES = (
+    (0x0300, 0x036f), (0x1ab0, 0x1aff), (0x1dc0, 0x1dff), (0x20d0, 0x20ff), (0xfe20, 0xfe2f)
+)
+
+# Lowercase look-alikes NFKD does not fold (Cyrillic, Greek, small capitals, ...)
+CONFUSABLES = {
+    'а': 'a', 'в': 'b', 'е': 'e', 'і': 'i', 'ј': 'j', 'к': 'k', 'м': 'm', 'н': 'h',
+    'о': 'o', 'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'ѕ': 's', 'ԁ': 'd',
+    'ԛ': 'q', 'ԝ': 'w', 'һ': 'h', 'ӏ': 'l', 'ү': 'y', 'ь': 'b',
+    'α': 'a', 'β': 'b', 'γ': 'y', 'ε': 'e', 'η': 'n', 'ι': 'i', 'κ': 'k', 'ν': 'v',
+    'ο': 'o', 'ρ': 'p', 'ς': 's', 'τ': 't', 'υ': 'u', 'χ': 'x', 'ω': 'w',
+    'ı': 'i', 'ɑ': 'a', 'ɡ': 'g', 'ɩ': 'i', 'ø': 'o', 'ł': 'l', 'đ': 'd', 'ß': 'ss',
+    'ᴀ': 'a', 'ʙ': 'b', 'ᴄ': 'c', 'ᴅ': 'd', 'ᴇ': 'e', 'ɢ': 'g', 'ʜ': 'h', 'ɪ': 'i',
+    'ᴊ': 'j', 'ᴋ': 'k', 'ʟ': 'l', 'ᴍ': 'm', 'ɴ': 'n', 'ᴏ': 'o', 'ᴘ': 'p', 'ʀ': 'r',
+    'ꜱ': 's', 'ᴛ': 't', 'ᴜ': 'u', 'ᴠ': 'v', 'ᴡ': 'w', 'ʏ': 'y', 'ᴢ': 'z'
+}
+LEETSPEAK = {
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b', '9': 'g',
+    '@': 'a', '$': 's', '!': 'i', '|': 'l'
+}
+
+_ASCII_UPPER = bytes(range(0x41, 0x5b))
+_ASCII_TABLE = bytes.maketrans(
+    _ASCII_UPPER + ''.join(LEETSPEAK).encode('ascii'),
+    _ASCII_UPPER.lower() + ''.join(LEETSPEAK.values()).encode('ascii')
+)
+
+def _build_fold_table():
+    table = {}
+    for first, last in IGNORABLE_RANGES + COMBINING_RANGES:
+        for codepoint in range(first, last + 1):
+            table[codepoint] = None
+    table.update(str.maketrans(CONFUSABLES))
+    return table
+
+_FOLD_TABLE = _build_fold_table()
+# Only runs of characters that need folding are handed to str.translate, which is slow on non-ASCII text
+_FOLD_REGEX = re.compile('[' + ''.join(
+    re.escape(chr(first)) + ('-' + re.escape(chr(last)) if last != first else '')
+    for first, last in IGNORABLE_RANGES + COMBINING_RANGES
+) + ''.join(re.escape(char) for char in CONFUSABLES) + ']+')
+
+def _fold(match: re.Match) -> str:
+    return match.group().translate(_FOLD_TABLE)
+
+@lru_cache(maxsize=2048)
+def _normalize_unicode(content: str) -> str:
+    # NFKD folds full-width, styled and circled letters and splits accents off for removal
+    text = _FOLD_REGEX.sub(_fold, unicodedata.normalize('NFKD', content).lower())
+    # Leetspeak characters are ASCII, so the byte table applies to UTF-8 unchanged
+    return text.encode('utf-8').translate(_ASCII_TABLE).decode('utf-8')
+
+def normalize_text(content: str) -> str:
+    """
+    Fold content for keyword matching: lowercase, leetspeak digits and symbols,
+    and for non-ASCII text compatibility forms, look-alike letters, accents and
+    invisible characters. Blacklist words must go through the same function.
+    """
+    # Most messages are ASCII: one byte-table pass instead of Unicode normalization
+    if content.isascii():
+        return content.encode('ascii').translate(_ASCII_TABLE).decode('ascii')
+    # Repeated spam is common, so the expensive path is memoized by content
+    return _normalize_unicode(content)
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Set
+
+class OffloadTimeout(Exception):
+    """The call missed its deadline or could not be run; callers fail open"""
+
+def _warm_up() -> bool:
+    # Importing the check modules here moves their import cost out of the first real call
+    import utils.automod  # noqa: F401
+    return True
+
+class CheckPool:
+    """
+    Bounded process pool for CPU-heavy content checks, so a pathological
+    message or regex burns a worker process instead of the event loop.
+    
+    Every call has a deadline. A call that misses it is abandoned and the caller
+    fails open; if it is still running, its worker counts as stuck. Once every
+    worker is stuck the pool is recycled: the old processes are terminated and a
+    fresh pool takes over. Pending work is capped, and calls beyond the cap are
+    rejected instead of queued.
+    """
+    
+    def __init__(self, workers: int = 2, max_pending: int = 64):
+        self.logger = logging.getLogger(__name__)
+        self.workers = max(0, workers)
+        self.max_pending = max(1, max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending = 0
+        # Abandoned calls still running in a worker; cleared from the executor's thread when they end
+        self._stuck: Set[Future] = set()
+        self.submitted = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.recycled = 0
+        
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+        
+    def resize(self, workers: int, max_pending: int):
+        workers = max(0, workers)
+        self.max_pending = max(1, max_pending)
+        if workers != self.workers:
+            self.workers = workers
+            self._shutdown()
+            
+    def start(self):
+        """Spawn the workers ahead of the first heavy message"""
+        if not self.enabled:
+            return
+            
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(_warm_up)
+            
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Workers are spawned rather than forked: the bot process has threads (database, asyncio.to_thread)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+        
+    def _shutdown(self) -> bool:
+        executor, self._executor = self._executor, None
+        self._stuck.clear()
+        if executor is None:
+            return False
+            
+        # There is no public way to stop a running call, so the worker processes are terminated directly
+        processes = list((getattr(executor, '_processes', None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        return True
+        
+    def _recycle(self, reason: str):
+        if self._shutdown():
+            self.recycled += 1
+            self.logger.warning(f"Recycled check worker pool: {reason}")
+            self.start()
+            
+    def _unstick(self, future: Future):
+        # Runs on the executor's management thread
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stuck.discard, future)
+            
+    async def run(self, timeout: float, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) in a worker; raises OffloadTimeout if it can't finish within timeout seconds"""
+        if timeout <= 0:
+            self.timeouts += 1
+            raise OffloadTimeout("no time left in the budget")
+        if self._pending + len(self._stuck) >= self.max_pending:
+            self.rejected += 1
+            raise OffloadTimeout("check pool is full")
+            
+        self._loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self.rejected += 1
+            self._recycle(f"submit failed: {e}")
+            raise OffloadTimeout("check pool is unavailable")
+            
+        self.submitted += 1
+        self._pending += 1
+        try:
+            # A timeout cancels the call if it is still queued; a running call can't be cancelled
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if not future.done():
+                self._stuck.add(future)
+                future.add_done_callback(self._unstick)
+                if len(self._stuck) >= self.workers and executor is self._executor:
+                    self._recycle(f"{len(self._stuck)} workers stuck past their deadline")
+            raise OffloadTimeout(f"check did not finish within {timeout * 1000:.0f} ms")
+        except asyncio.CancelledError:
+            # Recycling cancels the calls still queued in the old pool; those fail open like a timeout,
+            # while a cancellation of the calling task itself propagates
+            if future.cancelled() and executor is not self._executor:
+                self.rejected += 1
+                raise OffloadTimeout("check was dropped when the pool was recycled")
+            raise
+        except BrokenProcessPool:
+            self.rejected += 1
+            if executor is self._executor:
+                self._recycle("a worker process died")
+            raise OffloadTimeout("check pool is unavailable")
+        finally:
+            self._pending -= 1
+            
+        self.completed += 1
+        return result
+        
+    def stats(self) -> Dict[str, int]:
+        return {
+            'workers': self.workers,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'timeouts': self.timeouts,
+            'rejected': self.rejected,
+            'recycled': self.recycled,
+            'stuck': len(self._stuck)
+        }
+        
+    def close(self):
+        self._shutdown()
@@ -1,23 +1,80 @@
 import discord
 from discord.ext import commands
-from typing import List, Union
-import json
+from typing import List, Union, Dict, Tuple, FrozenSet, Iterable
 
-def has_mod_permissions():
-    async def predicate(ctx):
-        if ctx.author.guild_permissions.administrator:
-            return True
+class RoleResolver:
+    """
+    Maps configured role names to role IDs per guild and caches
+    moderator/immunity decisions per member, so checks are set
+    intersections instead of name loops
+    """
+    
+    def __init__(self, moderation_roles: Iterable[str], immune_roles: Iterable[str]):
+        self.moderation_roles = frozenset(moderation_roles)
+        self.immune_roles = frozenset(immune_roles)
+        self._guild_roles: Dict[int, Tuple[FrozenSet[int], FrozenSet[int]]] = {}
+        self._members: Dict[int, Dict[int, Tuple[bool, bool]]] = {}
+        
+    def update_roles(self, moderation_roles: Iterable[str], immune_roles: Iterable[str]):
+        self.moderation_roles = frozenset(moderation_roles)
+        self.immune_roles = frozenset(immune_roles)
+        self.clear()
+        
+    def _get_guild_roles(self, guild: discord.Guild) -> Tuple[FrozenSet[int], FrozenSet[int]]:
+        roles = self._guild_roles.get(guild.id)
+        if roles is None:
+            roles = (
+                frozenset(role.id for role in guild.roles if role.name in self.moderation_roles),
+                frozenset(role.id for role in guild.roles if role.name in self.immune_roles)
+            )
+            self._guild_roles[guild.id] = roles
+        return roles
+        
+    def _resolve(self, member: discord.Member) -> Tuple[bool, bool]:
+        guild_members = self._members.get(member.guild.id)
+        if guild_members is None:
+            guild_members = self._members[member.guild.id] = {}
+            
+        decision = guild_members.get(member.id)
+        
+        if decision is None:
+            mod_role_ids, immune_role_ids = self._get_guild_roles(member.guild)
+            member_role_ids = {role.id for role in member.roles}
+            is_admin = member.guild_permissions.administrator
             
-        with open('config.json', 'r') as f:
-            config = json.load(f)
+            decision = (
+                is_admin or not mod_role_ids.isdisjoint(member_role_ids),
+                is_admin or not immune_role_ids.isdisjoint(member_role_ids)
+            )
+            guild_members[member.id] = decision
             
-        mod_roles = config.get('moderation_roles', [])
+        return decision
         
-        for role in ctx.author.roles:
-            if role.name in mod_roles:
-                return True
-                
-        return False
+    def is_moderator(self, member: discord.Member) -> bool:
+        return self._resolve(member)[0]
+        
+    def is_immune(self, member: discord.Member) -> bool:
+        return self._resolve(member)[1]
+        
+    def invalidate_member(self, guild_id: int, member_id: int):
+        guild_members = self._members.get(guild_id)
+        if guild_members is not None:
+            guild_members.pop(member_id, None)
+            
+    def invalidate_guild(self, guild_id: int):
+        self._guild_roles.pop(guild_id, None)
+        self._members.pop(guild_id, None)
+        
+    def clear(self):
+        self._guild_roles.clear()
+        self._members.clear()
+
+def has_mod_permissions():
+    async def predicate(ctx):
+        if not isinstance(ctx.author, discord.Member):
+            return False
+            
+        return ctx.bot.role_resolver.is_moderator(ctx.author)
         
     return commands.check(predicate)
 
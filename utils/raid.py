@@ -0,0 +1,171 @@
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+FINGERPRINT_BITS = 64
+BAND_BITS = 8
+BANDS = FINGERPRINT_BITS // BAND_BITS
+BAND_MASK = (1 << BAND_BITS) - 1
+FINGERPRINT_MASK = (1 << FINGERPRINT_BITS) - 1
+
+SHINGLE_SIZE = 4
+# Raid messages are recognisable from their start; longer text only costs time
+MAX_FINGERPRINT_CHARS = 256
+# Bounds the work per message when one user floods a single bucket
+MAX_CANDIDATES = 256
+
+@lru_cache(maxsize=4096)
+def simhash(text: str) -> int:
+    """64-bit SimHash over the character shingles of already-normalized text.
+    
+    Each bit of the result is the majority vote of that bit over the shingle
+    hashes. The votes are tallied with bit-sliced counters (one int per binary
+    digit of the count, 64 lanes wide), so a shingle costs a few integer ops
+    instead of 64.
+    """
+    text = ' '.join(text[:MAX_FINGERPRINT_CHARS].split())
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))}
+    
+    counters: List[int] = []
+    for value in map(hash, shingles):
+        carry = value & FINGERPRINT_MASK
+        for level in range(len(counters)):
+            if not carry:
+                break
+            counters[level], carry = counters[level] ^ carry, counters[level] & carry
+        if carry:
+            counters.append(carry)
+            
+    # Lanes whose count exceeds half the shingles: compare each lane against
+    # the threshold from the most significant counter down
+    threshold = len(shingles) // 2
+    greater = 0
+    equal = FINGERPRINT_MASK
+    for level in range(max(len(counters), threshold.bit_length()) - 1, -1, -1):
+        bits = counters[level] if level < len(counters) else 0
+        if (threshold >> level) & 1:
+            equal &= bits
+        else:
+            greater |= equal & bits
+            equal &= ~bits
+    return greater
+
+class _Entry:
+    __slots__ = ('timestamp', 'fingerprint', 'user_id', 'bands')
+    
+    def __init__(self, timestamp: float, fingerprint: int, user_id: int):
+        self.timestamp = timestamp
+        self.fingerprint = fingerprint
+        self.user_id = user_id
+        self.bands = tuple(
+            (band, (fingerprint >> (band * BAND_BITS)) & BAND_MASK) for band in range(BANDS)
+        )
+
+class _GuildWindow:
+    __slots__ = ('entries', 'buckets')
+    
+    def __init__(self):
+        self.entries: Deque[_Entry] = deque()
+        # (band, band value) -> entries in arrival order
+        self.buckets: Dict[Tuple[int, int], Deque[_Entry]] = {}
+        
+    def evict(self, cutoff: float, max_entries: int):
+        entries = self.entries
+        buckets = self.buckets
+        while entries and (entries[0].timestamp <= cutoff or len(entries) > max_entries):
+            entry = entries.popleft()
+            for key in entry.bands:
+                # Buckets fill in arrival order too, so the oldest entry is always at the front
+                bucket = buckets[key]
+                bucket.popleft()
+                if not bucket:
+                    del buckets[key]
+
+class RaidDetector:
+    """
+    Finds near-identical messages posted by different users within a short window.
+    
+    Each guild keeps a bounded, time-limited window of message SimHashes indexed
+    by LSH bands: the 64-bit fingerprint is cut into eight 8-bit bands, and any
+    two fingerprints within 7 differing bits share at least one band exactly, so
+    only messages in the same band buckets are ever compared.
+    """
+    
+    def __init__(self, window: float = 30.0, max_entries: int = 2000, min_length: int = 20,
+                 max_distance: int = 6, min_users: int = 5):
+        self._guilds: Dict[int, _GuildWindow] = {}
+        self.configure(window, max_entries, min_length, max_distance, min_users)
+        
+    def configure(self, window: float, max_entries: int, min_length: int, max_distance: int, min_users: int):
+        """Change the limits in place; windows shrink to the new size on their next message"""
+        self.window = window
+        self.max_entries = max(1, max_entries)
+        self.min_length = min_length
+        # Beyond BANDS - 1 bits two matching messages may share no band and never be compared
+        self.max_distance = min(max_distance, BANDS - 1)
+        self.min_users = max(2, min_users)
+        
+    def __len__(self) -> int:
+        return sum(len(window.entries) for window in self._guilds.values())
+        
+    def observe(self, guild_id: int, user_id: int, normalized: str,
+                now: Optional[float] = None) -> Optional[Set[int]]:
+        """Record a message; returns the users in its cluster once enough users posted it"""
+        if len(normalized) < self.min_length:
+            return None
+            
+        now = time.time() if now is None else now
+        window = self._guilds.get(guild_id)
+        if window is None:
+            window = self._guilds[guild_id] = _GuildWindow()
+        window.evict(now - self.window, self.max_entries - 1)
+        
+        entry = _Entry(now, simhash(normalized), user_id)
+        users = {user_id}
+        seen: Set[int] = set()
+        budget = MAX_CANDIDATES
+        fingerprint = entry.fingerprint
+        max_distance = self.max_distance
+        
+        for key in entry.bands:
+            bucket = window.buckets.get(key)
+            if not bucket:
+                continue
+            # Newest first; a raid is confirmed after min_users matches, so the scan stops early
+            for candidate in reversed(bucket):
+                if id(candidate) in seen:
+                    continue
+                seen.add(id(candidate))
+                budget -= 1
+                if candidate.user_id not in users and \
+                        (candidate.fingerprint ^ fingerprint).bit_count() <= max_distance:
+                    users.add(candidate.user_id)
+                    if len(users) >= self.min_users:
+                        break
+                if not budget:
+                    break
+            if len(users) >= self.min_users or not budget:
+                break
+                
+        window.entries.append(entry)
+        for key in entry.bands:
+            bucket = window.buckets.get(key)
+            if bucket is None:
+                bucket = window.buckets[key] = deque()
+            bucket.append(entry)
+            
+        return users if len(users) >= self.min_users else None
+        
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Expire old entries everywhere and drop guilds with nothing left"""
+        now = time.time() if now is None else now
+        cutoff = now - self.window
+        
+        for window in self._guilds.values():
+            window.evict(cutoff, self.max_entries)
+            
+        idle = [guild_id for guild_id, window in self._guilds.items() if not window.entries]
+        for guild_id in idle:
+            del self._guilds[guild_id]
+        return len(idle)
@@ -0,0 +1,174 @@
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from utils.features import MessageFeatures
+from utils.metrics import LatencyStats
+from utils.offload import CheckPool, OffloadTimeout
+
+# Cost classes, cheapest first; rules run in this order and stop at the first hit
+COST_FEATURES = 0   # only reads the precomputed MessageFeatures
+COST_SCAN = 1       # scans the message text
+COST_STATEFUL = 2   # reads and updates shared tracking state
+COST_IO = 3         # awaits the database or the Discord API
+
+COST_NAMES = {
+    COST_FEATURES: 'features',
+    COST_SCAN: 'scan',
+    COST_STATEFUL: 'stateful',
+    COST_IO: 'io'
+}
+
+class RuleContext(NamedTuple):
+    message: Any
+    guild_config: Dict[str, Any]
+    features: MessageFeatures
+    # time.perf_counter() value by which offloaded checks must have finished
+    deadline: float = math.inf
+
+RuleCheck = Callable[[RuleContext], Awaitable[Optional[str]]]
+
+class HeavyCheck(NamedTuple):
+    """
+    How to run a rule in the check pool: prepare picks the picklable arguments out
+    of the context (None skips the rule), scan is a module-level function that
+    returns the violation. Messages shorter than inline_length (the registry's
+    default if None) still go through the rule's normal inline check.
+    """
+    prepare: Callable[[RuleContext], Optional[Tuple[Any, ...]]]
+    scan: Callable[..., Optional[str]]
+    inline_length: Optional[int] = None
+
+class Rule:
+    __slots__ = ('name', 'cost', 'check', 'config_key', 'heavy', 'order', 'hits', 'errors', 'timeouts', 'latency')
+    
+    def __init__(self, name: str, cost: int, check: RuleCheck, config_key: Optional[str],
+                 heavy: Optional[HeavyCheck], order: int):
+        self.name = name
+        self.cost = cost
+        self.check = check
+        self.config_key = config_key
+        self.heavy = heavy
+        self.order = order
+        self.hits = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.latency = LatencyStats()
+        
+    def enabled_for(self, guild_config: Dict[str, Any]) -> bool:
+        if self.config_key and not guild_config.get(self.config_key, True):
+            return False
+        return self.name not in guild_config.get('disabled_rules', ())
+        
+    def as_dict(self) -> Dict[str, Any]:
+        stats = self.latency.as_dict()
+        stats.update(
+            name=self.name,
+            cost=COST_NAMES.get(self.cost, str(self.cost)),
+            evaluations=self.latency.count,
+            hits=self.hits,
+            errors=self.errors,
+            timeouts=self.timeouts,
+            heavy=self.heavy is not None,
+            hit_rate=self.hits / self.latency.count if self.latency.count else 0.0
+        )
+        return stats
+
+class RuleRegistry:
+    """
+    Automod rules evaluated cheapest cost class first, stopping at the first
+    violation. Within a class rules keep their registration order. A rule can
+    be switched off per guild by its own config key or by listing its name in
+    the guild's disabled_rules.
+    
+    Rules tagged with a HeavyCheck run in the check pool for long messages, under
+    the message's deadline; one that misses it fails open and counts a timeout.
+    """
+    
+    def __init__(self, pool: Optional[CheckPool] = None, inline_length: int = 1000):
+        self.logger = logging.getLogger(__name__)
+        self.pool = pool
+        self.inline_length = inline_length
+        self._rules: Dict[str, Rule] = {}
+        self._ordered: List[Rule] = []
+        self._registered = 0
+        
+    def register(self, name: str, cost: int, check: RuleCheck, config_key: Optional[str] = None,
+                 heavy: Optional[HeavyCheck] = None) -> Rule:
+        if name in self._rules:
+            raise ValueError(f"Rule '{name}' is already registered")
+            
+        rule = Rule(name, cost, check, config_key, heavy, self._registered)
+        self._registered += 1
+        self._rules[name] = rule
+        self._ordered = sorted(self._rules.values(), key=lambda rule: (rule.cost, rule.order))
+        return rule
+        
+    def unregister(self, name: str):
+        if self._rules.pop(name, None) is not None:
+            self._ordered = [rule for rule in self._ordered if rule.name != name]
+            
+    def __iter__(self) -> Iterator[Rule]:
+        return iter(self._ordered)
+        
+    def __contains__(self, name: str) -> bool:
+        return name in self._rules
+        
+    @property
+    def names(self) -> List[str]:
+        return [rule.name for rule in self._ordered]
+        
+    async def evaluate(self, context: RuleContext) -> Optional[str]:
+        """Return the first violation found, or None"""
+        for rule in self._ordered:
+            if not rule.enabled_for(context.guild_config):
+                continue
+                
+            start = time.perf_counter()
+            try:
+                if self._should_offload(rule, context):
+                    violation = await self._offload(rule, context)
+                else:
+                    violation = await rule.check(context)
+            except Exception as e:
+                # A broken rule must not take the rest of automod down with it
+                rule.errors += 1
+                self.logger.error(f"Automod rule '{rule.name}' failed: {e}")
+                violation = None
+            finally:
+                rule.latency.record(time.perf_counter() - start)
+                
+            if violation:
+                rule.hits += 1
+                return violation
+                
+        return None
+        
+    def _should_offload(self, rule: Rule, context: RuleContext) -> bool:
+        if rule.heavy is None or self.pool is None or not self.pool.enabled:
+            return False
+        inline_length = self.inline_length if rule.heavy.inline_length is None else rule.heavy.inline_length
+        return context.features.length >= inline_length
+        
+    async def _offload(self, rule: Rule, context: RuleContext) -> Optional[str]:
+        args = rule.heavy.prepare(context)
+        if args is None:
+            return None
+            
+        try:
+            return await self.pool.run(context.deadline - time.perf_counter(), rule.heavy.scan, *args)
+        except OffloadTimeout as e:
+            rule.timeouts += 1
+            self.logger.debug(f"Automod rule '{rule.name}' skipped: {e}")
+            return None
+            
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per-rule counters, most total time first"""
+        return sorted((rule.as_dict() for rule in self._ordered), key=lambda stats: -stats['total_ms'])
+        
+    def reset(self):
+        for rule in self._ordered:
+            rule.hits = 0
+            rule.errors = 0
+            rule.timeouts = 0
+            rule.latency = LatencyStats()
@@ -0,0 +1,245 @@
+import asyncio
+import heapq
+import logging
+import re
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+DURATION_PATTERN = re.compile(r'(\d+)\s*([smhdw]?)', re.IGNORECASE)
+DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+# Far below what datetime can represent, so a scheduled expiry always fits
+MAX_DURATION = 365 * 86400
+
+def parse_duration(text: str) -> int:
+    """Parse '90', '30m', '12h', '7d' or '1d12h' into seconds"""
+    text = text.strip()
+    seconds = 0
+    position = 0
+    for match in DURATION_PATTERN.finditer(text):
+        if text[position:match.start()].strip():
+            break
+        seconds += int(match.group(1)) * DURATION_UNITS[match.group(2).lower()]
+        position = match.end()
+        
+    if position == 0 or text[position:].strip():
+        raise ValueError(f"Invalid duration: {text}")
+    return seconds
+
+class RetryAction(Exception):
+    """Raised by a handler to have its action fired again after a delay"""
+    
+    def __init__(self, delay: float, rate_limited: bool = False):
+        super().__init__(f"retry in {delay:.1f}s")
+        self.delay = delay
+        self.rate_limited = rate_limited
+
+class ScheduledAction:
+    __slots__ = ('id', 'guild_id', 'user_id', 'action', 'role_id', 'due', 'attempts')
+    
+    def __init__(self, action_id: int, guild_id: int, user_id: int, action: str,
+                 role_id: Optional[int], due: float):
+        self.id = action_id
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.action = action
+        self.role_id = role_id
+        self.due = due
+        self.attempts = 0
+
+Handler = Callable[[ScheduledAction], Awaitable[None]]
+
+class ActionScheduler:
+    """
+    Fires expiring punishments (unban, unmute, ...) at their due time.
+    
+    Pending actions live in the user_timeouts table and in one in-memory min-heap
+    ordered by due time; a single task sleeps until the earliest entry instead of
+    one asyncio task per action. Due actions are fired in bounded batches with a
+    pause between batches so a backlog (e.g. after downtime) doesn't hit rate limits.
+    """
+    
+    def __init__(self, db, batch_size: int = 25, batch_interval: float = 1.0,
+                 retry_delay: float = 60.0, max_attempts: int = 5):
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.logger = logging.getLogger(__name__)
+        self._heap: List[Tuple[float, int, int, ScheduledAction]] = []
+        # Cancelled (guild_id, id) keys are skipped lazily when they reach the top of the heap;
+        # ids are only unique within a guild's shard
+        self._cancelled: Set[Tuple[int, int]] = set()
+        self._handlers: Dict[str, Handler] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[Callable[[], Awaitable[None]]] = None
+        self.fired = 0
+        self.failed = 0
+        
+    def register(self, action: str, handler: Handler):
+        self._handlers[action] = handler
+        
+    def unregister(self, action: str):
+        self._handlers.pop(action, None)
+        
+    @property
+    def pending(self) -> int:
+        return len(self._heap) - len(self._cancelled)
+        
+    @staticmethod
+    def _parse_due(expires_at: str) -> float:
+        return datetime.fromisoformat(expires_at).replace(tzinfo=timezone.utc).timestamp()
+        
+    def _push(self, entry: ScheduledAction):
+        heapq.heappush(self._heap, (entry.due, entry.guild_id, entry.id, entry))
+        # Only an entry that becomes the new earliest one changes how long the loop should sleep
+        if self._heap[0][3] is entry:
+            self._wakeup.set()
+            
+    async def load(self) -> int:
+        """Rebuild the heap from the table"""
+        heap = []
+        async for page in self.db.iter_scheduled_actions():
+            for row in page:
+                entry = ScheduledAction(
+                    row['id'], row['guild_id'], row['user_id'], row['action'],
+                    row['role_id'], self._parse_due(row['expires_at'])
+                )
+                heap.append((entry.due, entry.guild_id, entry.id, entry))
+                
+        heapq.heapify(heap)
+        self._heap = heap
+        self._cancelled.clear()
+        self._wakeup.set()
+        return len(heap)
+        
+    async def schedule(self, guild_id: int, user_id: int, action: str, duration: float,
+                       moderator_id: int, reason: str, role_id: Optional[int] = None) -> int:
+        due = time.time() + duration
+        action_id, replaced = await self.db.schedule_action(
+            guild_id, user_id, action, datetime.fromtimestamp(due, timezone.utc),
+            moderator_id, reason, role_id
+        )
+        self._cancelled.update((guild_id, replaced_id) for replaced_id in replaced)
+        self._push(ScheduledAction(action_id, guild_id, user_id, action, role_id, due))
+        return action_id
+        
+    async def cancel(self, guild_id: int, user_id: int, action: str) -> bool:
+        cancelled = await self.db.cancel_scheduled_actions(guild_id, user_id, action)
+        self._cancelled.update((guild_id, action_id) for action_id in cancelled)
+        return bool(cancelled)
+        
+    async def cancel_many(self, guild_id: int, user_ids: Iterable[int], action: str) -> int:
+        cancelled = await self.db.cancel_scheduled_actions_bulk(guild_id, user_ids, action)
+        self._cancelled.update((guild_id, action_id) for action_id in cancelled)
+        return len(cancelled)
+        
+    async def start(self, wait_until_ready: Optional[Callable[[], Awaitable[None]]] = None):
+        if self._task is not None:
+            return
+            
+        self._ready = wait_until_ready
+        loaded = await self.load()
+        self.logger.info(f"Loaded {loaded} scheduled actions")
+        self._task = asyncio.create_task(self._run())
+        
+    async def stop(self):
+        if self._task is None:
+            return
+            
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        
+    def _pop_due(self, now: float) -> List[ScheduledAction]:
+        batch = []
+        heap = self._heap
+        while heap and heap[0][0] <= now and len(batch) < self.batch_size:
+            _, guild_id, action_id, entry = heapq.heappop(heap)
+            key = (guild_id, action_id)
+            if key in self._cancelled:
+                self._cancelled.discard(key)
+                continue
+            batch.append(entry)
+        return batch
+        
+    async def _run(self):
+        if self._ready is not None:
+            await self._ready()
+            
+        while True:
+            try:
+                now = time.time()
+                batch = self._pop_due(now)
+                
+                if not batch:
+                    self._wakeup.clear()
+                    # Capped so wall-clock adjustments are picked up eventually
+                    timeout = min(self._heap[0][0] - now, 300) if self._heap else None
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                    
+                pause = await self._fire_batch(batch)
+                
+                if pause or (self._heap and self._heap[0][0] <= time.time()):
+                    await asyncio.sleep(max(pause, self.batch_interval))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Scheduler loop error: {e}")
+                await asyncio.sleep(self.retry_delay)
+                
+    async def _fire_batch(self, batch: List[ScheduledAction]) -> float:
+        """Fire a batch concurrently; returns how long to pause if a rate limit was hit"""
+        results = await asyncio.gather(
+            *(self._fire(entry) for entry in batch),
+            return_exceptions=True
+        )
+        
+        done: List[Tuple[int, int]] = []
+        pause = 0.0
+        for entry, result in zip(batch, results):
+            if result is None:
+                done.append((entry.guild_id, entry.id))
+                self.fired += 1
+                continue
+                
+            entry.attempts += 1
+            if isinstance(result, RetryAction):
+                delay = result.delay
+                if result.rate_limited:
+                    pause = max(pause, delay)
+            else:
+                delay = self.retry_delay * entry.attempts
+                self.logger.error(
+                    f"Scheduled {entry.action} for user {entry.user_id} in guild {entry.guild_id} "
+                    f"failed (attempt {entry.attempts}): {result}"
+                )
+                
+            if entry.attempts >= self.max_attempts:
+                done.append((entry.guild_id, entry.id))
+                self.failed += 1
+                continue
+                
+            entry.due = time.time() + delay
+            self._push(entry)
+            await self.db.reschedule_action(
+                entry.guild_id, entry.id, datetime.fromtimestamp(entry.due, timezone.utc)
+            )
+            
+        await self.db.complete_scheduled_actions(done)
+        return pause
+        
+    async def _fire(self, entry: ScheduledAction):
+        handler = self._handlers.get(entry.action)
+        if handler is None:
+            raise LookupError(f"No handler registered for '{entry.action}'")
+        await handler(entry)
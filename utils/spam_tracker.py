@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import time
+import zlib
+from collections import deque
+from typing import Dict, Tuple, Optional, Any
+
+class _UserActivity:
+    __slots__ = ('timestamps', 'last_hash', 'duplicate_count', 'last_seen')
+    
+    def __init__(self):
+        self.timestamps: deque = deque()
+        self.last_hash: Optional[int] = None
+        self.duplicate_count = 0
+        self.last_seen = 0.0
+
+class SpamTracker:
+    """
+    Memory-resident per-(guild, user) message rate and duplicate tracker
+    using a true sliding window over message timestamps
+    """
+    
+    def __init__(self, window: float = 60.0, idle_timeout: float = 600.0,
+                 snapshot_path: Optional[str] = None):
+        self.window = window
+        self.idle_timeout = max(idle_timeout, window)
+        self.snapshot_path = snapshot_path
+        self.logger = logging.getLogger(__name__)
+        self._activity: Dict[Tuple[int, int], _UserActivity] = {}
+        
+    def __len__(self) -> int:
+        return len(self._activity)
+        
+    def record(self, guild_id: int, user_id: int, content: str,
+               now: Optional[float] = None) -> Dict[str, int]:
+        """Record a message and return the user's current window stats"""
+        now = time.time() if now is None else now
+        key = (guild_id, user_id)
+        
+        activity = self._activity.get(key)
+        if activity is None:
+            activity = self._activity[key] = _UserActivity()
+            
+        timestamps = activity.timestamps
+        cutoff = now - self.window
+        while timestamps and timestamps[0] <= cutoff:
+            timestamps.popleft()
+            
+        # Only a hash of the previous message is kept, never its content
+        content_hash = zlib.crc32(content.encode('utf-8'))
+        if timestamps and content_hash == activity.last_hash:
+            activity.duplicate_count += 1
+        else:
+            activity.duplicate_count = 0
+            
+        timestamps.append(now)
+        activity.last_hash = content_hash
+        activity.last_seen = now
+        
+        return {'message_count': len(timestamps), 'duplicate_count': activity.duplicate_count}
+        
+    def get_stats(self, guild_id: int, user_id: int, now: Optional[float] = None) -> Dict[str, int]:
+        now = time.time() if now is None else now
+        activity = self._activity.get((guild_id, user_id))
+        
+        if activity is None:
+            return {'message_count': 0, 'duplicate_count': 0}
+            
+        cutoff = now - self.window
+        message_count = sum(1 for timestamp in activity.timestamps if timestamp > cutoff)
+        duplicate_count = activity.duplicate_count if message_count else 0
+        return {'message_count': message_count, 'duplicate_count': duplicate_count}
+        
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        cutoff = now - self.idle_timeout
+        
+        idle = [key for key, activity in self._activity.items() if activity.last_seen < cutoff]
+        for key in idle:
+            del self._activity[key]
+            
+        return len(idle)
+        
+    def export_state(self) -> Dict[str, Any]:
+        cutoff = time.time() - self.window
+        entries = []
+        for (guild_id, user_id), activity in self._activity.items():
+            timestamps = [timestamp for timestamp in activity.timestamps if timestamp > cutoff]
+            if timestamps:
+                entries.append([guild_id, user_id, timestamps, activity.last_hash, activity.duplicate_count])
+                
+        return {'version': 1, 'window': self.window, 'entries': entries}
+        
+    def save_snapshot(self, state: Dict[str, Any]) -> bool:
+        """Write exported state to disk; safe to call from a worker thread"""
+        if not self.snapshot_path:
+            return False
+            
+        # Write to a temporary file first so a crash never leaves a torn snapshot
+        temp_path = f"{self.snapshot_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.snapshot_path)
+        
+        return True
+        
+    def load_snapshot(self) -> int:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return 0
+            
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable spam tracker snapshot: {e}")
+            return 0
+            
+        now = time.time()
+        cutoff = now - self.window
+        loaded = 0
+        
+        for guild_id, user_id, timestamps, last_hash, duplicate_count in snapshot.get('entries', []):
+            timestamps = [timestamp for timestamp in timestamps if cutoff < timestamp <= now]
+            if not timestamps:
+                continue
+                
+            activity = _UserActivity()
+            activity.timestamps.extend(sorted(timestamps))
+            activity.last_hash = last_hash
+            activity.duplicate_count = duplicate_count
+            activity.last_seen = activity.timestamps[-1]
+            self._activity[(guild_id, user_id)] = activity
+            loaded += 1
+            
+        return loaded
+        
+    def get_summary(self) -> Dict[str, Any]:
+        return {
+            'tracked_users': len(self._activity),
+            'tracked_messages': sum(len(activity.timestamps) for activity in self._activity.values())
+        }